@@ -0,0 +1,287 @@
+# benchmarks/run.py
+# Benchmark de carga da API de agendamento.
+# Popula um prédio sintético num SQLite temporário e dispara workloads concorrentes
+# (login, horários, reserva, cancelamento, listagem administrativa) via test client do Flask
+# ou contra um gunicorn local. Reporta p50/p95/p99, requisições/s e SQL por requisição.
+#
+# Uso (a partir da raiz do app):
+#   python -m benchmarks.run --mode testclient --threads 8 --iterations 30
+#   python -m benchmarks.run --mode gunicorn --workers 4 --threads 16 --output benchmarks/results/atual.json
+#   python -m benchmarks.run --compare benchmarks/results/anterior.json
+import argparse
+import datetime
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_ROOT)
+
+# Rate limiting desligado nos benchmarks: com os limites padrão a carga mediria 429s baratos
+NO_RATE_LIMITS = {"RATE_LIMIT_BOOKING": "", "RATE_LIMIT_LOGIN": "", "RATE_LIMIT_LOGIN_FAILURES": ""}
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.latencies = {}
+        self.errors = {}
+        self.client_errors = {}  # 4xx: conflitos de reserva esperados, mas também 401/429 que invalidam a medida
+        self.sql_counts = {}
+
+    @property
+    def current_endpoint(self):
+        return getattr(self._local, "endpoint", None)
+
+    def count_sql(self):
+        endpoint = self.current_endpoint
+        if endpoint is not None:
+            with self._lock:
+                self.sql_counts[endpoint] = self.sql_counts.get(endpoint, 0) + 1
+
+    def timed(self, endpoint, call):
+        self._local.endpoint = endpoint
+        inicio = time.perf_counter()
+        try:
+            status, body = call()
+        finally:
+            elapsed = time.perf_counter() - inicio
+            self._local.endpoint = None
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            if status >= 500 or status == 0:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            elif status >= 400:
+                self.client_errors[endpoint] = self.client_errors.get(endpoint, 0) + 1
+        return status, body
+
+    def report(self, wall_time, count_sql):
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "client_errors": self.client_errors.get(endpoint, 0),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "rps": round(len(values) / wall_time, 2),
+                "sql_per_request": round(self.sql_counts.get(endpoint, 0) / len(values), 2) if count_sql else None
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {"total_requests": total, "wall_time_s": round(wall_time, 3), "rps": round(total / wall_time, 2), "endpoints": endpoints}
+
+# --- Drivers: test client do Flask ou HTTP contra um gunicorn local ---
+class TestClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, payload=None):
+        response = self.client.open(path, method=method, json=payload)
+        return response.status_code, response.get_json(silent=True)
+
+class HttpSession:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"} if data else {})
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                return response.status, json.loads(response.read() or b"null")
+        except urllib.error.HTTPError as e:
+            return e.code, None
+        except (urllib.error.URLError, OSError):
+            return 0, None
+
+# --- Workloads ---
+def resident_workload(session, recorder, email, password, iterations, rng):
+    status, _ = recorder.timed("login", lambda: session.request("POST", "/api/login", {"email": email, "senha": password}))
+    if status != 200:
+        return
+    for _ in range(iterations):
+        data = (datetime.date.today() + datetime.timedelta(days=rng.randint(1, 60))).isoformat()
+        _, grid = recorder.timed("slots", lambda: session.request("GET", f"/api/laundries/slots?date={data}"))
+        livres = [(int(id_lav), slot["id_horario"]) for id_lav, lav in (grid or {}).items()
+                  for slot in lav["slots"] if not slot["ocupado"]]
+        booking_id = None
+        if livres:
+            id_lav, id_horario = rng.choice(livres)
+            status, body = recorder.timed("book", lambda: session.request("POST", "/api/bookings", {
+                "id_lavanderia": id_lav, "id_horario": id_horario, "data_agendamento": data}))
+            if status == 201:
+                booking_id = body["agendamento"]["id_agendamento"]
+        recorder.timed("my_bookings", lambda: session.request("GET", "/api/bookings/mine"))
+        if booking_id is not None and rng.random() < 0.5:
+            recorder.timed("cancel", lambda: session.request("DELETE", f"/api/bookings/{booking_id}"))
+
+def admin_workload(session, recorder, email, password, iterations, rng):
+    status, _ = recorder.timed("login", lambda: session.request("POST", "/api/login", {"email": email, "senha": password}))
+    if status != 200:
+        return
+    for _ in range(iterations):
+        _, page = recorder.timed("admin_listing", lambda: session.request("GET", "/api/admin/all_bookings?limit=100"))
+        if page and page.get("next_cursor"):
+            cursor = page["next_cursor"]
+            recorder.timed("admin_listing", lambda: session.request("GET", f"/api/admin/all_bookings?limit=100&cursor={cursor}"))
+        recorder.timed("admin_laundries", lambda: session.request("GET", "/api/admin/all_laundries"))
+
+def run_workloads(make_session, recorder, args, seed_stats):
+    from benchmarks.seed import BENCH_PASSWORD, ADMIN_EMAIL, resident_email
+    rng = random.Random(args.seed)
+    threads = []
+    for i in range(args.threads):
+        if i < args.admin_threads:
+            target = admin_workload
+            email = ADMIN_EMAIL
+        else:
+            target = resident_workload
+            email = resident_email(rng.randint(1, args.floors), rng.randint(1, args.residents_per_floor))
+        threads.append(threading.Thread(target=target, args=(
+            make_session(), recorder, email, BENCH_PASSWORD, args.iterations, random.Random(args.seed + i))))
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - inicio
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port, timeout=20):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=APP_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\nComparação com {previous_path} ({previous['meta'].get('commit')}):")
+    for endpoint, stats in current["results"]["endpoints"].items():
+        antes = previous["results"]["endpoints"].get(endpoint)
+        if not antes:
+            continue
+        delta = (stats["p95_ms"] - antes["p95_ms"]) / antes["p95_ms"] * 100 if antes["p95_ms"] else 0.0
+        print(f"  {endpoint:16s} p95 {antes['p95_ms']:9.3f} -> {stats['p95_ms']:9.3f} ms ({delta:+.1f}%)")
+
+def print_report(report):
+    results = report["results"]
+    print(f"\n{results['total_requests']} requisições em {results['wall_time_s']} s ({results['rps']} req/s)")
+    print(f"  {'endpoint':16s} {'reqs':>6s} {'erros':>6s} {'4xx':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'req/s':>8s} {'sql/req':>8s}")
+    for endpoint, s in results["endpoints"].items():
+        sql = f"{s['sql_per_request']:.2f}" if s["sql_per_request"] is not None else "-"
+        print(f"  {endpoint:16s} {s['requests']:6d} {s['errors']:6d} {s['client_errors']:6d} {s['p50_ms']:9.3f} {s['p95_ms']:9.3f} {s['p99_ms']:9.3f} {s['rps']:8.2f} {sql:>8s}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da API de agendamento de lavanderia")
+    parser.add_argument("--mode", choices=["testclient", "gunicorn"], default="testclient")
+    parser.add_argument("--floors", type=int, default=15)
+    parser.add_argument("--laundries-per-floor", type=int, default=2)
+    parser.add_argument("--residents-per-floor", type=int, default=8)
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--admin-threads", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=4, help="Workers do gunicorn (modo gunicorn)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de resultados (padrão: benchmarks/results/<commit>-<modo>.json)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="lavanderia-bench-")
+    database_path = os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ.setdefault("DB_PROFILE", "production")
+    os.environ.setdefault("SECRET_KEY", "benchmark")  # Sessões válidas entre workers do gunicorn
+    os.environ.update(NO_RATE_LIMITS)  # Também para o gunicorn, que herda o ambiente
+
+    from src.main import create_app, db
+    app = create_app()
+    from src.services.reference_data import reference_data
+    from benchmarks.seed import seed_building
+
+    with app.app_context():
+        seed_stats = seed_building(args.floors, args.laundries_per_floor, args.residents_per_floor, args.months, seed=args.seed)
+        reference_data.load()
+    print(f"Prédio sintético: {seed_stats} em {database_path}")
+
+    recorder = Recorder()
+    count_sql = args.mode == "testclient"
+    if count_sql:
+        from sqlalchemy import event
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", lambda *a: recorder.count_sql())
+        wall_time = run_workloads(lambda: TestClientSession(app), recorder, args, seed_stats)
+    else:
+        port = free_port()
+        env = dict(os.environ)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "src.main:create_app()", "--preload", "-w", str(args.workers), "-b", f"127.0.0.1:{port}", "--log-level", "warning"],
+            cwd=APP_ROOT, env=env)
+        try:
+            if not wait_for_port(port):
+                print("gunicorn não respondeu a tempo.")
+                return 1
+            wall_time = run_workloads(lambda: HttpSession(f"http://127.0.0.1:{port}"), recorder, args, seed_stats)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "mode": args.mode,
+            "params": vars(args),
+            "building": seed_stats
+        },
+        "results": recorder.report(wall_time, count_sql)
+    }
+    print_report(report)
+
+    output = args.output or os.path.join(APP_ROOT, "benchmarks", "results", f"{report['meta']['commit'] or 'local'}-{args.mode}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nResultados salvos em {output}")
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
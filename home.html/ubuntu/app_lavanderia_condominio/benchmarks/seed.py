@@ -0,0 +1,84 @@
+# benchmarks/seed.py
+# Popula um prédio sintético (andares, lavanderias, moradores e meses de histórico de agendamentos)
+# usando os mesmos modelos de populate_initial_data, com inserts em lote.
+from src.models.models import db, Andar, Lavanderia, HorarioDisponivel, Morador, Agendamento
+from src.services.usage_rollup import backfill_usage
+from werkzeug.security import generate_password_hash
+import datetime
+import random
+
+BENCH_PASSWORD = "senha123"
+ADMIN_EMAIL = "admin@bench.local"
+
+HORARIOS = [
+    ("07:00-11:00", datetime.time(7, 0, 0), datetime.time(11, 0, 0)),
+    ("11:00-15:00", datetime.time(11, 0, 0), datetime.time(15, 0, 0)),
+    ("15:00-19:00", datetime.time(15, 0, 0), datetime.time(19, 0, 0)),
+    ("19:00-23:00", datetime.time(19, 0, 0), datetime.time(23, 0, 0)),
+]
+
+def resident_email(andar, apto):
+    return f"morador_{andar}_{apto}@bench.local"
+
+def seed_building(floors=15, laundries_per_floor=2, residents_per_floor=8, months=6, occupancy=0.6, seed=42):
+    rng = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+
+    db.session.execute(db.insert(Andar), [{"numero_andar": i} for i in range(1, floors + 1)])
+    db.session.execute(db.insert(HorarioDisponivel), [
+        {"descricao_horario": d, "hora_inicio": inicio, "hora_fim": fim} for d, inicio, fim in HORARIOS
+    ])
+    andares = {a.numero_andar: a.id_andar for a in Andar.query.all()}
+    db.session.execute(db.insert(Lavanderia), [
+        {"id_andar_fk": id_andar, "identificador_no_andar": f"Lavanderia {n}", "status": "ativa"}
+        for id_andar in andares.values() for n in range(1, laundries_per_floor + 1)
+    ])
+
+    senha_hash = generate_password_hash(BENCH_PASSWORD)  # Mesmo hash para todos: o seed não mede hashing
+    moradores = [{
+        "nome_completo": "Administrador Benchmark", "email": ADMIN_EMAIL, "senha_hash": senha_hash,
+        "id_andar_fk": andares[1], "numero_apartamento": "100", "ativo": True, "is_admin": True
+    }]
+    for numero, id_andar in andares.items():
+        for apto in range(1, residents_per_floor + 1):
+            moradores.append({
+                "nome_completo": f"Morador {numero}-{apto}", "email": resident_email(numero, apto), "senha_hash": senha_hash,
+                "id_andar_fk": id_andar, "numero_apartamento": f"{numero}{apto:02d}", "ativo": True, "is_admin": False
+            })
+    db.session.execute(db.insert(Morador), moradores)
+    db.session.commit()
+
+    # Histórico: para cada dia dos últimos N meses, cada (lavanderia, horário) ocupado com probabilidade "occupancy"
+    moradores_por_andar = {}
+    for id_morador, id_andar in db.session.execute(db.select(Morador.id_morador, Morador.id_andar_fk)):
+        moradores_por_andar.setdefault(id_andar, []).append(id_morador)
+    lavanderias = db.session.execute(db.select(Lavanderia.id_lavanderia, Lavanderia.id_andar_fk)).all()
+    horarios = [h.id_horario for h in HorarioDisponivel.query.all()]
+    hoje = datetime.date.today()
+    inicio = hoje - datetime.timedelta(days=30 * months)
+    lote = []
+    total = 0
+    dia = inicio
+    while dia < hoje:
+        for id_lavanderia, id_andar in lavanderias:
+            for id_horario in horarios:
+                if rng.random() < occupancy:
+                    lote.append({
+                        "id_morador_fk": rng.choice(moradores_por_andar[id_andar]),
+                        "id_lavanderia_fk": id_lavanderia,
+                        "id_horario_fk": id_horario,
+                        "data_agendamento": dia,
+                        "status_agendamento": "concluido" if rng.random() > 0.1 else "cancelado"
+                    })
+        if len(lote) >= 5000:
+            db.session.execute(db.insert(Agendamento), lote)
+            total += len(lote)
+            lote = []
+        dia += datetime.timedelta(days=1)
+    if lote:
+        db.session.execute(db.insert(Agendamento), lote)
+        total += len(lote)
+    db.session.commit()
+    backfill_usage()  # Inserts em lote não passam pelas escritas que mantêm o agregado
+    return {"floors": floors, "laundries": len(lavanderias), "residents": len(moradores) - 1, "bookings": total}
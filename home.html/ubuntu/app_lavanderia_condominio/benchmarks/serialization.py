@@ -0,0 +1,127 @@
+# benchmarks/serialization.py
+# Compara a serialização das respostas JSON: provider padrão do Flask, provider compacto da biblioteca
+# padrão e orjson (src/json_provider.py), com a listagem administrativa em linhas e em colunas.
+# Mede o tempo só de encode (payload já montado) e a latência ponta a ponta pelo test client, e o
+# tamanho do corpo sem compressão, com gzip e com brotli (se instalado).
+# "flask" é o provider padrão do Flask, que o app usava; os serializadores entregam as datas já em
+# ISO 8601, então os três providers produzem o mesmo conteúdo.
+#
+# Uso (a partir da raiz do app; orjson/brotli em requirements-fast.txt):
+#   python -m benchmarks.serialization --iterations 200
+import argparse
+import datetime
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.run import APP_ROOT, NO_RATE_LIMITS, percentile, git_commit
+
+PROVIDERS = {
+    "flask": "flask.json.provider:DefaultJSONProvider",  # Referência: o provider que o app usava
+    "default": "default",
+    "orjson": "orjson",
+}
+
+def timed(fn, iterations):
+    valores = []
+    for _ in range(iterations):
+        inicio = time.perf_counter()
+        fn()
+        valores.append(time.perf_counter() - inicio)
+    valores.sort()
+    return {"p50_ms": round(percentile(valores, 50) * 1000, 3), "p95_ms": round(percentile(valores, 95) * 1000, 3)}
+
+def sizes(body):
+    tamanhos = {"raw": len(body), "gzip": len(gzip.compress(body, compresslevel=6, mtime=0))}
+    try:
+        import brotli
+        tamanhos["br"] = len(brotli.compress(body, quality=4))
+    except ImportError:
+        tamanhos["br"] = None
+    return tamanhos
+
+def run_provider(nome, args, database_url):
+    from src.main import create_app
+    from src.services.booking_history import HistoryFilters, fetch_history_page, history_page_payload
+    from src.services.slots import build_slot_grid
+    from src.services.reference_data import reference_data, serialize_laundries
+    from benchmarks.seed import BENCH_PASSWORD, ADMIN_EMAIL
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": database_url, "SECRET_KEY": "benchmark", "JSON_PROVIDER": PROVIDERS[nome],
+                      "COMPRESS_ENCODINGS": "", **NO_RATE_LIMITS})
+    resultados = {"encode": {}, "endpoint": {}, "bytes": {}}
+    with app.app_context():
+        limite = args.limit
+        rows = fetch_history_page(HistoryFilters(), None, limite)
+        inicio = datetime.date.today()
+        payloads = {
+            "bookings_rows": history_page_payload(rows, limite, "rows"),
+            "bookings_columnar": history_page_payload(rows, limite, "columnar"),
+            "slots_31d": build_slot_grid(1, inicio, inicio + datetime.timedelta(days=30)),
+            "laundries": serialize_laundries(reference_data.get()),
+        }
+        for chave, payload in payloads.items():
+            resultados["encode"][chave] = timed(lambda: app.json.response(payload).get_data(), args.iterations)
+            resultados["bytes"][chave] = sizes(app.json.response(payload).get_data())
+
+    client = app.test_client()
+    status = client.post("/api/login", json={"email": ADMIN_EMAIL, "senha": BENCH_PASSWORD}).status_code
+    if status != 200:
+        raise RuntimeError(f"Login do administrador falhou ({status}).")
+    with client.session_transaction() as sessao:
+        sessao["andar_id"] = 1  # Grade do andar 1 também para o administrador
+    fim = (datetime.date.today() + datetime.timedelta(days=30)).isoformat()
+    endpoints = {
+        "bookings_rows": f"/api/admin/all_bookings?limit={args.limit}",
+        "bookings_columnar": f"/api/admin/all_bookings?limit={args.limit}&format=columnar",
+        "slots_31d": f"/api/laundries/slots?date_start={datetime.date.today().isoformat()}&date_end={fim}",
+    }
+    for chave, path in endpoints.items():
+        resultados["endpoint"][chave] = timed(lambda: client.get(path, headers={"If-None-Match": ""}).get_data(), args.iterations)
+    return resultados
+
+def print_results(results):
+    print(f"\n{'':20s}" + "".join(f"{nome:>22s}" for nome in results))
+    for secao, titulo in (("encode", "encode p50 (ms)"), ("endpoint", "endpoint p50 (ms)")):
+        print(titulo)
+        for chave in results["orjson"][secao]:
+            print(f"  {chave:18s}" + "".join(f"{r[secao][chave]['p50_ms']:22.3f}" if chave in r[secao] else f"{'-':>22s}"
+                                             for r in results.values()))
+    print("bytes (raw / gzip / br)")
+    for chave in results["orjson"]["bytes"]:
+        linha = "".join(f"{'/'.join(str(r['bytes'][chave][k]) for k in ('raw', 'gzip', 'br')):>22s}" for r in results.values())
+        print(f"  {chave:18s}{linha}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara providers JSON e formatos de resposta")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=500, help="Linhas por página da listagem administrativa")
+    parser.add_argument("--floors", type=int, default=15)
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='lavanderia-serialization-'), 'bench.db')}"
+    from src.main import create_app
+    from benchmarks.seed import seed_building
+    app = create_app({"SQLALCHEMY_DATABASE_URI": database_url, "SECRET_KEY": "benchmark"})
+    with app.app_context():
+        building = seed_building(args.floors, months=args.months, seed=args.seed)
+    print(f"Prédio sintético: {building}")
+
+    results = {nome: run_provider(nome, args, database_url) for nome in PROVIDERS}
+    print_results(results)
+
+    output = args.output or os.path.join(APP_ROOT, "benchmarks", "results", f"{git_commit() or 'local'}-serialization.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"meta": {"commit": git_commit(), "params": vars(args), "building": building}, "results": results}, f, indent=2)
+    print(f"\nResultados salvos em {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
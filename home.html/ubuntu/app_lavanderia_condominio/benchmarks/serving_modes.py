@@ -0,0 +1,107 @@
+# benchmarks/serving_modes.py
+# Compara o modo síncrono (gunicorn "src.main:create_app()") com o modo assíncrono (uvicorn src.asgi:app)
+# no mesmo número de workers, sob uma carga só de leitura com muitos clientes simultâneos.
+#
+# Uso (a partir da raiz do app; requer requirements-async.txt):
+#   python -m benchmarks.serving_modes --workers 2 --clients 64 --iterations 20
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.run import APP_ROOT, NO_RATE_LIMITS, Recorder, HttpSession, free_port, wait_for_port, git_commit
+
+SERVERS = {
+    "sync": lambda port, workers: [sys.executable, "-m", "gunicorn", "src.main:create_app()", "--preload", "-w", str(workers),
+                                   "-b", f"127.0.0.1:{port}", "--log-level", "warning"],
+    "async": lambda port, workers: [sys.executable, "-m", "uvicorn", "src.asgi:app", "--workers", str(workers),
+                                    "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+}
+
+def read_workload(session, recorder, email, password, iterations, rng, is_admin):
+    status, _ = recorder.timed("login", lambda: session.request("POST", "/api/login", {"email": email, "senha": password}))
+    if status != 200:
+        return
+    for _ in range(iterations):
+        if is_admin:
+            recorder.timed("admin_listing", lambda: session.request("GET", "/api/admin/all_bookings?limit=100"))
+            recorder.timed("admin_floors", lambda: session.request("GET", "/api/admin/floors"))
+        else:
+            inicio = datetime.date.today() + datetime.timedelta(days=rng.randint(0, 30))
+            fim = inicio + datetime.timedelta(days=6)
+            recorder.timed("slots_week", lambda: session.request(
+                "GET", f"/api/laundries/slots?date_start={inicio.isoformat()}&date_end={fim.isoformat()}"))
+            recorder.timed("my_bookings", lambda: session.request("GET", "/api/bookings/mine"))
+
+def run_mode(mode, args):
+    from benchmarks.seed import BENCH_PASSWORD, ADMIN_EMAIL, resident_email
+    port = free_port()
+    server = subprocess.Popen(SERVERS[mode](port, args.workers), cwd=APP_ROOT, env=dict(os.environ))
+    try:
+        if not wait_for_port(port):
+            raise RuntimeError(f"Servidor {mode} não respondeu a tempo.")
+        recorder = Recorder()
+        rng = random.Random(args.seed)
+        threads = []
+        for i in range(args.clients):
+            is_admin = i < args.admin_clients
+            email = ADMIN_EMAIL if is_admin else resident_email(rng.randint(1, args.floors), rng.randint(1, 8))
+            threads.append(threading.Thread(target=read_workload, args=(
+                HttpSession(f"http://127.0.0.1:{port}"), recorder, email, BENCH_PASSWORD, args.iterations,
+                random.Random(args.seed + i), is_admin)))
+        inicio = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return recorder.report(time.perf_counter() - inicio, count_sql=False)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara os modos de serviço síncrono e assíncrono")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--admin-clients", type=int, default=2)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--floors", type=int, default=15)
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    database_path = os.path.join(tempfile.mkdtemp(prefix="lavanderia-serving-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ.setdefault("DB_PROFILE", "production")
+    os.environ.setdefault("SECRET_KEY", "benchmark")  # Sessões válidas entre workers
+    os.environ.update(NO_RATE_LIMITS)  # Herdado pelos servidores
+    from src.main import create_app
+    app = create_app()
+    from benchmarks.seed import seed_building
+    with app.app_context():
+        building = seed_building(args.floors, months=args.months, seed=args.seed)
+    print(f"Prédio sintético: {building}")
+
+    results = {}
+    for mode in ("sync", "async"):
+        results[mode] = run_mode(mode, args)
+        print(f"\n[{mode}] {results[mode]['rps']} req/s")
+        for endpoint, s in results[mode]["endpoints"].items():
+            print(f"  {endpoint:14s} p50 {s['p50_ms']:9.3f}  p95 {s['p95_ms']:9.3f}  p99 {s['p99_ms']:9.3f} ms  erros {s['errors']}  4xx {s['client_errors']}")
+
+    output = args.output or os.path.join(APP_ROOT, "benchmarks", "results", f"{git_commit() or 'local'}-serving-modes.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"meta": {"commit": git_commit(), "params": vars(args), "building": building}, "results": results}, f, indent=2)
+    print(f"\nResultados salvos em {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+# src/asgi.py
+# Modo de serviço assíncrono (opcional), ao lado do blueprint síncrono.
+# Os endpoints de leitura mais acessados rodam como handlers async sobre a engine assíncrona do
+# SQLAlchemy (aiosqlite localmente, aiomysql para MySQL); todo o resto é repassado ao app Flask.
+# Com TENANCY_MODE ligado tudo é repassado ao Flask: a engine assíncrona aponta para um único banco.
+# A engine assíncrona segue o DB_PROFILE (pool e PRAGMAs) e a instrumentação de consultas do Flask:
+# os handlers respondem com Server-Timing, entram no histograma de /api/admin/metrics com o nome do
+# endpoint do blueprint e comprimem o JSON como src/http_compression.py. As rotas servidas aqui são
+# só leituras, que o blueprint também não limita (rate limit vale para login e escritas, no Flask).
+#
+# Dependências extras: pip install -r requirements-async.txt
+# Uso: uvicorn src.asgi:app --workers 4
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asgiref.wsgi import WsgiToAsgi
+from itsdangerous import BadSignature
+from werkzeug.http import parse_etags, parse_accept_header
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from urllib.parse import parse_qs
+from src.main import create_app
+from src.db_profile import engine_options, install_sqlite_pragmas
+from src.instrumentation import instrument_engine, start_request_stats, server_timing, finish_request
+from src.http_compression import response_compression
+from src.tenancy import tenant_engines
+from src.services.reference_data import reference_data, serialize_laundries, serialize_floors
+from src.services.principal_cache import principal_cache
+from src.services.resource_versions import resource_versions
+from src.http_cache import API_CACHE_CONTROL
+from src.services.slots import (parse_slot_range, iter_dates, floor_occupancy_select, group_occupancy,
+                                cached_bitmasks, store_bitmasks, render_slot_grid, SlotRangeError)
+from src.services.slot_events import (slot_event_hub, Subscription, open_subscription, stream_prelude, parse_last_event_id,
+                                      FeedOverloaded, HEARTBEAT_FRAME)
+from src.services.booking_history import (parse_history_filters, parse_page_limit, parse_page_format, history_page_select,
+                                          history_page_payload, decode_cursor, my_bookings_select, serialize_my_booking,
+                                          wants_page, HistoryFilterError, HISTORY_MODELS)
+import asyncio
+import time
+
+def async_database_url(url):
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    if url.startswith("mysql+pymysql://"):
+        return "mysql+aiomysql://" + url[len("mysql+pymysql://"):]
+    return url
+
+def create_read_engine(app):
+    # Mesmas opções da engine do Flask (src/db_profile.py), com o pool na variante assíncrona
+    uri, profile = app.config["SQLALCHEMY_DATABASE_URI"], app.config["DB_PROFILE"]
+    options = engine_options(uri, profile, app.config.get("WEB_THREADS"))
+    if options.get("poolclass") is QueuePool:
+        options["poolclass"] = AsyncAdaptedQueuePool
+    engine = create_async_engine(async_database_url(uri), **options)
+    install_sqlite_pragmas(engine.sync_engine, profile)
+    instrument_engine(engine.sync_engine)
+    return engine
+
+def request_header(scope, name):
+    return next((v.decode("latin-1") for k, v in scope.get("headers", ()) if k == name), None)
+
+async def wait_disconnect(receive):
+    # O corpo (vazio) do GET chega antes; só http.disconnect encerra
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+class AsyncSubscription(Subscription):
+    # Mesma assinatura do feed síncrono; a entrega atravessa da thread de leitura do log para o event loop
+    def __init__(self, id_andar, datas, start_id, max_pending=256, loop=None):
+        super().__init__(id_andar, datas, start_id, max_pending)
+        self.loop = loop
+        self.queue = asyncio.Queue(max_pending)
+
+    def deliver(self, evento):
+        try:
+            self.loop.call_soon_threadsafe(self._put, evento)
+        except RuntimeError:
+            pass  # Loop já encerrado
+
+    def _put(self, evento):
+        try:
+            self.queue.put_nowait(evento)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+class AsyncReadApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.engine = create_read_engine(flask_app)
+        self.fallback = WsgiToAsgi(flask_app)
+        self.session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        self.routes = {
+            "/api/laundries/slots": self.laundry_slots,
+            "/api/bookings/mine": self.my_bookings,
+            "/api/admin/all_bookings": self.all_bookings,
+            "/api/admin/all_laundries": self.all_laundries,
+            "/api/admin/floors": self.floors,
+        }
+        self.streams = {
+            "/api/laundries/events": self.slot_events,
+        }
+        if tenant_engines.enabled:
+            self.routes, self.streams = {}, {}
+        urls = flask_app.url_map.bind("localhost")
+        self.endpoints = {path: urls.match(path, method="GET")[0] for path in [*self.routes, *self.streams]}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        leitura = scope["type"] == "http" and scope["method"] == "GET"
+        args = {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+        if leitura and scope.get("path") in self.streams:
+            stats = start_request_stats()
+            try:
+                return await self.streams[scope["path"]](scope, receive, send, args)
+            finally:
+                finish_request(self.flask_app.logger, self.endpoints[scope["path"]], time.perf_counter() - stats.inicio,
+                               stats, streamed=True)
+        handler = self.routes.get(scope.get("path")) if leitura else None
+        if handler is None or args.get("stream") or (handler == self.all_bookings and not wants_page(args)):
+            # Escritas, autenticação e listagens enviadas em streaming (NDJSON, lista completa) continuam no Flask
+            return await self.fallback(scope, receive, send)
+        stats = start_request_stats()
+        etags = parse_etags(request_header(scope, b"if-none-match"))
+        try:
+            status, payload, *etag = await handler(self.load_session(scope), args, etags)
+        except Exception as e:
+            self.flask_app.logger.error(f"Erro no handler assíncrono {scope['path']}: {e}")
+            status, payload, etag = 500, {"error": "Erro interno."}, ()
+        etag = etag[0] if etag else None
+        headers = [(b"cache-control", API_CACHE_CONTROL.encode())] if etag else []
+        await self.send_json(send, status, payload, headers, etag=etag, stats=stats,
+                             accept_encoding=request_header(scope, b"accept-encoding"))
+        finish_request(self.flask_app.logger, self.endpoints[scope["path"]], time.perf_counter() - stats.inicio, stats)
+
+    async def send_json(self, send, status, payload, headers=(), etag=None, stats=None, accept_encoding=None):
+        headers = list(headers)
+        vary = ["Cookie"] if etag else []
+        if stats is not None:
+            headers.append((b"server-timing", server_timing(time.perf_counter() - stats.inicio, stats).encode()))
+        body = b"" if payload is None else self.flask_app.json.dumps(payload).encode()  # Mesmo provider do Flask (src/json_provider.py)
+        encoding = None
+        if status == 200 and response_compression.negotiable(body):
+            vary.append("Accept-Encoding")
+            encoding, body = response_compression.compress(body, parse_accept_header(accept_encoding))
+        if encoding:
+            headers.append((b"content-encoding", encoding.encode()))
+        if etag:
+            # Versão comprimida: ETag fraco, como no blueprint
+            headers.append((b"etag", (f'W/"{etag}"' if encoding else f'"{etag}"').encode()))
+        if vary:
+            headers.append((b"vary", ", ".join(vary).encode()))
+        if payload is None:  # 304
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers]})
+        await send({"type": "http.response.body", "body": body})
+
+    def not_modified(self, etags, etag):
+        # Mesmo critério do blueprint: o cliente já tem esta versão, nada é montado
+        if etag and etags.contains_weak(etag):
+            resource_versions.not_modified += 1
+            return 304, None, etag
+        return None
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # --- Sessão e dados em cache ---
+    def load_session(self, scope):
+        cookie_name = self.flask_app.config["SESSION_COOKIE_NAME"]
+        for name, value in scope.get("headers", ()):
+            if name != b"cookie":
+                continue
+            for part in value.decode("latin-1").split(";"):
+                key, _, cookie = part.strip().partition("=")
+                if key == cookie_name and cookie:
+                    try:
+                        max_age = int(self.flask_app.permanent_session_lifetime.total_seconds())
+                        return self.session_serializer.loads(cookie, max_age=max_age)
+                    except BadSignature:
+                        return {}
+        return {}
+
+    async def run_sync(self, fn, *args):
+        # Falhas de cache recorrem ao código síncrono numa thread, dentro do app context
+        def call():
+            with self.flask_app.app_context():
+                return fn(*args)
+        return await asyncio.to_thread(call)
+
+    async def sync_events(self):
+        # Leitura do log sob demanda (sem conexões SSE abertas): caches e versões dos ETags em dia
+        if slot_event_hub.sync_due():
+            await self.run_sync(slot_event_hub.sync)
+
+    async def reference(self):
+        return reference_data.peek() or await self.run_sync(reference_data.get)
+
+    async def is_active_admin(self, session):
+        morador_id = session.get("morador_id")
+        principal = principal_cache.peek(morador_id) or await self.run_sync(principal_cache.get, morador_id)
+        return bool(principal and principal.is_admin and principal.ativo)
+
+    async def admin_guard(self, session):
+        if "morador_id" not in session:
+            return 401, {"error": "Não autenticado"}
+        if not await self.is_active_admin(session):
+            return 403, {"error": "Acesso não autorizado. Requer privilégios de administrador."}
+        return None
+
+    # --- Handlers de leitura (mesmas respostas do blueprint síncrono) ---
+    async def laundry_slots(self, session, args, etags):
+        if "morador_id" not in session:
+            return 401, {"error": "Não autenticado"}
+        andar_id = session.get("andar_id")
+        if not andar_id:
+            return 400, {"error": "Data e informação do andar são obrigatórios."}
+        try:
+            date_start, date_end, data_unica = parse_slot_range(args)
+        except SlotRangeError as e:
+            return 400, {"error": str(e)}
+
+        dias = list(iter_dates(date_start, date_end))
+        await self.sync_events()
+        etag = resource_versions.slots_etag(andar_id, dias, "dia" if data_unica else "intervalo")
+        cached = self.not_modified(etags, etag)
+        if cached:
+            return cached
+        ref = await self.reference()
+        lavanderias = ref.lavanderias_ativas(andar_id)
+        bitmasks, faltantes, geracao = cached_bitmasks(lavanderias, dias)
+        if faltantes:
+            inicio, fim = min(faltantes), max(faltantes)
+            async with self.engine.connect() as conn:
+                result = await conn.execute(floor_occupancy_select(andar_id, inicio, fim))
+                _, ocupados = group_occupancy(result.all())
+            store_bitmasks(lavanderias, inicio, fim, ocupados, bitmasks, geracao)
+        grid = render_slot_grid(ref, lavanderias, dias, bitmasks)
+        return 200, grid[date_start.isoformat()] if data_unica else grid, etag
+
+    async def my_bookings(self, session, args, etags):
+        if "morador_id" not in session:
+            return 401, {"error": "Não autenticado"}
+        ref = await self.reference()
+        async with self.engine.connect() as conn:
+            result = await conn.execute(my_bookings_select(session["morador_id"]))
+            return 200, [serialize_my_booking(row, ref) for row in result.all()]
+
+    async def all_bookings(self, session, args, etags):
+        negado = await self.admin_guard(session)
+        if negado:
+            return negado
+        try:
+            filters = parse_history_filters(args)
+            limit = parse_page_limit(args)
+            formato = parse_page_format(args)
+            if args.get("cursor"):
+                decode_cursor(args["cursor"])  # Cursor inválido: 400 antes de abrir a conexão
+        except HistoryFilterError as e:
+            return 400, {"error": str(e)}
+        rows = []
+        async with self.engine.connect() as conn:
+            for modelo in HISTORY_MODELS:  # Mesmo critério de fetch_history_page
+                rows += (await conn.execute(history_page_select(filters, args.get("cursor"), limit - len(rows), modelo))).all()
+                if len(rows) > limit:
+                    break
+        return 200, history_page_payload(rows, limit, formato)
+
+    async def all_laundries(self, session, args, etags):
+        await self.sync_events()
+        etag = resource_versions.laundries_etag()
+        return (await self.admin_guard(session) or self.not_modified(etags, etag)
+                or (200, serialize_laundries(await self.reference()), etag))
+
+    async def floors(self, session, args, etags):
+        await self.sync_events()
+        etag = resource_versions.floors_etag()
+        return (await self.admin_guard(session) or self.not_modified(etags, etag)
+                or (200, serialize_floors(await self.reference()), etag))
+
+    # --- Feed SSE: uma conexão custa uma fila no event loop, não uma thread ---
+    async def slot_events(self, scope, receive, send, args):
+        session = self.load_session(scope)
+        if "morador_id" not in session:
+            return await self.send_json(send, 401, {"error": "Não autenticado"})
+        andar_id = session.get("andar_id")
+        if not andar_id:
+            return await self.send_json(send, 400, {"error": "Data e informação do andar são obrigatórios."})
+        try:
+            date_start, date_end, _ = parse_slot_range(args)
+        except SlotRangeError as e:
+            return await self.send_json(send, 400, {"error": str(e)})
+
+        headers = {"Last-Event-ID": request_header(scope, b"last-event-id")}
+        last_event_id = parse_last_event_id(headers, args)
+        loop = asyncio.get_running_loop()
+
+        def open_feed():
+            subscription = open_subscription(andar_id, iter_dates(date_start, date_end), last_event_id,
+                                             subscription_class=AsyncSubscription, loop=loop)
+            return subscription, stream_prelude(subscription, last_event_id)
+        try:
+            subscription, prelude = await self.run_sync(open_feed)
+        except FeedOverloaded:
+            return await self.send_json(send, 503, {"error": "Muitas conexões abertas. Tente novamente em instantes."},
+                                        [(b"retry-after", b"5")])
+
+        desconectado = asyncio.ensure_future(wait_disconnect(receive))
+        try:
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"),
+                                    (b"x-accel-buffering", b"no")]})
+            await send({"type": "http.response.body", "body": "".join(prelude).encode(), "more_body": True})
+            fim = loop.time() + slot_event_hub.stream_timeout
+            while not subscription.overflowed:
+                restante = fim - loop.time()
+                if restante <= 0:
+                    break  # O navegador reconecta com Last-Event-ID
+                proximo = asyncio.ensure_future(subscription.queue.get())
+                done, _ = await asyncio.wait({proximo, desconectado}, timeout=min(slot_event_hub.heartbeat, restante),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if proximo not in done:
+                    proximo.cancel()
+                if desconectado in done:
+                    return
+                if proximo in done:
+                    evento = proximo.result()
+                    if not subscription.accept(evento):
+                        continue
+                    frame = evento.encode()
+                else:
+                    frame = HEARTBEAT_FRAME
+                await send({"type": "http.response.body", "body": frame.encode(), "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            desconectado.cancel()
+            slot_event_hub.unsubscribe(subscription)
+
+app = AsyncReadApp(create_app())
@@ -0,0 +1,75 @@
+# src/db_profile.py
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, StaticPool
+
+# Perfis de engine selecionáveis pela variável de ambiente DB_PROFILE.
+# "pragmas" só se aplica ao SQLite; "pool" é usado conforme o backend (SQLite ou MySQL via PyMySQL).
+# Pool sem pool_size (production): uma conexão por thread de requisição do worker, WEB_THREADS, o
+# mesmo valor passado a --threads no Procfile; max_overflow cobre a thread de leitura do log de
+# eventos. No MySQL o servidor precisa de max_connections >= workers × (WEB_THREADS + max_overflow).
+PROFILES = {
+    "development": {
+        "pragmas": {
+            "busy_timeout": 5000,
+        },
+        "pool": {"pool_size": 5, "max_overflow": 5},
+    },
+    "production": {
+        "pragmas": {
+            "auto_vacuum": "INCREMENTAL",   # Antes do WAL: só vale em banco vazio; existentes: archive-bookings --vacuum-completo
+            "journal_mode": "WAL",          # Leitores não bloqueiam o escritor
+            "synchronous": "NORMAL",        # Seguro com WAL; um fsync por checkpoint, não por commit
+            "busy_timeout": 5000,           # Espera pelo lock em vez de "database is locked"
+            "mmap_size": 268435456,         # 256 MB de leitura via mmap
+            "cache_size": -16000,           # ~16 MB de page cache por conexão
+            "temp_store": "MEMORY",
+        },
+        "pool": {"max_overflow": 4, "pool_timeout": 10},
+    },
+}
+
+DEFAULT_PROFILE = "development"
+DEFAULT_WEB_THREADS = 32  # --threads do gunicorn no Procfile
+
+def get_profile(name):
+    if name not in PROFILES:
+        raise ValueError(f"Perfil de banco desconhecido: {name}. Use um de {sorted(PROFILES)}.")
+    return PROFILES[name]
+
+def engine_options(uri, profile_name, threads=None):
+    profile = get_profile(profile_name)
+    pool = {"pool_size": threads or DEFAULT_WEB_THREADS, **profile["pool"]}
+    if uri.startswith("sqlite"):
+        if uri in ("sqlite://", "sqlite:///:memory:"):
+            # Banco em memória: uma única conexão compartilhada
+            return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+        return {
+            "poolclass": QueuePool,
+            # O busy_timeout do PRAGMA cuida da espera; o timeout do driver acompanha em segundos
+            "connect_args": {"timeout": profile["pragmas"].get("busy_timeout", 5000) / 1000},
+            **pool,
+        }
+    # MySQL (PyMySQL) e demais backends de rede
+    return {"pool_pre_ping": True, "pool_recycle": 280, **pool}
+
+def install_sqlite_pragmas(engine, profile_name):
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = get_profile(profile_name)["pragmas"]
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def configure_database(app, uri, profile_name):
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    app.config["DB_PROFILE"] = profile_name
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(uri, profile_name, app.config.get("WEB_THREADS"))
+
+def init_engine_profile(app, db):
+    # Chamado após db.init_app: a engine já existe, mas ainda não abriu conexões
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config["DB_PROFILE"])
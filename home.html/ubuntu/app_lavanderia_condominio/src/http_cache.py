@@ -0,0 +1,84 @@
+# src/http_cache.py
+from flask import Response, current_app, request, send_from_directory
+from werkzeug.security import safe_join
+from src.services.resource_versions import resource_versions
+import hashlib
+import os
+import re
+import threading
+
+# Cache HTTP condicional.
+# API: ETag forte vindo de resource_versions, calculado antes de montar a resposta; If-None-Match é
+# respondido com 304 sem ir ao banco. As respostas dependem da sessão, então o navegador guarda e
+# revalida a cada uso ("private, no-cache").
+# Estáticos: as páginas HTML saem com css/js reescritos para URLs com fingerprint do conteúdo
+# (/js/script.js?v=<hash>); quem pede a versão atual recebe cache longo e imutável, o resto revalida.
+API_CACHE_CONTROL = "private, no-cache"
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ASSET_REF = re.compile(r'(src|href)="((?:css|js)/[^"?#]+)"')
+
+def not_modified(etag):
+    # Resposta 304 se o cliente já tem esta versão; None caso contrário
+    if not etag or not request.if_none_match.contains_weak(etag):
+        return None
+    resource_versions.not_modified += 1
+    return with_etag(current_app.response_class(status=304), etag)
+
+def with_etag(response, etag):
+    if etag:
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = API_CACHE_CONTROL
+    response.vary.add("Cookie")
+    return response
+
+class StaticAssets:
+    def __init__(self, folder=None):
+        self.folder = folder
+        self._fingerprints = {}  # caminho -> ((mtime_ns, tamanho), hash)
+        self._lock = threading.Lock()
+
+    def fingerprint(self, path):
+        full_path = safe_join(self.folder, path)
+        if full_path is None or not os.path.isfile(full_path):
+            return None
+        stat = os.stat(full_path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._fingerprints.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with open(full_path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:12]
+        with self._lock:
+            self._fingerprints[path] = (key, digest)
+        return digest
+
+    def asset_url(self, path):
+        digest = self.fingerprint(path)
+        # script_root: prefixo do tenant no modo path (src/tenancy.py)
+        return f"{request.script_root}/{path}?v={digest}" if digest else f"{request.script_root}/{path}"
+
+    def send_page(self, name):
+        with open(os.path.join(self.folder, name), encoding="utf-8") as f:
+            html = f.read()
+        body = ASSET_REF.sub(lambda m: f'{m.group(1)}="{self.asset_url(m.group(2))}"', html)
+        response = Response(body, mimetype="text/html")
+        response.set_etag(hashlib.sha1(body.encode()).hexdigest()[:20])
+        response.cache_control.no_cache = True  # A página sempre revalida: é ela que aponta para os fingerprints
+        return response.make_conditional(request)
+
+    def send_asset(self, path):
+        response = send_from_directory(self.folder, path)  # ETag/Last-Modified e 304 do próprio Werkzeug
+        versao = request.args.get("v")
+        if versao and versao == self.fingerprint(path):
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+static_assets = StaticAssets()
+
+def init_http_cache(app):
+    static_assets.folder = app.static_folder
@@ -0,0 +1,99 @@
+# src/http_compression.py
+from flask import request
+import gzip
+import threading
+
+try:
+    import brotli
+except ImportError:  # Opcional: requirements-fast.txt
+    brotli = None
+
+# Compressão das respostas JSON da API, negociada pelo Accept-Encoding.
+# COMPRESS_ENCODINGS lista as codificações em ordem de preferência ("br,gzip"; vazio desliga); br só
+# vale com o pacote brotli instalado. Respostas menores que COMPRESS_MIN_SIZE, streams (SSE,
+# NDJSON, exportações, que já tratam gzip por conta própria), 304 e respostas já codificadas passam
+# direto. Na versão comprimida o ETag vira fraco: If-None-Match é comparado com contains_weak
+# (http_cache.not_modified), então o 304 continua valendo para qualquer codificação.
+DEFAULT_ENCODINGS = "br,gzip"
+DEFAULT_MIN_SIZE = 1024  # Bytes; abaixo disso o cabeçalho e a CPU não compensam
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # Conteúdo dinâmico: razão próxima do gzip 9 por uma fração da CPU
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+def _brotli(data):
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+COMPRESSORS = {"gzip": _gzip}
+if brotli is not None:
+    COMPRESSORS["br"] = _brotli
+
+class ResponseCompression:
+    def __init__(self, encodings=DEFAULT_ENCODINGS, min_size=DEFAULT_MIN_SIZE):
+        self.encodings = []
+        self.min_size = min_size
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.configure(encodings)
+
+    def configure(self, encodings=None, min_size=None):
+        if encodings is not None:
+            # Codificações sem compressor instalado são ignoradas
+            self.encodings = [e.strip() for e in encodings.split(",") if e.strip() in COMPRESSORS]
+        if min_size is not None:
+            self.min_size = min_size
+
+    def negotiable(self, data):
+        # Corpo JSON grande o bastante para depender do Accept-Encoding (Vary)
+        return bool(self.encodings) and len(data) >= self.min_size
+
+    def compress(self, data, accept_encodings):
+        # (codificação, corpo comprimido), ou (None, data) se o cliente não aceita nenhuma das configuradas
+        encoding = accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return None, data
+        comprimido = COMPRESSORS[encoding](data)
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(comprimido)
+        return encoding, comprimido
+
+    def apply(self, response):
+        if (not self.encodings or response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype != "application/json" or "Content-Encoding" in response.headers):
+            return response
+        data = response.get_data()
+        if not self.negotiable(data):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding, comprimido = self.compress(data, request.accept_encodings)
+        if encoding is None:
+            return response
+        response.set_data(comprimido)
+        response.headers["Content-Encoding"] = encoding
+        etag, fraco = response.get_etag()
+        if etag and not fraco:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "compressed": self.compressed,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0
+            }
+
+response_compression = ResponseCompression()
+
+def init_compression(app):
+    response_compression.configure(
+        encodings=app.config.get("COMPRESS_ENCODINGS", DEFAULT_ENCODINGS),
+        min_size=app.config.get("COMPRESS_MIN_SIZE", DEFAULT_MIN_SIZE)
+    )
+    app.after_request(response_compression.apply)
@@ -0,0 +1,211 @@
+# src/instrumentation.py
+from flask import g, has_request_context, request, request_started, request_finished
+from sqlalchemy import event
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+
+# Instrumentação por requisição: número de consultas SQL, tempo total de SQL, consulta mais lenta
+# e tempo de parede do handler. Os dados vão para o header Server-Timing, para um histograma
+# em memória por endpoint e para /api/admin/metrics (formato texto do Prometheus).
+# Respostas em streaming (NDJSON, exportações, SSE) consultam o banco depois de o handler retornar:
+# o Server-Timing sai com o que houve até ali, e o histograma recebe a requisição inteira no close.
+# Os handlers do modo ASGI (src/asgi.py) não têm request context do Flask: as estatísticas da
+# requisição ficam numa ContextVar (start_request_stats), que também segue para as threads de run_sync.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # segundos
+WINDOW_SLICES = 6
+SLICE_SECONDS = 10  # Janela móvel de 60 s
+
+class RequestStats:
+    __slots__ = ("inicio", "query_count", "sql_time", "slowest_sql", "slowest_time")
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.slowest_sql = None
+        self.slowest_time = 0.0
+
+class EndpointHistogram:
+    def __init__(self):
+        # Acumulado desde o início (semântica de contador do Prometheus)
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.duration_sum = 0.0
+        self.sql_queries = 0
+        self.sql_time = 0.0
+        self.slowest_sql = None
+        self.slowest_time = 0.0
+        # Janela móvel: fatias de SLICE_SECONDS com contagens por bucket
+        self.slices = {}  # id da fatia -> contagens por bucket
+
+    def observe(self, duration, stats):
+        index = bisect.bisect_left(BUCKETS, duration)
+        self.bucket_counts[index] += 1
+        self.count += 1
+        self.duration_sum += duration
+        self.sql_queries += stats.query_count
+        self.sql_time += stats.sql_time
+        if stats.slowest_time > self.slowest_time:
+            self.slowest_time = stats.slowest_time
+            self.slowest_sql = stats.slowest_sql
+
+        fatia = int(time.monotonic() // SLICE_SECONDS)
+        self.slices.setdefault(fatia, [0] * (len(BUCKETS) + 1))[index] += 1
+        for antiga in [f for f in self.slices if f <= fatia - WINDOW_SLICES]:
+            del self.slices[antiga]
+
+    def window_quantile(self, q):
+        fatia_minima = int(time.monotonic() // SLICE_SECONDS) - WINDOW_SLICES
+        counts = [0] * (len(BUCKETS) + 1)
+        for fatia, valores in self.slices.items():
+            if fatia > fatia_minima:
+                counts = [a + b for a, b in zip(counts, valores)]
+        total = sum(counts)
+        if not total:
+            return None
+        alvo = q * total
+        acumulado = 0
+        for index, valor in enumerate(counts):
+            acumulado += valor
+            if acumulado >= alvo:
+                return BUCKETS[index] if index < len(BUCKETS) else float("inf")
+        return float("inf")
+
+class Instrumentation:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        self.slow_request_threshold = 0.5
+
+    def observe(self, endpoint, duration, stats):
+        with self._lock:
+            self.endpoints.setdefault(endpoint, EndpointHistogram()).observe(duration, stats)
+
+    def render_prometheus(self):
+        lines = [
+            "# HELP lavanderia_request_duration_seconds Tempo de parede do handler.",
+            "# TYPE lavanderia_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            for endpoint, h in endpoints:
+                acumulado = 0
+                for limite, valor in zip(BUCKETS + ("+Inf",), h.bucket_counts):
+                    acumulado += valor
+                    lines.append(f'lavanderia_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{limite}"}} {acumulado}')
+                lines.append(f'lavanderia_request_duration_seconds_sum{{endpoint="{endpoint}"}} {h.duration_sum:.6f}')
+                lines.append(f'lavanderia_request_duration_seconds_count{{endpoint="{endpoint}"}} {h.count}')
+            lines += ["# HELP lavanderia_request_duration_window_seconds Quantis aproximados na janela móvel.",
+                      "# TYPE lavanderia_request_duration_window_seconds gauge"]
+            for endpoint, h in endpoints:
+                for q in (0.5, 0.95, 0.99):
+                    valor = h.window_quantile(q)
+                    if valor is not None:
+                        lines.append(f'lavanderia_request_duration_window_seconds{{endpoint="{endpoint}",quantile="{q}"}} {valor}')
+            lines += ["# HELP lavanderia_sql_queries_total Consultas SQL emitidas.",
+                      "# TYPE lavanderia_sql_queries_total counter"]
+            lines += [f'lavanderia_sql_queries_total{{endpoint="{e}"}} {h.sql_queries}' for e, h in endpoints]
+            lines += ["# HELP lavanderia_sql_seconds_total Tempo total gasto em SQL.",
+                      "# TYPE lavanderia_sql_seconds_total counter"]
+            lines += [f'lavanderia_sql_seconds_total{{endpoint="{e}"}} {h.sql_time:.6f}' for e, h in endpoints]
+            lines += ["# HELP lavanderia_slowest_sql_seconds Consulta mais lenta observada por endpoint.",
+                      "# TYPE lavanderia_slowest_sql_seconds gauge"]
+            for endpoint, h in endpoints:
+                if h.slowest_sql:
+                    lines.append(f'lavanderia_slowest_sql_seconds{{endpoint="{endpoint}",statement="{_label(h.slowest_sql)}"}} {h.slowest_time:.6f}')
+        return "\n".join(lines) + "\n"
+
+instrumentation = Instrumentation()
+
+def _label(text, limit=160):
+    text = " ".join(text.split())[:limit]
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+def prometheus_gauges(prefix, values):
+    # Converte um dicionário de estatísticas numéricas em linhas de gauge do Prometheus
+    lines = []
+    for name, value in values.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # No contexto de execução do próprio comando: um comando que falha não deixa estado na conexão
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+_async_stats = ContextVar("request_stats", default=None)
+
+def start_request_stats():
+    # Modo ASGI: uma chamada por requisição, na task que a atende
+    stats = RequestStats()
+    _async_stats.set(stats)
+    return stats
+
+def _record_query(context, statement):
+    inicio = getattr(context, "_query_start", None)
+    if inicio is None:
+        return
+    elapsed = time.perf_counter() - inicio
+    stats = g.get("request_stats") if has_request_context() else _async_stats.get()
+    if stats is None:
+        return
+    stats.query_count += 1
+    stats.sql_time += elapsed
+    if elapsed > stats.slowest_time:
+        stats.slowest_time = elapsed
+        stats.slowest_sql = statement
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_query(context, statement)
+
+def _handle_error(exception_context):
+    # Comando que falhou também conta, com o tempo até o erro
+    if exception_context.execution_context is not None:
+        _record_query(exception_context.execution_context, exception_context.statement)
+
+def _on_request_started(sender, **extra):
+    g.request_stats = RequestStats()
+
+def server_timing(duration, stats):
+    return (
+        f'app;dur={duration * 1000:.2f}, '
+        f'sql;dur={stats.sql_time * 1000:.2f};desc="{stats.query_count} queries", '
+        f'sql-slowest;dur={stats.slowest_time * 1000:.2f}'
+    )
+
+def finish_request(logger, endpoint, duration, stats, streamed=False):
+    instrumentation.observe(endpoint, duration, stats)
+    # Streams longos (SSE) são esperados: sem aviso de requisição lenta
+    if not streamed and duration > instrumentation.slow_request_threshold:
+        logger.warning(f"Requisição lenta: {endpoint} {duration * 1000:.1f} ms, {stats.query_count} consultas, "
+                       f"SQL {stats.sql_time * 1000:.1f} ms; mais lenta: {_label(stats.slowest_sql or '-')}")
+
+def _on_request_finished(sender, response, **extra):
+    stats = g.get("request_stats")
+    if stats is None:
+        return
+    duration = time.perf_counter() - stats.inicio
+    endpoint = request.endpoint or "not_found"
+    response.headers["Server-Timing"] = server_timing(duration, stats)
+    if response.is_streamed:
+        response.call_on_close(lambda: finish_request(sender.logger, endpoint, time.perf_counter() - stats.inicio,
+                                                      stats, streamed=True))
+        return
+    finish_request(sender.logger, endpoint, duration, stats)
+
+def instrument_engine(engine):
+    # Também chamado para as engines criadas por tenant (src/tenancy.py)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def init_instrumentation(app, db):
+    instrumentation.slow_request_threshold = app.config.get("SLOW_REQUEST_THRESHOLD", 0.5)
+    with app.app_context():
+        instrument_engine(db.engine)
+    request_started.connect(_on_request_started, app)
+    request_finished.connect(_on_request_finished, app)
@@ -0,0 +1,67 @@
+# src/json_provider.py
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from werkzeug.utils import import_string
+import datetime
+import decimal
+
+try:
+    import orjson
+except ImportError:  # Opcional: requirements-fast.txt
+    orjson = None
+
+# Provider JSON do app (jsonify, request.get_json, app.json.dumps), escolhido por JSON_PROVIDER:
+#   "orjson"        : encoder em C (requirements-fast.txt); sem o pacote, cai para "default"
+#   "default"       : json da biblioteca padrão, como o provider do Flask
+#   "modulo:Classe" : outro provider
+# Nos dois providers daqui as respostas saem compactas (sem indentação, mesmo em debug), em UTF-8 e
+# sem reordenar chaves: os serializadores já montam os dicionários na ordem de exibição.
+# Os serializadores da API escrevem as datas em ISO 8601 e o formato das respostas não depende do
+# provider; date/time que ainda cheguem aqui também saem em ISO 8601 (o Flask usaria o formato HTTP).
+DEFAULT_PROVIDER = "orjson"
+
+def _default(o):
+    # Tipos que nenhum dos encoders trata sozinho
+    if isinstance(o, (datetime.date, datetime.time)):
+        return o.isoformat()
+    if isinstance(o, decimal.Decimal):
+        return str(o)  # SUM/AVG do MySQL
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Objeto do tipo {type(o).__name__} não é serializável em JSON")
+
+class CompactJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+    ensure_ascii = False
+    sort_keys = False
+    compact = True
+
+    def dumps(self, obj, **kwargs):
+        # O compact do Flask só vale para response(); aqui também para streams e o modo assíncrono
+        kwargs.setdefault("separators", (",", ":"))
+        return super().dumps(obj, **kwargs)
+
+class OrjsonProvider(JSONProvider):
+    mimetype = "application/json"
+    # Chaves inteiras (ids) viram texto, como no json da biblioteca padrão
+    options = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Bytes direto para o corpo, sem passar por str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=_default, option=self.options), mimetype=self.mimetype)
+
+PROVIDERS = {"orjson": OrjsonProvider, "default": CompactJSONProvider}
+
+def init_json_provider(app):
+    nome = app.config.get("JSON_PROVIDER") or DEFAULT_PROVIDER
+    if nome == "orjson" and orjson is None:
+        app.logger.warning("JSON_PROVIDER=orjson sem o pacote orjson instalado: usando o json da biblioteca padrão.")
+        nome = "default"
+    provider_class = PROVIDERS.get(nome) or import_string(nome)
+    app.json = provider_class(app)
@@ -5,113 +5,260 @@ import os
 # Ensure the project root is in the Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, jsonify, send_from_directory, session # Added session for redirect logic
-from src.models.models import db, Andar, Lavanderia, HorarioDisponivel, Morador, Agendamento
-from src.routes.api import api_bp, admin_bp # Import both blueprints
+from flask import Flask, current_app, request, session
+from src.models.models import db, Andar, Lavanderia, HorarioDisponivel, Morador
+from src.db_profile import configure_database, init_engine_profile, DEFAULT_PROFILE, DEFAULT_WEB_THREADS
+from src.instrumentation import init_instrumentation
+from src.services.occupancy_cache import init_occupancy_cache
+from src.services.reference_data import init_reference_data
+from src.services.principal_cache import init_principal_cache
+from src.services.hashing import init_hashing, DEFAULT_HASH_METHOD
+from src.services.slot_events import init_slot_events
+from src.services.usage_rollup import init_usage_rollup
+from src.services.archival import init_archival, ensure_increasing_ids, DEFAULT_ARCHIVE_HORIZON_DAYS
+from src.services.rate_limit import init_rate_limit, DEFAULT_LIMITS
+from src.http_cache import init_http_cache, static_assets
+from src.http_compression import init_compression, DEFAULT_ENCODINGS, DEFAULT_MIN_SIZE
+from src.json_provider import init_json_provider, DEFAULT_PROVIDER
+from src.tenancy import init_tenancy, tenant_engines, tenant_options, selected_tenants, each_tenant, DEFAULT_MAX_ENGINES
+from flask.cli import with_appcontext
+from werkzeug.middleware.proxy_fix import ProxyFix
+import click
 import datetime
+import secrets
 
-app = Flask(__name__, static_folder="static")
+# Fábrica da aplicação. create_app não abre conexão com o banco nem inicia threads: esquema e dados
+# iniciais ficam no comando setup-db, rodado uma vez antes dos workers, e os dados de referência, a
+# leitura do log de eventos e o pool de hashing começam no primeiro uso de cada worker. Por isso o app
+# pode ser criado no master do gunicorn (--preload) e compartilhado pelos workers após o fork.
+#   gunicorn "src.main:create_app()" --preload
+#   flask --app src.main setup-db
+# Vários condomínios no mesmo deploy: TENANCY_MODE=host|path, um banco por tenant (src/tenancy.py)
+#   flask --app src.main setup-db --tenant predio-a
+SECRET_KEY_FILE = "secret_key"  # Em app.instance_path, criado pelo setup-db
 
-# --- Database Configuration ---
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database.db')}"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SECRET_KEY"] = os.urandom(24) # For session management
+def default_config():
+    # Configuração a partir do ambiente; create_app(config) sobrepõe qualquer chave
+    return {
+        # DATABASE_URL permite apontar para MySQL (mysql+pymysql://...); DB_PROFILE escolhe o perfil da engine
+        "SQLALCHEMY_DATABASE_URI": os.environ.get("DATABASE_URL", f"sqlite:///{os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database.db')}"),
+        "DB_PROFILE": os.environ.get("DB_PROFILE", DEFAULT_PROFILE),
+        "WEB_THREADS": int(os.environ.get("WEB_THREADS", DEFAULT_WEB_THREADS)), # --threads do gunicorn: tamanho do pool (src/db_profile.py)
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        "SECRET_KEY": os.environ.get("SECRET_KEY"), # Sem variável: arquivo da instância (setup-db)
+        # --- Occupancy Cache Configuration ---
+        "OCCUPANCY_CACHE_MAX_ENTRIES": int(os.environ.get("OCCUPANCY_CACHE_MAX_ENTRIES", 4096)),
+        "OCCUPANCY_CACHE_TTL": float(os.environ.get("OCCUPANCY_CACHE_TTL", 30)), # Limita a defasagem entre workers
+        "OCCUPANCY_CACHE_PAST_TTL": float(os.environ.get("OCCUPANCY_CACHE_PAST_TTL", 5)),
+        "REFERENCE_DATA_TTL": float(os.environ.get("REFERENCE_DATA_TTL", 60)),
+        "PRINCIPAL_CACHE_TTL": float(os.environ.get("PRINCIPAL_CACHE_TTL", 30)), # Janela máxima para rebaixamento/desativação valer
+        "PASSWORD_HASH_METHOD": os.environ.get("PASSWORD_HASH_METHOD", DEFAULT_HASH_METHOD), # Ex.: "pbkdf2:sha256:600000"
+        "PASSWORD_HASH_WORKERS": int(os.environ.get("PASSWORD_HASH_WORKERS", 2)), # 0 = sem pool de processos
+        "PASSWORD_HASH_QUEUE_LIMIT": int(os.environ.get("PASSWORD_HASH_QUEUE_LIMIT", 8)),
+        "SLOT_EVENTS_POLL_INTERVAL": float(os.environ.get("SLOT_EVENTS_POLL_INTERVAL", 0.5)), # Leitura do log de eventos, por worker
+        "SLOT_EVENTS_HEARTBEAT": float(os.environ.get("SLOT_EVENTS_HEARTBEAT", 15)),
+        "SLOT_EVENTS_MAX_STREAMS": int(os.environ.get("SLOT_EVENTS_MAX_STREAMS", 24)), # Por worker; abaixo de --threads
+        "SLOT_EVENTS_STREAM_TIMEOUT": float(os.environ.get("SLOT_EVENTS_STREAM_TIMEOUT", 300)),
+        "SLOT_EVENTS_RETENTION": float(os.environ.get("SLOT_EVENTS_RETENTION", 3600)), # Janela de retomada por Last-Event-ID
+        "ARCHIVE_HORIZON_DAYS": int(os.environ.get("ARCHIVE_HORIZON_DAYS", DEFAULT_ARCHIVE_HORIZON_DAYS)), # Histórico mantido na tabela quente
+        "SLOW_REQUEST_THRESHOLD": float(os.environ.get("SLOW_REQUEST_THRESHOLD", 0.5)), # Segundos
+        # --- Serialização e compressão das respostas JSON ---
+        "JSON_PROVIDER": os.environ.get("JSON_PROVIDER", DEFAULT_PROVIDER), # "orjson", "default" ou "modulo:Classe"
+        "COMPRESS_ENCODINGS": os.environ.get("COMPRESS_ENCODINGS", DEFAULT_ENCODINGS), # Preferência; "" desliga
+        "COMPRESS_MIN_SIZE": int(os.environ.get("COMPRESS_MIN_SIZE", DEFAULT_MIN_SIZE)), # Bytes
+        # --- Rate limiting (token bucket por morador; "" desliga) ---
+        "RATE_LIMIT_BOOKING": os.environ.get("RATE_LIMIT_BOOKING", DEFAULT_LIMITS["booking"]), # capacidade/segundos
+        "RATE_LIMIT_LOGIN": os.environ.get("RATE_LIMIT_LOGIN", DEFAULT_LIMITS["login"]), # Por endereço + e-mail
+        "RATE_LIMIT_LOGIN_FAILURES": os.environ.get("RATE_LIMIT_LOGIN_FAILURES", DEFAULT_LIMITS["login_failures"]), # Senhas erradas por morador
+        "PROXY_FIX_X_FOR": int(os.environ.get("PROXY_FIX_X_FOR", 0)), # Proxies reversos confiáveis à frente do app (X-Forwarded-For)
+        "RATE_LIMIT_BACKEND": os.environ.get("RATE_LIMIT_BACKEND", "local"), # "local" ou "modulo:Classe"
+        # --- Tenancy ---
+        "TENANCY_MODE": os.environ.get("TENANCY_MODE", ""), # "", "host" ou "path"
+        "TENANT_DATABASE_URI": os.environ.get("TENANT_DATABASE_URI"), # Modelo com {tenant}; padrão: instance/tenants/{tenant}.db
+        "TENANT_MAX_ENGINES": int(os.environ.get("TENANT_MAX_ENGINES", DEFAULT_MAX_ENGINES)), # Engines abertas por worker
+        "TENANT_BASE_DOMAIN": os.environ.get("TENANT_BASE_DOMAIN"), # Modo host: tenant = rótulos antes deste domínio
+    }
 
-db.init_app(app)
+def create_app(config=None):
+    app = Flask(__name__, static_folder="static")
+    app.config.update(default_config())
+    app.config.update(config or {})
+    app.config["SECRET_KEY"] = app.config["SECRET_KEY"] or load_secret_key(app)
+    init_json_provider(app) # jsonify compacto, datas em ISO 8601
+    if app.config["PROXY_FIX_X_FOR"]:
+        # Endereço real do cliente para o rate limiting de login
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"])
 
-# Register the blueprints
-app.register_blueprint(api_bp)
-app.register_blueprint(admin_bp) # Register admin blueprint for HTML page serving
+    # --- Database Configuration ---
+    configure_database(app, app.config["SQLALCHEMY_DATABASE_URI"], app.config["DB_PROFILE"])
+    db.init_app(app)
+    init_engine_profile(app, db)
+    init_tenancy(app) # Antes dos demais: sessão e middleware escolhem o banco do tenant
+    init_instrumentation(app, db) # SQL e tempo por requisição: Server-Timing e /api/admin/metrics
+    init_occupancy_cache(app)
+    init_principal_cache(app)
+    init_hashing(app)
+    init_rate_limit(app) # 429 antes do banco e do hash da senha
+    init_slot_events(app) # Feed SSE de horários; a tabela de eventos é o broker entre workers
+    init_usage_rollup(app) # Comando backfill-usage
+    init_archival(app) # Comando archive-bookings
+    init_http_cache(app) # Fingerprint dos estáticos servidos por serve_static
+    init_compression(app) # gzip/brotli das respostas JSON grandes
+    init_reference_data(app) # Andares, Horarios e Lavanderias em memória, carregados no primeiro uso
+
+    # Blueprints importados aqui: importar o módulo não monta um app
+    from src.routes.api import api_bp, admin_bp
+    app.register_blueprint(api_bp)
+    app.register_blueprint(admin_bp) # Register admin blueprint for HTML page serving
+    app.add_url_rule("/", view_func=index)
+    app.add_url_rule("/<path:path>", view_func=serve_static)
+    app.cli.add_command(setup_db_command)
+    return app
+
+# --- Secret key compartilhada entre workers e reinícios ---
+def secret_key_path(app):
+    return os.path.join(app.instance_path, SECRET_KEY_FILE)
+
+def load_secret_key(app):
+    try:
+        with open(secret_key_path(app)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        app.logger.warning("SECRET_KEY não definida e setup-db não executado: chave aleatória neste processo, "
+                           "sessões não valem entre workers nem após reinício.")
+        return os.urandom(24)
+
+def ensure_secret_key_file(app):
+    if os.environ.get("SECRET_KEY") or os.path.exists(secret_key_path(app)):
+        return False
+    os.makedirs(app.instance_path, exist_ok=True)
+    descritor = os.open(secret_key_path(app), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(descritor, "w") as f:
+        f.write(secrets.token_hex(32))
+    return True
+
+# --- Esquema e dados iniciais (idempotentes) ---
+def create_schema():
+    # Tabelas que faltam e, em tabelas já existentes, índices adicionados depois da criação.
+    # Colunas novas em tabelas existentes não são tratadas aqui.
+    engine = db.session.get_bind()  # Banco do tenant corrente, ou o padrão
+    db.metadata.create_all(engine)
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
-# --- Helper function to populate initial data (ensure test admin user) ---
 def populate_initial_data():
-    with app.app_context():
-        if not Andar.query.first():
-            print("Populating initial Andares...")
-            for i in range(1, 16):
-                db.session.add(Andar(numero_andar=i))
-            db.session.commit()
-            print("Andares populated.")
-
-        if not HorarioDisponivel.query.first():
-            print("Populating initial Horarios_Disponiveis...")
-            horarios_data = [
-                {"descricao_horario": "07:00-11:00", "hora_inicio": datetime.time(7, 0, 0), "hora_fim": datetime.time(11, 0, 0)},
-                {"descricao_horario": "11:00-15:00", "hora_inicio": datetime.time(11, 0, 0), "hora_fim": datetime.time(15, 0, 0)},
-                {"descricao_horario": "15:00-19:00", "hora_inicio": datetime.time(15, 0, 0), "hora_fim": datetime.time(19, 0, 0)},
-                {"descricao_horario": "19:00-23:00", "hora_inicio": datetime.time(19, 0, 0), "hora_fim": datetime.time(23, 0, 0)},
-            ]
-            for h_data in horarios_data:
-                db.session.add(HorarioDisponivel(**h_data))
-            db.session.commit()
-            print("Horarios_Disponiveis populated.")
-
-        if not Lavanderia.query.first():
-            print("Populating initial Lavanderias...")
-            andares = Andar.query.all()
-            for andar_obj in andares:
-                db.session.add_all([
-                    Lavanderia(id_andar_fk=andar_obj.id_andar, identificador_no_andar="Lavanderia 1"),
-                    Lavanderia(id_andar_fk=andar_obj.id_andar, identificador_no_andar="Lavanderia 2")
-                ])
-            db.session.commit()
-            print("Lavanderias populated.")
-
-        # Ensure test user is admin
-        test_morador = Morador.query.filter_by(email="morador_teste@email.com").first()
-        if not test_morador:
-            print("Populating test Morador (Admin)...")
-            andar_teste = Andar.query.filter_by(numero_andar=1).first()
-            if andar_teste:
-                from werkzeug.security import generate_password_hash
-                admin_user = Morador(
-                    nome_completo="Morador Admin Teste",
-                    email="morador_teste@email.com",
-                    senha_hash=generate_password_hash("senha123"),
-                    id_andar_fk=andar_teste.id_andar,
-                    numero_apartamento="101",
-                    is_admin=True # Set as admin
-                )
-                db.session.add(admin_user)
-                db.session.commit()
-                print("Test Morador (Admin) populated.")
-            else:
-                print("Could not populate test Morador: Andar 1 not found.")
-        elif not test_morador.is_admin: # If user exists but is not admin
-            print("Updating morador_teste@email.com to be an admin...")
-            test_morador.is_admin = True
+    tem_andares, tem_horarios, tem_lavanderias = db.session.execute(db.select(
+        db.select(Andar.id_andar).exists(),
+        db.select(HorarioDisponivel.id_horario).exists(),
+        db.select(Lavanderia.id_lavanderia).exists()
+    )).one()
+
+    if not tem_andares:
+        print("Populating initial Andares...")
+        for i in range(1, 16):
+            db.session.add(Andar(numero_andar=i))
+        db.session.commit()
+        print("Andares populated.")
+
+    if not tem_horarios:
+        print("Populating initial Horarios_Disponiveis...")
+        horarios_data = [
+            {"descricao_horario": "07:00-11:00", "hora_inicio": datetime.time(7, 0, 0), "hora_fim": datetime.time(11, 0, 0)},
+            {"descricao_horario": "11:00-15:00", "hora_inicio": datetime.time(11, 0, 0), "hora_fim": datetime.time(15, 0, 0)},
+            {"descricao_horario": "15:00-19:00", "hora_inicio": datetime.time(15, 0, 0), "hora_fim": datetime.time(19, 0, 0)},
+            {"descricao_horario": "19:00-23:00", "hora_inicio": datetime.time(19, 0, 0), "hora_fim": datetime.time(23, 0, 0)},
+        ]
+        for h_data in horarios_data:
+            db.session.add(HorarioDisponivel(**h_data))
+        db.session.commit()
+        print("Horarios_Disponiveis populated.")
+
+    if not tem_lavanderias:
+        print("Populating initial Lavanderias...")
+        andares = Andar.query.all()
+        for andar_obj in andares:
+            db.session.add_all([
+                Lavanderia(id_andar_fk=andar_obj.id_andar, identificador_no_andar="Lavanderia 1"),
+                Lavanderia(id_andar_fk=andar_obj.id_andar, identificador_no_andar="Lavanderia 2")
+            ])
+        db.session.commit()
+        print("Lavanderias populated.")
+
+    # Ensure test user is admin
+    test_morador = Morador.query.filter_by(email="morador_teste@email.com").first()
+    if not test_morador:
+        print("Populating test Morador (Admin)...")
+        andar_teste = Andar.query.filter_by(numero_andar=1).first()
+        if andar_teste:
+            from werkzeug.security import generate_password_hash
+            admin_user = Morador(
+                nome_completo="Morador Admin Teste",
+                email="morador_teste@email.com",
+                senha_hash=generate_password_hash("senha123"),
+                id_andar_fk=andar_teste.id_andar,
+                numero_apartamento="101",
+                is_admin=True # Set as admin
+            )
+            db.session.add(admin_user)
             db.session.commit()
-            print("Morador_teste@email.com is now an admin.")
+            print("Test Morador (Admin) populated.")
+        else:
+            print("Could not populate test Morador: Andar 1 not found.")
+    elif not test_morador.is_admin: # If user exists but is not admin
+        print("Updating morador_teste@email.com to be an admin...")
+        test_morador.is_admin = True
+        db.session.commit()
+        print("Morador_teste@email.com is now an admin.")
+
+def setup_database(app):
+    # Requer app context; pode ser repetido sem perder dados
+    create_schema()
+    if ensure_increasing_ids():
+        print("Agendamentos reconstruída com AUTOINCREMENT (ids não são reaproveitados após o arquivamento).")
+    populate_initial_data()
+    if ensure_secret_key_file(app):
+        print(f"Secret key criada em {secret_key_path(app)}.")
 
+@click.command("setup-db")
+@click.option("--reset", is_flag=True, help="Apaga todas as tabelas antes de recriar (perde os dados).")
+@tenant_options
+@with_appcontext
+def setup_db_command(reset, tenants, todos_tenants):
+    """Cria tabelas e índices que faltam e os dados iniciais; seguro para rodar a cada deploy."""
+    alvos = selected_tenants(tenants, todos_tenants, criar=True)
+    if reset:
+        click.confirm("Apagar todas as tabelas e dados?", abort=True)
+    for tenant in each_tenant(alvos, db.session):
+        if tenant is not None:
+            tenant_engines.prepare(tenant)
+        if reset:
+            db.metadata.drop_all(db.session.get_bind())
+        setup_database(current_app)
+        click.echo(f"Banco pronto{f' (tenant {tenant})' if tenant else ''}.")
 
 # --- Routes ---
-@app.route("/")
 def index():
     # If admin is logged in and tries to access root, maybe redirect to admin dashboard?
     # For now, just serve index.html for non-admin or non-logged-in users.
     if session.get("is_admin") and request.path == "/": # Basic check, could be more robust
          #This logic is tricky here, better handled by frontend or specific /login /admin_login routes
          pass # Let it serve index.html, admin can navigate to /admin/dashboard manually or via a link
-    return send_from_directory(app.static_folder, "index.html")
+    return static_assets.send_page("index.html")
 
-@app.route("/<path:path>")
 def serve_static(path):
     if path == "admin_dashboard.html" and not session.get("is_admin"):
         # Protect direct access to admin_dashboard.html if not admin
         # The @admin_required decorator on the blueprint route /admin/dashboard is the primary protection
-        return "Acesso não autorizado", 403 
-    return send_from_directory(app.static_folder, path)
+        return "Acesso não autorizado", 403
+    if path.endswith(".html"):
+        return static_assets.send_page(path) if static_assets.fingerprint(path) else ("Not Found", 404)
+    # css/js: cache longo quando pedido com o fingerprint atual (?v=), revalidação caso contrário
+    return static_assets.send_asset(path)
 
 # --- Main execution ---
 if __name__ == "__main__":
+    app = create_app()
     with app.app_context():
-        print("Dropping all tables for schema update (is_admin field)...")
-        db.drop_all() # Drop all tables to ensure schema update with is_admin
-        print("Creating database tables...")
-        db.create_all()
-        print("Database tables created.")
-        populate_initial_data()
-        print("Initial data population process completed.")
-    
+        setup_database(app) # Desenvolvimento: esquema e dados iniciais, sem apagar nada
     app.run(host="0.0.0.0", port=5000, debug=True)
-
@@ -1,8 +1,17 @@
 # src/models/models.py
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from sqlalchemy.sql import func
+from src.tenancy import TenantSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": TenantSession}) # Engine do tenant corrente (src/tenancy.py)
+
+def listen_session(identifier, fn):
+    # Eventos só nas sessões do app (db.session), não em toda Session do processo; chamado pelos
+    # init_* e idempotente entre chamadas de create_app
+    session_class = db.session.session_factory.class_
+    if not event.contains(session_class, identifier, fn):
+        event.listen(session_class, identifier, fn)
 
 class Andar(db.Model):
     __tablename__ = "Andares"
@@ -59,6 +68,9 @@ class Morador(db.Model):
     def __repr__(self):
         return f"<Morador {self.nome_completo} - Apt {self.numero_apartamento} / Andar {self.andar_residencia.numero_andar} {'(Admin)' if self.is_admin else ''}>"
 
+# Status que ocupam o horário: "concluido" é um agendamento confirmado cuja data já passou
+STATUS_OCUPA_HORARIO = ("confirmado", "concluido")
+
 class Agendamento(db.Model):
     __tablename__ = "Agendamentos"
     id_agendamento = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -69,8 +81,102 @@ class Agendamento(db.Model):
     data_criacao = db.Column(db.DateTime(timezone=True), server_default=func.now())
     status_agendamento = db.Column(db.String(20), nullable=False, default="confirmado") # confirmado, cancelado, concluido
 
-    __table_args__ = (db.UniqueConstraint("id_lavanderia_fk", "id_horario_fk", "data_agendamento", name="uq_agendamento_lav_hor_data"),)
+    __table_args__ = (
+        db.UniqueConstraint("id_lavanderia_fk", "id_horario_fk", "data_agendamento", name="uq_agendamento_lav_hor_data"),
+        # get_my_bookings: filtro por morador + status, ordenado por data
+        db.Index("ix_agendamento_morador_status_data", "id_morador_fk", "status_agendamento", "data_agendamento", "id_horario_fk"),
+        # Grade de horários e update_laundry_status: intervalo de datas por lavanderia (cobre id_horario_fk)
+        db.Index("ix_agendamento_lav_data_status", "id_lavanderia_fk", "data_agendamento", "status_agendamento", "id_horario_fk"),
+        # get_all_bookings: intervalo de datas e ordenação por data
+        db.Index("ix_agendamento_data", "data_agendamento", "id_agendamento"),
+        # Ids nunca reaproveitados: o arquivamento move as linhas com o mesmo id para Agendamentos_Arquivo
+        {"sqlite_autoincrement": True},
+    )
 
     def __repr__(self):
         return f"<Agendamento {self.id_agendamento} - Morador {self.id_morador_fk} em {self.data_agendamento} {self.horario_agendado.descricao_horario}>"
 
+
+class EsperaHorario(db.Model):
+    # Fila de espera de um horário ocupado, atendida em ordem de id_espera (ver src/services/waitlist.py)
+    __tablename__ = "Lista_Espera"
+    id_espera = db.Column(db.Integer, primary_key=True, autoincrement=True) # Ordem de chegada na fila
+    id_morador_fk = db.Column(db.Integer, db.ForeignKey("Moradores.id_morador"), nullable=False)
+    id_lavanderia_fk = db.Column(db.Integer, db.ForeignKey("Lavanderias.id_lavanderia"), nullable=False)
+    id_horario_fk = db.Column(db.Integer, db.ForeignKey("Horarios_Disponiveis.id_horario"), nullable=False)
+    data_agendamento = db.Column(db.Date, nullable=False)
+    data_criacao = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint("id_lavanderia_fk", "id_horario_fk", "data_agendamento", "id_morador_fk", name="uq_espera_horario_morador"),
+        # Primeiro da fila e posição (contagem de quem chegou antes): intervalo do índice por horário
+        db.Index("ix_espera_horario", "id_lavanderia_fk", "id_horario_fk", "data_agendamento", "id_espera"),
+        # Filas do morador
+        db.Index("ix_espera_morador_data", "id_morador_fk", "data_agendamento"),
+    )
+
+    def __repr__(self):
+        return f"<EsperaHorario {self.id_espera} - Morador {self.id_morador_fk} em {self.data_agendamento}>"
+
+
+class AgendamentoArquivo(db.Model):
+    # Agendamentos anteriores ao horizonte de arquivamento, movidos de Agendamentos com o mesmo id
+    # (ver src/services/archival.py). Sem chaves estrangeiras: o arquivo não restringe a tabela quente.
+    __tablename__ = "Agendamentos_Arquivo"
+    id_agendamento = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    id_morador_fk = db.Column(db.Integer, nullable=False)
+    id_lavanderia_fk = db.Column(db.Integer, nullable=False)
+    id_horario_fk = db.Column(db.Integer, nullable=False)
+    data_agendamento = db.Column(db.Date, nullable=False)
+    data_criacao = db.Column(db.DateTime(timezone=True))
+    status_agendamento = db.Column(db.String(20), nullable=False)
+
+    __table_args__ = (
+        # Histórico administrativo: mesmos caminhos de acesso da tabela quente
+        db.Index("ix_arquivo_data", "data_agendamento", "id_agendamento"),
+        db.Index("ix_arquivo_lav_data", "id_lavanderia_fk", "data_agendamento"),
+    )
+
+    def __repr__(self):
+        return f"<AgendamentoArquivo {self.id_agendamento} - Morador {self.id_morador_fk} em {self.data_agendamento}>"
+
+
+class EventoSlot(db.Model):
+    # Log de mudanças de ocupação, lido pelo feed SSE de cada worker (ver src/services/slot_events.py)
+    __tablename__ = "Eventos_Slots"
+    id_evento = db.Column(db.Integer, primary_key=True, autoincrement=True) # Também é o id do evento SSE
+    id_andar_fk = db.Column(db.Integer, nullable=False)
+    id_lavanderia_fk = db.Column(db.Integer, nullable=False)
+    id_horario_fk = db.Column(db.Integer, nullable=True) # Nulo em mudanças de status da lavanderia
+    data_agendamento = db.Column(db.Date, nullable=True) # Nulo: vale para todas as datas
+    tipo = db.Column(db.String(20), nullable=False) # ocupado, livre, lavanderia
+    status_lavanderia = db.Column(db.String(20), nullable=True)
+    criado_em = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        # Retomada por Last-Event-ID: eventos do andar a partir de um id
+        db.Index("ix_evento_slot_andar_id", "id_andar_fk", "id_evento"),
+        db.Index("ix_evento_slot_criado_em", "criado_em"),
+    )
+
+    def __repr__(self):
+        return f"<EventoSlot {self.id_evento} {self.tipo} - Lavanderia {self.id_lavanderia_fk}>"
+
+class UsoDiario(db.Model):
+    # Agregado diário por lavanderia × horário, mantido pelas escritas de agendamento (ver src/services/usage_rollup.py)
+    __tablename__ = "Uso_Diario"
+    # Chave na ordem (lavanderia, data, horario): o analytics de um andar lê um intervalo de datas por lavanderia
+    id_lavanderia_fk = db.Column(db.Integer, db.ForeignKey("Lavanderias.id_lavanderia"), primary_key=True)
+    data = db.Column(db.Date, primary_key=True)
+    id_horario_fk = db.Column(db.Integer, db.ForeignKey("Horarios_Disponiveis.id_horario"), primary_key=True)
+    dia_semana = db.Column(db.SmallInteger, nullable=False) # 0 = segunda (date.weekday()); agrupamento sem função de data do banco
+    confirmados = db.Column(db.Integer, nullable=False, default=0) # Reservas ocupando o horário
+    cancelados = db.Column(db.Integer, nullable=False, default=0) # Cancelamentos acumulados no dia
+
+    __table_args__ = (
+        # Analytics de todas as lavanderias: intervalo de datas, cobrindo as colunas agregadas
+        db.Index("ix_uso_diario_data", "data", "id_lavanderia_fk", "id_horario_fk", "dia_semana", "confirmados", "cancelados"),
+    )
+
+    def __repr__(self):
+        return f"<UsoDiario Lavanderia {self.id_lavanderia_fk} Horario {self.id_horario_fk} em {self.data}: {self.confirmados}/{self.cancelados}>"
@@ -1,10 +1,35 @@
 # src/routes/api.py
-from flask import Blueprint, jsonify, request, session, current_app, send_from_directory
+from flask import Blueprint, Response, jsonify, request, session, current_app, send_from_directory, stream_with_context
 from src.models.models import db, Andar, Lavanderia, HorarioDisponivel, Morador, Agendamento
-from werkzeug.security import check_password_hash, generate_password_hash
+from src.services.slots import build_slot_grid, parse_slot_range, iter_dates, slot_reads, SlotRangeError
+from src.services.occupancy_cache import occupancy_cache
+from src.services.reference_data import reference_data, serialize_laundries, serialize_floors
+from src.services.principal_cache import principal_cache
+from src.services.hashing import hashing_service, HashingOverloaded
+from src.services.slot_events import (slot_event_hub, open_subscription, stream_prelude, parse_last_event_id,
+                                      record_slot_change, record_laundry_status, FeedOverloaded, HEARTBEAT_FRAME)
+from src.services.booking import claim_slot, booking_metrics, BookingConflict, BookingContention
+from src.services.booking_batch import (claim_recurring, cancel_resident_future, cancel_laundry_future, serialize_cancelled,
+                                        BatchConflict, MAX_RECURRING_WEEKS)
+from src.instrumentation import instrumentation, prometheus_gauges
+from src.http_cache import not_modified, with_etag, static_assets
+from src.http_compression import response_compression
+from src.services.resource_versions import resource_versions
+from src.tenancy import tenant_engines, current_tenant
+from src.services.rate_limit import rate_limiter, rate_limited, too_many_requests, session_morador, login_client
+from src.services.booking_export import (export_batches, csv_chunks, gzip_chunks, parquet_chunks, load_pyarrow,
+                                         EXPORT_FORMATS, ExportUnavailable)
+from src.services.waitlist import (join_waitlist, leave_waitlist, my_waitlist_select, serialize_waitlist_entry, release_slot,
+                                   assign_waiting, WaitlistConflict)
+from src.services.usage_rollup import record_usage, parse_analytics_range, usage_select, build_utilization, AnalyticsRangeError
+from src.services.booking_history import (parse_history_filters, parse_page_limit, parse_page_format, history_select, fetch_history_page,
+                                          HISTORY_MODELS, serialize_history_row, history_page_payload, my_bookings_select,
+                                          serialize_my_booking, wants_page, HistoryFilterError)
 from sqlalchemy.exc import IntegrityError
 from functools import wraps
 import datetime
+import queue
+import time
 
 api_bp = Blueprint("api_bp", __name__, url_prefix="/api")
 admin_bp = Blueprint("admin_bp", __name__, url_prefix="/admin") # Separate blueprint for admin HTML page
@@ -15,12 +40,30 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if "morador_id" not in session:
             return jsonify({"error": "Não autenticado"}), 401
-        morador = Morador.query.get(session["morador_id"])
-        if not morador or not morador.is_admin:
+        if not _is_active_admin(session["morador_id"]): # Sem SQL no caso comum
             return jsonify({"error": "Acesso não autorizado. Requer privilégios de administrador."}), 403
         return f(*args, **kwargs)
     return decorated_function
 
+def _is_active_admin(morador_id):
+    principal = principal_cache.get(morador_id)
+    return bool(principal and principal.is_admin and principal.ativo)
+
+def _hashing_overloaded():
+    return jsonify({"error": "Muitas solicitações de login no momento. Tente novamente em instantes."}), 503, {"Retry-After": "2"}
+
+def _rehash_password(morador, senha):
+    # Parâmetros de custo mudaram: regrava o hash com a senha recém-verificada (melhor esforço)
+    try:
+        morador.senha_hash = hashing_service.hash_password(senha)
+        db.session.commit()
+        hashing_service.rehashed += 1
+    except HashingOverloaded:
+        pass
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro ao atualizar hash da senha do morador {morador.id_morador}: {e}")
+
 # --- Autenticação (Atualizada para incluir is_admin na sessão) ---
 @api_bp.route("/register", methods=["POST"])
 def register_morador():
@@ -35,14 +78,17 @@ def register_morador():
     if not all([nome_completo, email, senha, andar_num, numero_apartamento]):
         return jsonify({"error": "Todos os campos são obrigatórios"}), 400
 
-    andar_obj = Andar.query.filter_by(numero_andar=andar_num).first()
+    andar_obj = reference_data.get().andares_por_numero.get(int(andar_num)) if str(andar_num).isdigit() else None
     if not andar_obj:
         return jsonify({"error": f"Andar {andar_num} não encontrado."}), 404
 
     if Morador.query.filter_by(email=email).first():
         return jsonify({"error": "E-mail já cadastrado."}), 409
 
-    senha_hash = generate_password_hash(senha)
+    try:
+        senha_hash = hashing_service.hash_password(senha)
+    except HashingOverloaded:
+        return _hashing_overloaded()
     novo_morador = Morador(
         nome_completo=nome_completo,
         email=email,
@@ -60,6 +106,7 @@ def register_morador():
         return jsonify({"error": "Erro ao cadastrar morador. Verifique os dados."}), 500
 
 @api_bp.route("/login", methods=["POST"])
+@rate_limited("login", login_client) # Antes da consulta e do hash da senha
 def login():
     data = request.get_json()
     email = data.get("email")
@@ -69,8 +116,21 @@ def login():
         return jsonify({"error": "E-mail e senha são obrigatórios"}), 400
 
     morador = Morador.query.filter_by(email=email).first()
+    id_morador = morador.id_morador if morador is not None else None
+    espera = rate_limiter.blocked("login_failures", id_morador) # Antes do hash da senha
+    if espera:
+        return too_many_requests(espera)
 
-    if morador and check_password_hash(morador.senha_hash, senha):
+    try:
+        senha_ok = morador is not None and hashing_service.verify_password(morador.senha_hash, senha)
+    except HashingOverloaded:
+        return _hashing_overloaded()
+
+    if senha_ok:
+        rate_limiter.reset("login_failures", id_morador)
+        if hashing_service.needs_rehash(morador.senha_hash):
+            _rehash_password(morador, senha)
+        principal_cache.put(morador) # Já carregado: as próximas checagens não vão ao banco
         session["morador_id"] = morador.id_morador
         session["andar_id"] = morador.id_andar_fk
         session["apartamento"] = morador.numero_apartamento
@@ -81,11 +141,12 @@ def login():
                 "id": morador.id_morador,
                 "nome": morador.nome_completo,
                 "email": morador.email,
-                "andar_num": morador.andar_residencia.numero_andar,
+                "andar_num": reference_data.get().andares[morador.id_andar_fk].numero_andar,
                 "apartamento": morador.numero_apartamento,
                 "is_admin": morador.is_admin
             }
         }), 200
+    rate_limiter.penalize("login_failures", id_morador)
     return jsonify({"error": "E-mail ou senha inválidos."}), 401
 
 @api_bp.route("/logout", methods=["POST"])
@@ -98,16 +159,19 @@ def get_user_info():
     if "morador_id" not in session:
         return jsonify({"error": "Não autenticado"}), 401
     
-    morador = Morador.query.get(session["morador_id"])
+    morador = principal_cache.get(session["morador_id"])
     if not morador:
         session.clear()
         return jsonify({"error": "Usuário não encontrado"}), 404
+    if not morador.ativo:
+        session.clear()
+        return jsonify({"error": "Conta desativada."}), 403
 
     return jsonify({
         "id": morador.id_morador,
         "nome": morador.nome_completo,
         "email": morador.email,
-        "andar_num": morador.andar_residencia.numero_andar,
+        "andar_num": reference_data.get().andares[morador.id_andar_fk].numero_andar,
         "apartamento": morador.numero_apartamento,
         "andar_id_fk": morador.id_andar_fk,
         "is_admin": morador.is_admin
@@ -119,195 +183,391 @@ def get_laundry_slots():
     if "morador_id" not in session:
         return jsonify({"error": "Não autenticado"}), 401
 
-    date_str = request.args.get("date")
     andar_id_fk = session.get("andar_id")
+    if not andar_id_fk:
+        return jsonify({"error": "Data e informação do andar são obrigatórios."}), 400
+    try:
+        date_start, date_end, data_unica = parse_slot_range(request.args)
+    except SlotRangeError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # ETag antes da grade: versões em memória, 304 sem consulta à grade
+    slot_event_hub.sync()
+    etag = resource_versions.slots_etag(andar_id_fk, list(iter_dates(date_start, date_end)), "dia" if data_unica else "intervalo")
+    response = not_modified(etag)
+    if response:
+        return response
+
+    def render():
+        # Grade andar x data montada a partir de uma única consulta agregada
+        grid = build_slot_grid(andar_id_fk, date_start, date_end)
+        if data_unica:
+            # Formato original: { id_lavanderia: { identificador, slots } }
+            return jsonify(grid[date_start.isoformat()]).get_data()
+        # Intervalo: { "YYYY-MM-DD": { id_lavanderia: { identificador, slots } } }
+        return jsonify(grid).get_data()
+
+    # Sem ETag (versões ainda não carregadas) não há como garantir que a resposta de outra requisição
+    # seja tão nova quanto esta: calcula sozinha
+    body = slot_reads.do((current_tenant(), etag), render) if etag else render()
+    return with_etag(current_app.response_class(body, mimetype="application/json"), etag), 200
+
+@api_bp.route("/laundries/events", methods=["GET"])
+def slot_events_feed():
+    # Server-Sent Events: horários ocupados/liberados do andar nas datas pedidas (mesmos parâmetros da grade)
+    if "morador_id" not in session:
+        return jsonify({"error": "Não autenticado"}), 401
 
-    if not date_str or not andar_id_fk:
+    andar_id_fk = session.get("andar_id")
+    if not andar_id_fk:
         return jsonify({"error": "Data e informação do andar são obrigatórios."}), 400
+    try:
+        date_start, date_end, _ = parse_slot_range(request.args)
+    except SlotRangeError as e:
+        return jsonify({"error": str(e)}), 400
 
+    last_event_id = parse_last_event_id(request.headers, request.args)
     try:
-        selected_date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        return jsonify({"error": "Formato de data inválido. Use YYYY-MM-DD."}), 400
+        subscription = open_subscription(andar_id_fk, iter_dates(date_start, date_end), last_event_id)
+    except FeedOverloaded:
+        return jsonify({"error": "Muitas conexões abertas. Tente novamente em instantes."}), 503, {"Retry-After": "5"}
+    prelude = stream_prelude(subscription, last_event_id) # Replay da retomada ainda dentro da requisição
+
+    def generate():
+        yield from prelude
+        fim = time.monotonic() + slot_event_hub.stream_timeout
+        while not subscription.overflowed:
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                return # O navegador reconecta com Last-Event-ID
+            try:
+                evento = subscription.queue.get(timeout=min(slot_event_hub.heartbeat, restante))
+            except queue.Empty:
+                yield HEARTBEAT_FRAME
+                continue
+            if subscription.accept(evento):
+                yield evento.encode()
+
+    response = Response(generate(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(lambda: slot_event_hub.unsubscribe(subscription))
+    return response
+
+class BookingRequestError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def _parse_booking_target(data, date_field, permite_manutencao=False):
+    # Validação comum a create_booking, create_recurring_booking e join_slot_waitlist (sem SQL: registro de referência)
+    id_lavanderia = data.get("id_lavanderia")
+    id_horario = data.get("id_horario")
+    date_str = data.get(date_field)
 
-    # Filtra lavanderias ativas do andar do morador
-    lavanderias_andar = Lavanderia.query.filter_by(id_andar_fk=andar_id_fk, status="ativa").all()
-    todos_horarios = HorarioDisponivel.query.all()
+    if not all([id_lavanderia, id_horario, date_str]):
+        raise BookingRequestError(f"id_lavanderia, id_horario e {date_field} são obrigatórios.")
 
-    response_slots = {}
-    for lavanderia in lavanderias_andar:
-        response_slots[lavanderia.id_lavanderia] = {
-            "identificador": lavanderia.identificador_no_andar,
-            "slots": []
-        }
-        agendamentos_existentes = Agendamento.query.filter_by(
-            id_lavanderia_fk=lavanderia.id_lavanderia,
-            data_agendamento=selected_date,
-            status_agendamento="confirmado"
-        ).all()
-        horarios_ocupados_ids = {ag.id_horario_fk for ag in agendamentos_existentes}
-
-        for horario in todos_horarios:
-            response_slots[lavanderia.id_lavanderia]["slots"].append({
-                "id_horario": horario.id_horario,
-                "descricao": horario.descricao_horario,
-                "ocupado": horario.id_horario in horarios_ocupados_ids
-            })
-    return jsonify(response_slots), 200
+    try:
+        data_agendamento = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+    except ValueError:
+        raise BookingRequestError("Formato de data inválido. Use YYYY-MM-DD.")
+    if data_agendamento < datetime.date.today():
+        # Datas passadas são concluídas e arquivadas pelo archive-bookings
+        raise BookingRequestError("Não é possível agendar em datas passadas.")
+    try:
+        id_lavanderia, id_horario = int(id_lavanderia), int(id_horario)
+    except (TypeError, ValueError):
+        raise BookingRequestError("id_lavanderia e id_horario devem ser números.")
+
+    slot_event_hub.sync()  # Status de lavanderia alterado em outro worker chega pelo log
+    ref = reference_data.get()
+    lavanderia_obj = ref.lavanderias.get(id_lavanderia)
+    if not lavanderia_obj or lavanderia_obj.id_andar_fk != session.get("andar_id"):
+        raise BookingRequestError("Lavanderia inválida ou não pertence ao seu andar.", 403)
+    if lavanderia_obj.status != "ativa" and not permite_manutencao:
+        raise BookingRequestError("Esta lavanderia não está ativa e não pode ser agendada.", 403)
+    if id_horario not in ref.horarios:
+        raise BookingRequestError("Horário inválido.")
+    return ref, lavanderia_obj, id_horario, data_agendamento
 
 @api_bp.route("/bookings", methods=["POST"])
+@rate_limited("booking", session_morador)
 def create_booking():
     if "morador_id" not in session:
         return jsonify({"error": "Não autenticado"}), 401
 
-    data = request.get_json()
-    id_lavanderia = data.get("id_lavanderia")
-    id_horario = data.get("id_horario")
-    date_str = data.get("data_agendamento")
     morador_id = session["morador_id"]
+    try:
+        ref, lavanderia_obj, id_horario, data_agendamento = _parse_booking_target(request.get_json(), "data_agendamento")
+    except BookingRequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    id_lavanderia = lavanderia_obj.id_lavanderia
 
-    if not all([id_lavanderia, id_horario, date_str]):
-        return jsonify({"error": "id_lavanderia, id_horario e data_agendamento são obrigatórios."}), 400
+    try:
+        id_agendamento = claim_slot(morador_id, id_lavanderia, id_horario, data_agendamento)
+    except BookingConflict:
+        return jsonify({"error": "Este horário já está reservado ou ocorreu um erro."}), 409
+    except BookingContention:
+        # Disputa de lock persistente (pico de reservas): o cliente pode tentar novamente
+        return jsonify({"error": "Sistema ocupado. Tente novamente em instantes."}), 503, {"Retry-After": "1"}
+
+    occupancy_cache.mark_occupied(id_lavanderia, data_agendamento, id_horario)
+    return jsonify({
+        "message": "Agendamento criado com sucesso!", 
+        "agendamento": {
+            "id_agendamento": id_agendamento,
+            "data": data_agendamento.isoformat(),
+            "horario": ref.horarios[id_horario].descricao_horario,
+            "lavanderia": lavanderia_obj.identificador_no_andar
+        }
+    }), 201
 
+@api_bp.route("/bookings/recurring", methods=["POST"])
+@rate_limited("booking", session_morador)
+def create_recurring_booking():
+    # Mesmo horário e lavanderia toda semana, por N semanas; uma transação para o lote inteiro
+    if "morador_id" not in session:
+        return jsonify({"error": "Não autenticado"}), 401
+
+    data = request.get_json()
     try:
-        data_agendamento = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        return jsonify({"error": "Formato de data inválido. Use YYYY-MM-DD."}), 400
-    
-    lavanderia_obj = Lavanderia.query.get(id_lavanderia)
-    if not lavanderia_obj or lavanderia_obj.id_andar_fk != session.get("andar_id"):
-        return jsonify({"error": "Lavanderia inválida ou não pertence ao seu andar."}), 403
-    if lavanderia_obj.status != "ativa":
-        return jsonify({"error": "Esta lavanderia não está ativa e não pode ser agendada."}), 403
-
-    novo_agendamento = Agendamento(
-        id_morador_fk=morador_id,
-        id_lavanderia_fk=id_lavanderia,
-        id_horario_fk=id_horario,
-        data_agendamento=data_agendamento
-    )
+        ref, lavanderia_obj, id_horario, data_inicio = _parse_booking_target(data, "data_inicio")
+    except BookingRequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    semanas = data.get("semanas")
+    if not isinstance(semanas, int) or not 1 <= semanas <= MAX_RECURRING_WEEKS:
+        return jsonify({"error": f"semanas deve ser um número entre 1 e {MAX_RECURRING_WEEKS}."}), 400
+
     try:
-        db.session.add(novo_agendamento)
-        db.session.commit()
-        return jsonify({
-            "message": "Agendamento criado com sucesso!", 
-            "agendamento": {
-                "id_agendamento": novo_agendamento.id_agendamento,
-                "data": novo_agendamento.data_agendamento.isoformat(),
-                "horario": novo_agendamento.horario_agendado.descricao_horario,
-                "lavanderia": novo_agendamento.lavanderia_agendada.identificador_no_andar
-            }
-        }), 201
-    except IntegrityError:
-        db.session.rollback()
-        return jsonify({"error": "Este horário já está reservado ou ocorreu um erro."}), 409
+        resultados = claim_recurring(session["morador_id"], lavanderia_obj.id_lavanderia, id_horario, data_inicio, semanas)
+    except BookingContention:
+        return jsonify({"error": "Sistema ocupado. Tente novamente em instantes."}), 503, {"Retry-After": "1"}
+
+    criados = [r for r in resultados if r["status"] == "confirmado"]
+    for r in criados:
+        occupancy_cache.mark_occupied(lavanderia_obj.id_lavanderia, datetime.date.fromisoformat(r["data"]), id_horario)
+    return jsonify({
+        "message": f"{len(criados)} de {semanas} agendamentos criados.",
+        "horario": ref.horarios[id_horario].descricao_horario,
+        "lavanderia": lavanderia_obj.identificador_no_andar,
+        "resultados": resultados
+    }), 201 if criados else 409
+
+@api_bp.route("/bookings/future", methods=["DELETE"])
+@rate_limited("booking", session_morador)
+def cancel_future_bookings():
+    # Cancela todos os agendamentos futuros do morador (admin: ?morador_id= de outro morador)
+    if "morador_id" not in session:
+        return jsonify({"error": "Não autenticado"}), 401
+
+    morador_id = session["morador_id"]
+    alvo = request.args.get("morador_id", type=int) or morador_id
+    if alvo != morador_id and not _is_active_admin(morador_id):
+        return jsonify({"error": "Você não tem permissão para cancelar estes agendamentos."}), 403
+
+    try:
+        rows, reatribuidos = cancel_resident_future(alvo)
+    except BookingContention:
+        return jsonify({"error": "Sistema ocupado. Tente novamente em instantes."}), 503, {"Retry-After": "1"}
+
+    for row in rows:
+        chave = (row.id_lavanderia_fk, row.data_agendamento, row.id_horario_fk)
+        if chave not in reatribuidos:
+            occupancy_cache.mark_free(*chave)
+    ref = reference_data.get()
+    return jsonify({
+        "message": f"{len(rows)} agendamentos cancelados.",
+        "resultados": [serialize_cancelled(row, ref) for row in rows]
+    }), 200
 
 @api_bp.route("/bookings/mine", methods=["GET"])
 def get_my_bookings():
     if "morador_id" not in session:
         return jsonify({"error": "Não autenticado"}), 401
 
-    morador_id = session["morador_id"]
-    agendamentos = Agendamento.query.filter_by(id_morador_fk=morador_id, status_agendamento="confirmado")\
-                                    .order_by(Agendamento.data_agendamento, Agendamento.id_horario_fk).all()
-    
-    response_data = []
-    for ag in agendamentos:
-        response_data.append({
-            "id_agendamento": ag.id_agendamento,
-            "data": ag.data_agendamento.isoformat(),
-            "horario_desc": ag.horario_agendado.descricao_horario,
-            "lavanderia_id": ag.id_lavanderia_fk,
-            "lavanderia_desc": ag.lavanderia_agendada.identificador_no_andar,
-            "andar_lavanderia": ag.lavanderia_agendada.andar.numero_andar
-        })
+    ref = reference_data.get()
+    rows = db.session.execute(my_bookings_select(session["morador_id"]))
+    response_data = [serialize_my_booking(row, ref) for row in rows]
     return jsonify(response_data), 200
 
 @api_bp.route("/bookings/<int:booking_id>", methods=["DELETE"])
+@rate_limited("booking", session_morador)
 def cancel_booking(booking_id):
     if "morador_id" not in session:
         return jsonify({"error": "Não autenticado"}), 401
 
-    agendamento = Agendamento.query.get(booking_id)
+    agendamento = db.session.get(Agendamento, booking_id)
 
     if not agendamento:
         return jsonify({"error": "Agendamento não encontrado."}), 404
 
-    if agendamento.id_morador_fk != session["morador_id"] and not session.get("is_admin"):
+    if agendamento.id_morador_fk != session["morador_id"] and not _is_active_admin(session["morador_id"]):
          return jsonify({"error": "Você não tem permissão para cancelar este agendamento."}), 403
 
+    if agendamento.status_agendamento == "concluido":
+        return jsonify({"error": "Agendamento já concluído não pode ser cancelado."}), 409
+
+    estava_confirmado = agendamento.status_agendamento == "confirmado"
+    id_lavanderia, id_horario, data_agendamento = agendamento.id_lavanderia_fk, agendamento.id_horario_fk, agendamento.data_agendamento
     agendamento.status_agendamento = "cancelado"
     try:
+        reatribuido = None
+        if estava_confirmado:
+            record_slot_change(id_lavanderia, data_agendamento, id_horario, ocupado=False)
+            record_usage(id_lavanderia, id_horario, data_agendamento, ocupado=False)
+            # O primeiro da fila de espera recebe o horário neste mesmo commit
+            reatribuido = release_slot(id_lavanderia, id_horario, data_agendamento)
         db.session.commit()
+        if estava_confirmado and reatribuido is None:
+            occupancy_cache.mark_free(id_lavanderia, data_agendamento, id_horario)
         return jsonify({"message": "Agendamento cancelado com sucesso!"}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Erro ao cancelar agendamento: {str(e)}"}), 500
 
+# --- Fila de espera ---
+@api_bp.route("/waitlist", methods=["POST"])
+@rate_limited("booking", session_morador)
+def join_slot_waitlist():
+    # Entra na fila de um horário ocupado (ou de uma lavanderia em manutenção); quando ele for liberado,
+    # a reserva é feita automaticamente para o primeiro da fila
+    if "morador_id" not in session:
+        return jsonify({"error": "Não autenticado"}), 401
+
+    try:
+        ref, lavanderia_obj, id_horario, data_agendamento = _parse_booking_target(request.get_json(), "data_agendamento",
+                                                                                  permite_manutencao=True)
+    except BookingRequestError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    try:
+        id_espera, posicao, criada = join_waitlist(session["morador_id"], lavanderia_obj.id_lavanderia, id_horario,
+                                                   data_agendamento, lavanderia_obj.status == "ativa")
+    except WaitlistConflict as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({
+        "message": "Você entrou na fila de espera." if criada else "Você já está na fila de espera deste horário.",
+        "espera": {
+            "id_espera": id_espera,
+            "data": data_agendamento.isoformat(),
+            "horario": ref.horarios[id_horario].descricao_horario,
+            "lavanderia": lavanderia_obj.identificador_no_andar,
+            "posicao": posicao
+        }
+    }), 201 if criada else 200
+
+@api_bp.route("/waitlist", methods=["GET"])
+def get_my_waitlist():
+    # Filas do morador e a posição em cada uma; horários atendidos saem daqui e aparecem em /bookings/mine
+    if "morador_id" not in session:
+        return jsonify({"error": "Não autenticado"}), 401
+
+    ref = reference_data.get()
+    rows = db.session.execute(my_waitlist_select(session["morador_id"]))
+    return jsonify([serialize_waitlist_entry(row, ref) for row in rows]), 200
+
+@api_bp.route("/waitlist/<int:id_espera>", methods=["DELETE"])
+@rate_limited("booking", session_morador)
+def leave_slot_waitlist(id_espera):
+    if "morador_id" not in session:
+        return jsonify({"error": "Não autenticado"}), 401
+
+    if not leave_waitlist(id_espera, session["morador_id"]):
+        return jsonify({"error": "Entrada na fila de espera não encontrada."}), 404
+    return jsonify({"message": "Você saiu da fila de espera."}), 200
+
 # --- Rotas Administrativas ---
 @admin_bp.route("/dashboard") # Servir a página HTML do dashboard
 @admin_required
 def admin_dashboard_page():
     # current_app.static_folder é /home/ubuntu/app_lavanderia_condominio/src/static
-    return send_from_directory(current_app.static_folder, "admin_dashboard.html")
+    return static_assets.send_page("admin_dashboard.html")
 
 @api_bp.route("/admin/all_bookings", methods=["GET"])
 @admin_required
 def get_all_bookings():
-    # Adicionar filtros por data e andar, se fornecidos
-    query = Agendamento.query.join(Morador).join(Lavanderia).join(Andar).join(HorarioDisponivel)
-    
-    date_start_str = request.args.get("date_start")
-    date_end_str = request.args.get("date_end")
-    andar_num_str = request.args.get("andar")
+    # Filtros por data e andar, se fornecidos
+    try:
+        filters = parse_history_filters(request.args)
+        if request.args.get("stream") == "ndjson":
+            return stream_bookings_ndjson(filters)
+        if not wants_page(request.args):
+            return stream_bookings_list(filters) # Clientes anteriores à paginação
+        limit = parse_page_limit(request.args)
+        formato = parse_page_format(request.args) # ?format=columnar: uma lista por campo
+        # Uma consulta de projeção por tabela (quente e, se a página não encher, arquivo); cada linha vai direto para o JSON
+        rows = fetch_history_page(filters, request.args.get("cursor"), limit)
+    except HistoryFilterError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(history_page_payload(rows, limit, formato)), 200
+
+def stream_bookings_ndjson(filters):
+    # Exportação completa: uma linha JSON por agendamento, lida do banco em lotes
+    def generate():
+        for modelo in HISTORY_MODELS:
+            result = db.session.execute(history_select(filters, modelo).execution_options(yield_per=500))
+            for row in result:
+                yield current_app.json.dumps(serialize_history_row(row)) + "\n"
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+def stream_bookings_list(filters):
+    # Formato original: um array JSON com todo o histórico filtrado, montado em lotes durante o envio
+    def generate():
+        separador = "["
+        for modelo in HISTORY_MODELS:
+            result = db.session.execute(history_select(filters, modelo).execution_options(yield_per=500))
+            for row in result:
+                yield separador + current_app.json.dumps(serialize_history_row(row))
+                separador = ","
+        yield "[]" if separador == "[" else "]"
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+@api_bp.route("/admin/all_bookings/export", methods=["GET"])
+@admin_required
+def export_bookings():
+    # Download do histórico filtrado (mesmos filtros da listagem), gerado em lotes durante o envio
+    formato = request.args.get("format", "csv")
+    if formato not in EXPORT_FORMATS:
+        return jsonify({"error": f"Formato inválido. Use um de {sorted(EXPORT_FORMATS)}."}), 400
+    try:
+        filters = parse_history_filters(request.args)
+    except HistoryFilterError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if date_start_str:
-        try:
-            date_start = datetime.datetime.strptime(date_start_str, "%Y-%m-%d").date()
-            query = query.filter(Agendamento.data_agendamento >= date_start)
-        except ValueError:
-            return jsonify({"error": "Formato de data de início inválido."}), 400
-    if date_end_str:
+    mimetype, filename = EXPORT_FORMATS[formato]
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    if formato == "parquet":
         try:
-            date_end = datetime.datetime.strptime(date_end_str, "%Y-%m-%d").date()
-            query = query.filter(Agendamento.data_agendamento <= date_end)
-        except ValueError:
-            return jsonify({"error": "Formato de data de fim inválido."}), 400
-    if andar_num_str:
-        try:
-            andar_num = int(andar_num_str)
-            query = query.filter(Andar.numero_andar == andar_num)
-        except ValueError:
-            return jsonify({"error": "Número do andar inválido."}), 400
-
-    agendamentos = query.order_by(Agendamento.data_agendamento.desc(), HorarioDisponivel.hora_inicio.desc()).all()
-    response_data = []
-    for ag in agendamentos:
-        response_data.append({
-            "id_agendamento": ag.id_agendamento,
-            "data": ag.data_agendamento.isoformat(),
-            "horario_desc": ag.horario_agendado.descricao_horario,
-            "andar_num": ag.lavanderia_agendada.andar.numero_andar,
-            "lavanderia_identificador": ag.lavanderia_agendada.identificador_no_andar,
-            "morador_nome": ag.morador_responsavel.nome_completo,
-            "morador_apto": ag.morador_responsavel.numero_apartamento,
-            "status_agendamento": ag.status_agendamento
-        })
-    return jsonify(response_data), 200
+            chunks = parquet_chunks(export_batches(filters), load_pyarrow()) # Já comprimido por coluna
+        except ExportUnavailable as e:
+            return jsonify({"error": str(e)}), 501
+    else:
+        chunks = csv_chunks(export_batches(filters))
+        if "gzip" in request.accept_encodings:
+            chunks = gzip_chunks(chunks)
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+@api_bp.route("/admin/analytics/utilization", methods=["GET"])
+@admin_required
+def get_utilization():
+    # Mapas de calor de ocupação e taxas de cancelamento, lidos do agregado diário Uso_Diario
+    ref = reference_data.get()
+    try:
+        inicio, fim, andar, lavanderias = parse_analytics_range(request.args, ref)
+    except AnalyticsRangeError as e:
+        return jsonify({"error": str(e)}), 400
+    ids_lavanderia = [lav.id_lavanderia for lav in lavanderias] if andar else None
+    rows = db.session.execute(usage_select(inicio, fim, ids_lavanderia)).all()
+    return jsonify(build_utilization(rows, ref, inicio, fim, lavanderias)), 200
 
 @api_bp.route("/admin/all_laundries", methods=["GET"])
 @admin_required
 def get_all_laundries_status():
-    lavanderias = Lavanderia.query.join(Andar).order_by(Andar.numero_andar, Lavanderia.identificador_no_andar).all()
-    response_data = []
-    for lav in lavanderias:
-        response_data.append({
-            "id_lavanderia": lav.id_lavanderia,
-            "andar_num": lav.andar.numero_andar,
-            "identificador": lav.identificador_no_andar,
-            "status": lav.status
-        })
-    return jsonify(response_data), 200
+    slot_event_hub.sync()
+    etag = resource_versions.laundries_etag()
+    return not_modified(etag) or (with_etag(jsonify(serialize_laundries(reference_data.get())), etag), 200)
 
 @api_bp.route("/admin/laundry/<int:laundry_id>/status", methods=["PUT"])
 @admin_required
@@ -318,28 +578,37 @@ def update_laundry_status(laundry_id):
     if not new_status or new_status not in ["ativa", "manutencao"]:
         return jsonify({"error": "Status inválido. Use 'ativa' ou 'manutencao'."}), 400
 
-    lavanderia = Lavanderia.query.get(laundry_id)
+    lavanderia = db.session.get(Lavanderia, laundry_id)
     if not lavanderia:
         return jsonify({"error": "Lavanderia não encontrada."}), 404
 
-    # Alerta sobre agendamentos existentes se for colocar em manutenção
-    if new_status == "manutencao" and lavanderia.status == "ativa":
-        agendamentos_futuros = Agendamento.query.filter(
-            Agendamento.id_lavanderia_fk == laundry_id,
-            Agendamento.data_agendamento >= datetime.date.today(),
-            Agendamento.status_agendamento == "confirmado"
-        ).count()
-        if agendamentos_futuros > 0:
-            # Apenas um aviso, a ação prossegue
-            current_app.logger.warning(f"Lavanderia {laundry_id} colocada em manutenção possui {agendamentos_futuros} agendamentos futuros.")
-    
-    lavanderia.status = new_status
     try:
+        cancelados = []
+        atendidos = []
+        if lavanderia.status != new_status:
+            lavanderia.status = new_status
+            record_laundry_status(lavanderia)
+            if new_status == "manutencao":
+                # Agendamentos futuros são cancelados na mesma transação da mudança de status
+                cancelados = cancel_laundry_future(laundry_id)
+            else:
+                # Volta de manutenção: horários livres com fila de espera vão para o primeiro da fila
+                atendidos = assign_waiting(laundry_id)
         db.session.commit()
+        if cancelados:
+            current_app.logger.warning(f"Lavanderia {laundry_id} colocada em manutenção: {len(cancelados)} agendamentos futuros cancelados.")
+        # A lista de lavanderias ativas do andar mudou
+        reference_data.invalidate()
+        occupancy_cache.invalidate_laundry(lavanderia.id_lavanderia)
+        ref = reference_data.get()
         return jsonify({"message": "Status da lavanderia atualizado com sucesso!", "lavanderia": {
             "id_lavanderia": lavanderia.id_lavanderia,
             "status": lavanderia.status
-        }}), 200
+        }, "agendamentos_cancelados": [serialize_cancelled(row, ref) for row in cancelados],
+           "agendamentos_da_fila": len(atendidos)}), 200
+    except (BatchConflict, IntegrityError):
+        db.session.rollback()
+        return jsonify({"error": "Os agendamentos da lavanderia mudaram durante a operação. Tente novamente."}), 409
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Erro ao atualizar status da lavanderia: {e}")
@@ -348,6 +617,33 @@ def update_laundry_status(laundry_id):
 @api_bp.route("/admin/floors", methods=["GET"])
 @admin_required # Ou pode ser aberto se for só para popular um select no frontend
 def get_all_floors():
-    andares = Andar.query.order_by(Andar.numero_andar).all()
-    return jsonify([{"id_andar": andar.id_andar, "numero_andar": andar.numero_andar} for andar in andares]), 200
+    slot_event_hub.sync()
+    etag = resource_versions.floors_etag()
+    return not_modified(etag) or (with_etag(jsonify(serialize_floors(reference_data.get())), etag), 200)
+
+@api_bp.route("/admin/occupancy_cache", methods=["GET"])
+@admin_required
+def get_occupancy_cache_stats():
+    return jsonify(occupancy_cache.stats()), 200
 
+@api_bp.route("/admin/booking_metrics", methods=["GET"])
+@admin_required
+def get_booking_metrics():
+    return jsonify(booking_metrics.snapshot()), 200
+
+@api_bp.route("/admin/metrics", methods=["GET"])
+@admin_required
+def get_metrics():
+    # Formato texto do Prometheus: histogramas por endpoint + contadores do cache e das reservas
+    body = instrumentation.render_prometheus()
+    body += prometheus_gauges("lavanderia_occupancy_cache", occupancy_cache.stats())
+    body += prometheus_gauges("lavanderia_booking", booking_metrics.snapshot())
+    body += prometheus_gauges("lavanderia_principal_cache", principal_cache.stats())
+    body += prometheus_gauges("lavanderia_password_hashing", hashing_service.stats())
+    body += prometheus_gauges("lavanderia_slot_events", slot_event_hub.stats())
+    body += prometheus_gauges("lavanderia_resource_versions", resource_versions.stats())
+    body += prometheus_gauges("lavanderia_tenant_engines", tenant_engines.stats())
+    body += prometheus_gauges("lavanderia_slot_reads", slot_reads.stats())
+    body += prometheus_gauges("lavanderia_rate_limit", rate_limiter.stats())
+    body += prometheus_gauges("lavanderia_response_compression", response_compression.stats())
+    return Response(body, mimetype="text/plain; version=0.0.4")
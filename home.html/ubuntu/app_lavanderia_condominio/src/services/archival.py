@@ -0,0 +1,160 @@
+# src/services/archival.py
+from flask import current_app
+from flask.cli import with_appcontext
+from src.models.models import db, Agendamento, AgendamentoArquivo
+from src.services.waitlist import expire_waitlist
+from src.tenancy import tenant_options, selected_tenants, each_tenant
+import click
+import datetime
+import time
+
+# Manutenção periódica da tabela quente Agendamentos, fora dos workers web:
+#   flask --app src.main archive-bookings [--horizonte DIAS] [--intervalo SEGUNDOS] [--tenant T | --todos-tenants]
+#   1. confirmados de datas passadas viram "concluido". Concluido continua ocupando o horário
+#      (STATUS_OCUPA_HORARIO): grade, cache de ocupação, agregado de uso e ETags não mudam, então
+#      nenhum evento de horário é emitido.
+#   2. dias anteriores ao horizonte vão para Agendamentos_Arquivo, do mais antigo para o mais novo e
+#      em dias inteiros (INSERT ... SELECT + DELETE na mesma transação). Toda linha arquivada fica mais
+#      antiga que qualquer linha quente, o que o histórico administrativo usa para ler as duas tabelas.
+#   3. filas de espera de datas passadas são removidas.
+#   4. compactação: ANALYZE com amostragem limitada e, no SQLite com auto_vacuum=INCREMENTAL,
+#      devolução de um número limitado de páginas livres por execução.
+DEFAULT_ARCHIVE_HORIZON_DAYS = 180
+ARCHIVE_BATCH_DAYS = 7  # Dias por transação, nas duas etapas
+VACUUM_PAGES = 2048  # Páginas devolvidas ao sistema de arquivos por execução
+ANALYZE_LIMIT = 1000  # PRAGMA analysis_limit: linhas lidas por índice no ANALYZE
+
+agendamentos = Agendamento.__table__
+arquivo = AgendamentoArquivo.__table__
+COLUNAS_ARQUIVO = [coluna.name for coluna in arquivo.columns]
+
+class ArchivalError(RuntimeError):
+    pass
+
+def ensure_increasing_ids():
+    # Agendamentos chega ao arquivo com o mesmo id, então um id não pode voltar a ser usado depois que
+    # as linhas de maior id saem da tabela quente. Sem AUTOINCREMENT o SQLite usa max(rowid) + 1:
+    # tabelas criadas antes da opção são reconstruídas, e a sequência começa depois do maior id do
+    # arquivo. No MySQL 8 o contador AUTO_INCREMENT do InnoDB já não recua.
+    engine = db.session.get_bind()  # Banco do tenant corrente
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.connect() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")  # DDL e cópia numa única transação
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (agendamentos.name,)).scalar()
+        reconstruida = ddl is not None and "AUTOINCREMENT" not in ddl.upper()
+        if reconstruida:
+            antiga = f"{agendamentos.name}_sem_autoincrement"
+            colunas = ", ".join(f'"{coluna.name}"' for coluna in agendamentos.columns)
+            for index in agendamentos.indexes:
+                conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{index.name}"')
+            conn.exec_driver_sql(f'ALTER TABLE "{agendamentos.name}" RENAME TO "{antiga}"')
+            agendamentos.create(conn)
+            conn.exec_driver_sql(f'INSERT INTO "{agendamentos.name}" ({colunas}) SELECT {colunas} FROM "{antiga}"')
+            conn.exec_driver_sql(f'DROP TABLE "{antiga}"')
+        maior_arquivado = conn.execute(db.select(db.func.max(arquivo.c.id_agendamento))).scalar() or 0
+        sequencia = conn.exec_driver_sql("SELECT seq FROM sqlite_sequence WHERE name = ?", (agendamentos.name,)).scalar()
+        if sequencia is None:
+            conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (agendamentos.name, maior_arquivado))
+        elif sequencia < maior_arquivado:
+            conn.exec_driver_sql("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (maior_arquivado, agendamentos.name))
+        conn.commit()
+    return reconstruida
+
+def complete_past_bookings(hoje):
+    total = 0
+    inicio = db.session.execute(
+        db.select(db.func.min(agendamentos.c.data_agendamento))
+          .where(agendamentos.c.status_agendamento == "confirmado", agendamentos.c.data_agendamento < hoje)
+    ).scalar()
+    while inicio is not None and inicio < hoje:
+        fim = min(hoje, inicio + datetime.timedelta(days=ARCHIVE_BATCH_DAYS))
+        result = db.session.execute(
+            db.update(agendamentos)
+              .where(agendamentos.c.status_agendamento == "confirmado",
+                     agendamentos.c.data_agendamento >= inicio, agendamentos.c.data_agendamento < fim)
+              .values(status_agendamento="concluido")
+        )
+        db.session.commit()
+        total += result.rowcount
+        inicio = fim
+    db.session.commit()
+    return total
+
+def archive_before(corte):
+    total = 0
+    while True:
+        # Primeira entrada de ix_agendamento_data
+        inicio = db.session.execute(
+            db.select(db.func.min(agendamentos.c.data_agendamento)).where(agendamentos.c.data_agendamento < corte)
+        ).scalar()
+        if inicio is None:
+            db.session.commit()
+            return total
+        fim = min(corte, inicio + datetime.timedelta(days=ARCHIVE_BATCH_DAYS))
+        janela = (agendamentos.c.data_agendamento >= inicio, agendamentos.c.data_agendamento < fim)
+        copiados = db.session.execute(
+            db.insert(arquivo).from_select(COLUNAS_ARQUIVO, db.select(*(agendamentos.c[nome] for nome in COLUNAS_ARQUIVO)).where(*janela))
+        ).rowcount
+        removidos = db.session.execute(db.delete(agendamentos).where(*janela)).rowcount
+        if copiados != removidos:
+            db.session.rollback()
+            raise ArchivalError(f"Arquivamento de {inicio} a {fim}: {copiados} linhas copiadas, {removidos} removidas.")
+        db.session.commit()
+        total += removidos
+
+def compact(vacuum_completo=False):
+    # Fora de transação: VACUUM não roda dentro de uma, e o ANALYZE não segura o lock de escrita
+    engine = db.session.get_bind()  # Banco do tenant corrente
+    tabelas = (agendamentos.name, arquivo.name)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.dialect.name != "sqlite":
+            # InnoDB reaproveita as páginas liberadas; só as estatísticas precisam ser atualizadas
+            conn.exec_driver_sql(f"ANALYZE TABLE {', '.join(tabelas)}").all()
+            return {"paginas_livres": None, "paginas_devolvidas": 0}
+        conn.exec_driver_sql(f"PRAGMA analysis_limit={ANALYZE_LIMIT}")
+        for tabela in tabelas:
+            conn.exec_driver_sql(f'ANALYZE "{tabela}"')
+        if vacuum_completo:
+            # Converte bancos criados sem auto_vacuum; reescreve o arquivo inteiro (bloqueia escritas)
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+        livres = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:  # INCREMENTAL
+            # O pysqlite dá um único passo por execução e o pragma libera uma página por passo
+            for _ in range(min(livres, VACUUM_PAGES)):
+                conn.exec_driver_sql("PRAGMA incremental_vacuum(1)")
+        restantes = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    return {"paginas_livres": restantes, "paginas_devolvidas": livres - restantes}
+
+def run_archival(horizonte_dias, vacuum_completo=False, hoje=None):
+    hoje = hoje or datetime.date.today()
+    concluidos = complete_past_bookings(hoje)
+    arquivados = archive_before(hoje - datetime.timedelta(days=horizonte_dias))
+    filas_expiradas = expire_waitlist(hoje)
+    return {"concluidos": concluidos, "arquivados": arquivados, "filas_expiradas": filas_expiradas, **compact(vacuum_completo)}
+
+@click.command("archive-bookings")
+@click.option("--horizonte", type=int, default=None, help="Dias de histórico mantidos na tabela quente (padrão: ARCHIVE_HORIZON_DAYS).")
+@click.option("--intervalo", type=float, default=0, help="Segundos entre execuções; 0 executa uma vez.")
+@click.option("--vacuum-completo", is_flag=True, help="SQLite: ativa auto_vacuum incremental e reescreve o banco (uma vez).")
+@tenant_options
+@with_appcontext
+def archive_bookings_command(horizonte, intervalo, vacuum_completo, tenants, todos_tenants):
+    """Conclui agendamentos passados, arquiva os antigos, expira filas de espera e compacta o banco."""
+    horizonte = horizonte if horizonte is not None else current_app.config.get("ARCHIVE_HORIZON_DAYS", DEFAULT_ARCHIVE_HORIZON_DAYS)
+    while True:
+        # Lista refeita a cada execução: --todos-tenants inclui condomínios criados nesse meio tempo
+        for tenant in each_tenant(selected_tenants(tenants, todos_tenants), db.session):
+            inicio = time.perf_counter()
+            stats = run_archival(horizonte, vacuum_completo)
+            click.echo(f"Arquivamento{f' [{tenant}]' if tenant else ''} (horizonte {horizonte} dias): {stats} "
+                       f"em {time.perf_counter() - inicio:.2f}s")
+        if not intervalo:
+            return
+        vacuum_completo = False
+        db.session.remove()
+        time.sleep(intervalo)
+
+def init_archival(app):
+    app.cli.add_command(archive_bookings_command)
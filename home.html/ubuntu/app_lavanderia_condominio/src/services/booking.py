@@ -0,0 +1,116 @@
+# src/services/booking.py
+from src.models.models import db, Agendamento
+from src.services.slot_events import record_slot_change
+from src.services.usage_rollup import record_usage
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.sql import func
+import random
+import threading
+import time
+
+# Reserva atômica de um horário.
+# Primeiro tenta reativar uma linha "cancelado" da mesma chave única (lavanderia, horario, data);
+# se não existir, insere. Disputa de lock (SQLite "database is locked", deadlock/lock wait no MySQL)
+# é tentada novamente algumas vezes com backoff; conflito real de chave vira BookingConflict.
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 0.02  # segundos; dobra a cada tentativa, com jitter
+
+class BookingConflict(Exception):
+    pass
+
+class BookingContention(Exception):
+    pass
+
+class BookingMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.claims = 0
+        self.inserted = 0
+        self.reactivated = 0
+        self.conflicts = 0
+        self.retries = 0
+        self.contention_failures = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+
+    def record(self, outcome, latency, retries):
+        with self._lock:
+            self.claims += 1
+            self.retries += retries
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.latency_sum += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "claims": self.claims,
+                "inserted": self.inserted,
+                "reactivated": self.reactivated,
+                "conflicts": self.conflicts,
+                "retries": self.retries,
+                "contention_failures": self.contention_failures,
+                "latency_avg_ms": round(self.latency_sum / self.claims * 1000, 3) if self.claims else 0.0,
+                "latency_max_ms": round(self.latency_max * 1000, 3)
+            }
+
+booking_metrics = BookingMetrics()
+
+def _is_lock_contention(error):
+    message = str(error.orig).lower()
+    return "database is locked" in message or "deadlock" in message or "lock wait timeout" in message
+
+def _claim_once(id_morador, id_lavanderia, id_horario, data_agendamento):
+    slot = (
+        Agendamento.id_lavanderia_fk == id_lavanderia,
+        Agendamento.id_horario_fk == id_horario,
+        Agendamento.data_agendamento == data_agendamento
+    )
+    # Reativa a reserva cancelada que ainda ocupa a chave única
+    result = db.session.execute(
+        db.update(Agendamento)
+          .where(*slot, Agendamento.status_agendamento == "cancelado")
+          .values(status_agendamento="confirmado", id_morador_fk=id_morador, data_criacao=func.now())
+          .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        id_agendamento = db.session.execute(db.select(Agendamento.id_agendamento).where(*slot)).scalar_one()
+        record_slot_change(id_lavanderia, data_agendamento, id_horario, ocupado=True)
+        record_usage(id_lavanderia, id_horario, data_agendamento, ocupado=True)
+        db.session.commit()
+        return id_agendamento, "reactivated"
+
+    novo_agendamento = Agendamento(
+        id_morador_fk=id_morador,
+        id_lavanderia_fk=id_lavanderia,
+        id_horario_fk=id_horario,
+        data_agendamento=data_agendamento
+    )
+    db.session.add(novo_agendamento)
+    record_slot_change(id_lavanderia, data_agendamento, id_horario, ocupado=True)
+    record_usage(id_lavanderia, id_horario, data_agendamento, ocupado=True)
+    db.session.commit()
+    return novo_agendamento.id_agendamento, "inserted"
+
+def claim_slot(id_morador, id_lavanderia, id_horario, data_agendamento):
+    inicio = time.perf_counter()
+    for tentativa in range(MAX_RETRIES + 1):
+        try:
+            id_agendamento, outcome = _claim_once(id_morador, id_lavanderia, id_horario, data_agendamento)
+            booking_metrics.record(outcome, time.perf_counter() - inicio, tentativa)
+            return id_agendamento
+        except IntegrityError:
+            db.session.rollback()
+            booking_metrics.record("conflicts", time.perf_counter() - inicio, tentativa)
+            raise BookingConflict()
+        except OperationalError as e:
+            db.session.rollback()
+            if not _is_lock_contention(e):
+                raise
+            if tentativa < MAX_RETRIES:
+                time.sleep(RETRY_BASE_DELAY * (2 ** tentativa) * (0.5 + random.random()))
+    booking_metrics.record("contention_failures", time.perf_counter() - inicio, MAX_RETRIES)
+    raise BookingContention()
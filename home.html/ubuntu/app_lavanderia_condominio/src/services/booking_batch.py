@@ -0,0 +1,149 @@
+# src/services/booking_batch.py
+from src.models.models import db, Agendamento
+from src.services.booking import MAX_RETRIES, RETRY_BASE_DELAY, BookingContention, _is_lock_contention
+from src.services.slot_events import record_slot_change
+from src.services.usage_rollup import record_usage
+from src.services.waitlist import release_slot
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.sql import func
+import datetime
+import random
+import time
+
+# Operações em lote sobre agendamentos: uma transação, um commit e uma escrita executemany por lote.
+# Cada linha é escrita com guarda no WHERE (id + status esperado); se uma escrita concorrente mudou
+# alguma linha entre a leitura e a escrita (contagem de linhas diferente) ou ocupou uma data livre
+# (IntegrityError), o lote inteiro é desfeito e relido.
+MAX_RECURRING_WEEKS = 26
+
+agendamentos = Agendamento.__table__
+
+class BatchConflict(Exception):
+    # As linhas do lote mudaram durante a operação
+    pass
+
+def _run_batch(operacao, *args):
+    for tentativa in range(MAX_RETRIES + 1):
+        try:
+            return operacao(*args)
+        except (IntegrityError, BatchConflict):
+            db.session.rollback()
+        except OperationalError as e:
+            db.session.rollback()
+            if not _is_lock_contention(e):
+                raise
+        if tentativa < MAX_RETRIES:
+            time.sleep(RETRY_BASE_DELAY * (2 ** tentativa) * (0.5 + random.random()))
+    raise BookingContention()
+
+# --- Reserva semanal recorrente ---
+def recurring_dates(data_inicio, semanas):
+    return [data_inicio + datetime.timedelta(weeks=n) for n in range(semanas)]
+
+def _claim_recurring_once(id_morador, id_lavanderia, id_horario, datas):
+    slot = (agendamentos.c.id_lavanderia_fk == id_lavanderia, agendamentos.c.id_horario_fk == id_horario)
+    existentes = {row.data_agendamento: row for row in db.session.execute(
+        db.select(agendamentos.c.id_agendamento, agendamentos.c.data_agendamento, agendamentos.c.status_agendamento)
+          .where(*slot, agendamentos.c.data_agendamento.in_(datas))
+    )}
+    reativar = [existentes[d] for d in datas if d in existentes and existentes[d].status_agendamento == "cancelado"]
+    inserir = [d for d in datas if d not in existentes]
+
+    if reativar:
+        # Reservas canceladas ainda ocupam a chave única: reativadas como em claim_slot
+        result = db.session.execute(
+            db.update(agendamentos)
+              .where(agendamentos.c.id_agendamento == bindparam("b_id"), agendamentos.c.status_agendamento == "cancelado")
+              .values(status_agendamento="confirmado", id_morador_fk=id_morador, data_criacao=func.now()),
+            [{"b_id": row.id_agendamento} for row in reativar]
+        )
+        if result.rowcount != len(reativar):
+            raise BatchConflict()
+    ids_inseridos = {}
+    if inserir:
+        db.session.execute(db.insert(agendamentos), [{
+            "id_morador_fk": id_morador,
+            "id_lavanderia_fk": id_lavanderia,
+            "id_horario_fk": id_horario,
+            "data_agendamento": d,
+            "status_agendamento": "confirmado"
+        } for d in inserir])
+        ids_inseridos = dict(db.session.execute(
+            db.select(agendamentos.c.data_agendamento, agendamentos.c.id_agendamento)
+              .where(*slot, agendamentos.c.data_agendamento.in_(inserir))
+        ).all())
+
+    resultados = []
+    for d in datas:
+        if d in ids_inseridos:
+            id_agendamento = ids_inseridos[d]
+        elif d in existentes and existentes[d].status_agendamento == "cancelado":
+            id_agendamento = existentes[d].id_agendamento
+        else:
+            resultados.append({"data": d.isoformat(), "status": "conflito"})
+            continue
+        record_slot_change(id_lavanderia, d, id_horario, ocupado=True)
+        record_usage(id_lavanderia, id_horario, d, ocupado=True)
+        resultados.append({"data": d.isoformat(), "status": "confirmado", "id_agendamento": id_agendamento})
+    db.session.commit()
+    return resultados
+
+def claim_recurring(id_morador, id_lavanderia, id_horario, data_inicio, semanas):
+    # Reserva o mesmo horário por `semanas` semanas; datas já ocupadas voltam como "conflito"
+    return _run_batch(_claim_recurring_once, id_morador, id_lavanderia, id_horario, recurring_dates(data_inicio, semanas))
+
+# --- Cancelamento em lote ---
+def _future_confirmed_select(*criterios):
+    return (
+        db.select(agendamentos.c.id_agendamento, agendamentos.c.data_agendamento,
+                  agendamentos.c.id_horario_fk, agendamentos.c.id_lavanderia_fk)
+          .where(*criterios, agendamentos.c.status_agendamento == "confirmado",
+                 agendamentos.c.data_agendamento >= datetime.date.today())
+          .order_by(agendamentos.c.data_agendamento, agendamentos.c.id_horario_fk)
+    )
+
+def cancel_rows(rows, *guardas):
+    # Cancela, na transação corrente, linhas confirmadas lidas nela; não faz commit
+    if not rows:
+        return []
+    result = db.session.execute(
+        db.update(agendamentos)
+          .where(agendamentos.c.id_agendamento == bindparam("b_id"), agendamentos.c.status_agendamento == "confirmado", *guardas)
+          .values(status_agendamento="cancelado"),
+        [{"b_id": row.id_agendamento} for row in rows]
+    )
+    if result.rowcount != len(rows):
+        raise BatchConflict()
+    for row in rows:
+        record_slot_change(row.id_lavanderia_fk, row.data_agendamento, row.id_horario_fk, ocupado=False)
+        record_usage(row.id_lavanderia_fk, row.id_horario_fk, row.data_agendamento, ocupado=False)
+    return rows
+
+def _cancel_resident_future_once(id_morador):
+    do_morador = agendamentos.c.id_morador_fk == id_morador
+    rows = db.session.execute(_future_confirmed_select(do_morador)).all()
+    cancel_rows(rows, do_morador)  # A guarda impede cancelar um horário que outro morador reativou no meio
+    # Horários liberados vão para o primeiro da fila de espera, no mesmo commit
+    reatribuidos = {(row.id_lavanderia_fk, row.data_agendamento, row.id_horario_fk) for row in rows
+                    if release_slot(row.id_lavanderia_fk, row.id_horario_fk, row.data_agendamento) is not None}
+    db.session.commit()
+    return rows, reatribuidos
+
+def cancel_resident_future(id_morador):
+    # Retorna (linhas canceladas, chaves (lavanderia, data, horario) entregues à fila de espera)
+    return _run_batch(_cancel_resident_future_once, id_morador)
+
+def cancel_laundry_future(id_lavanderia):
+    # Usado por update_laundry_status dentro da transação da mudança de status
+    rows = db.session.execute(_future_confirmed_select(agendamentos.c.id_lavanderia_fk == id_lavanderia)).all()
+    return cancel_rows(rows)
+
+def serialize_cancelled(row, ref):
+    return {
+        "id_agendamento": row.id_agendamento,
+        "data": row.data_agendamento.isoformat(),
+        "horario": ref.horarios[row.id_horario_fk].descricao_horario,
+        "lavanderia": ref.lavanderias[row.id_lavanderia_fk].identificador_no_andar,
+        "status": "cancelado"
+    }
@@ -0,0 +1,108 @@
+# src/services/booking_export.py
+from src.models.models import db, Agendamento
+from src.services.booking_history import history_select, HISTORY_MODELS
+import csv
+import io
+import zlib
+
+# Exportação do histórico de agendamentos com memória constante.
+# As linhas são lidas em lotes (yield_per: cursor do lado do servidor no MySQL, step incremental no
+# SQLite) e cada lote é serializado e enviado antes do próximo ser lido.
+#   - csv: texto, comprimido com gzip durante o envio quando o cliente aceita
+#   - parquet: colunar (dicionário + zstd por row group, um row group por lote); requer pyarrow,
+#     dependência opcional (pip install -r requirements-export.txt)
+EXPORT_BATCH_SIZE = 5000
+EXPORT_HEADER = ("id_agendamento", "data", "horario_desc", "andar_num", "lavanderia_identificador",
+                 "morador_nome", "morador_apto", "status_agendamento")
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "agendamentos.csv"),
+    "parquet": ("application/vnd.apache.parquet", "agendamentos.parquet"),
+}
+
+class ExportUnavailable(Exception):
+    pass
+
+def export_select(filters, modelo=Agendamento):
+    # Ordem do índice de data (ix_agendamento_data / ix_arquivo_data): o banco não precisa ordenar o
+    # histórico inteiro antes da primeira linha
+    return history_select(filters, modelo).order_by(None)\
+             .order_by(modelo.data_agendamento, modelo.id_agendamento)\
+             .execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+def export_batches(filters):
+    # Ordem crescente de data: primeiro o arquivo, depois a tabela quente
+    for modelo in reversed(HISTORY_MODELS):
+        for partition in db.session.execute(export_select(filters, modelo)).partitions():
+            yield [row[:8] for row in partition]
+
+def csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # Cabeçalho gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+class _ChunkSink:
+    # Destino de escrita do ParquetWriter que acumula os bytes até o próximo envio
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+def load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportUnavailable("Exportação parquet indisponível: instale as dependências de requirements-export.txt.")
+    return pyarrow
+
+def parquet_chunks(batches, pa):
+    schema = pa.schema([
+        ("id_agendamento", pa.int64()),
+        ("data", pa.date32()),
+        ("horario_desc", pa.string()),
+        ("andar_num", pa.int32()),
+        ("lavanderia_identificador", pa.string()),
+        ("morador_nome", pa.string()),
+        ("morador_apto", pa.string()),
+        ("status_agendamento", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pa.parquet.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    for batch in batches:
+        colunas = list(zip(*batch)) if batch else [[] for _ in EXPORT_HEADER]
+        writer.write_batch(pa.record_batch([pa.array(valores, type=campo.type) for valores, campo in zip(colunas, schema)], schema=schema))
+        yield sink.drain()
+    writer.close()  # Rodapé com os metadados dos row groups
+    yield sink.drain()
@@ -0,0 +1,182 @@
+# src/services/booking_history.py
+from src.models.models import db, Andar, Lavanderia, HorarioDisponivel, Morador, Agendamento, AgendamentoArquivo
+import base64
+import datetime
+
+# Projeção com exatamente as colunas serializadas na listagem administrativa.
+# As linhas vêm como tuplas, sem hidratar objetos ORM nem disparar lazy loads.
+# O histórico é lido da tabela quente e do arquivo (Agendamentos_Arquivo): o arquivamento move dias
+# inteiros, dos mais antigos para os mais novos, então toda linha arquivada é mais antiga que qualquer
+# linha quente e as duas tabelas se concatenam na ordem de data sem mistura.
+HISTORY_MODELS = (Agendamento, AgendamentoArquivo)  # Ordem decrescente de data
+
+def history_columns(modelo):
+    return (
+        modelo.id_agendamento,
+        modelo.data_agendamento,
+        HorarioDisponivel.descricao_horario,
+        Andar.numero_andar,
+        Lavanderia.identificador_no_andar,
+        Morador.nome_completo,
+        Morador.numero_apartamento,
+        modelo.status_agendamento,
+        HorarioDisponivel.hora_inicio,  # Apenas para o cursor de paginação
+        modelo.id_agendamento.label("cursor_id")
+    )
+
+# Nomes das oito primeiras colunas de history_columns na resposta. Os serializadores escrevem as
+# datas em ISO 8601: o formato não depende do JSON_PROVIDER (o provider do Flask usaria data HTTP).
+HISTORY_FIELDS = ("id_agendamento", "data", "horario_desc", "andar_num", "lavanderia_identificador",
+                  "morador_nome", "morador_apto", "status_agendamento")
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 500
+# Sem nenhum destes parâmetros a listagem mantém o formato anterior à paginação: lista simples com
+# todo o histórico filtrado (enviada em lotes, como o NDJSON); com qualquer um, página com next_cursor
+PAGE_PARAMS = ("limit", "cursor", "format")
+# ?format= da listagem: uma lista de objetos (padrão) ou um objeto com uma lista por campo, sem
+# repetir os nomes dos campos em cada linha
+HISTORY_PAGE_FORMATS = ("rows", "columnar")
+
+class HistoryFilterError(ValueError):
+    pass
+
+class HistoryFilters:
+    # Filtros por data e andar, aplicáveis à tabela quente ou ao arquivo
+    __slots__ = ("date_start", "date_end", "andar_num")
+
+    def __init__(self, date_start=None, date_end=None, andar_num=None):
+        self.date_start = date_start
+        self.date_end = date_end
+        self.andar_num = andar_num
+
+    def criteria(self, modelo):
+        criterios = []
+        if self.date_start:
+            criterios.append(modelo.data_agendamento >= self.date_start)
+        if self.date_end:
+            criterios.append(modelo.data_agendamento <= self.date_end)
+        if self.andar_num is not None:
+            criterios.append(Andar.numero_andar == self.andar_num)
+        return criterios
+
+def parse_history_filters(args):
+    # Filtros por data e andar compartilhados pelas rotas de histórico
+    filters = HistoryFilters()
+    date_start_str = args.get("date_start")
+    date_end_str = args.get("date_end")
+    andar_num_str = args.get("andar")
+
+    if date_start_str:
+        try:
+            filters.date_start = datetime.datetime.strptime(date_start_str, "%Y-%m-%d").date()
+        except ValueError:
+            raise HistoryFilterError("Formato de data de início inválido.")
+    if date_end_str:
+        try:
+            filters.date_end = datetime.datetime.strptime(date_end_str, "%Y-%m-%d").date()
+        except ValueError:
+            raise HistoryFilterError("Formato de data de fim inválido.")
+    if andar_num_str:
+        try:
+            filters.andar_num = int(andar_num_str)
+        except ValueError:
+            raise HistoryFilterError("Número do andar inválido.")
+    return filters
+
+def encode_cursor(row):
+    raw = f"{row.data_agendamento.isoformat()}|{row.hora_inicio.isoformat()}|{row.cursor_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        data_str, hora_str, id_str = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return (datetime.date.fromisoformat(data_str), datetime.time.fromisoformat(hora_str), int(id_str))
+    except ValueError:
+        raise HistoryFilterError("Cursor de paginação inválido.")
+
+def wants_page(args):
+    return any(args.get(param) for param in PAGE_PARAMS)
+
+def parse_page_limit(args):
+    limit_str = args.get("limit")
+    if not limit_str:
+        return DEFAULT_PAGE_LIMIT
+    try:
+        limit = int(limit_str)
+    except ValueError:
+        raise HistoryFilterError("Parâmetro limit inválido.")
+    if limit < 1:
+        raise HistoryFilterError("Parâmetro limit inválido.")
+    return min(limit, MAX_PAGE_LIMIT)
+
+def parse_page_format(args):
+    formato = args.get("format") or HISTORY_PAGE_FORMATS[0]
+    if formato not in HISTORY_PAGE_FORMATS:
+        raise HistoryFilterError(f"Parâmetro format inválido. Use um de {list(HISTORY_PAGE_FORMATS)}.")
+    return formato
+
+def history_select(filters, modelo=Agendamento):
+    return db.select(*history_columns(modelo))\
+             .join(Morador, modelo.id_morador_fk == Morador.id_morador)\
+             .join(Lavanderia, modelo.id_lavanderia_fk == Lavanderia.id_lavanderia)\
+             .join(Andar, Lavanderia.id_andar_fk == Andar.id_andar)\
+             .join(HorarioDisponivel, modelo.id_horario_fk == HorarioDisponivel.id_horario)\
+             .where(*filters.criteria(modelo))\
+             .order_by(modelo.data_agendamento.desc(), HorarioDisponivel.hora_inicio.desc(), modelo.id_agendamento.desc())
+
+def history_page_select(filters, cursor, limit, modelo=Agendamento):
+    # Paginação por keyset em (data_agendamento, hora_inicio, id_agendamento), ordem decrescente.
+    # Busca limit + 1 linhas para saber se existe uma próxima página.
+    stmt = history_select(filters, modelo)
+    if cursor:
+        stmt = stmt.where(db.tuple_(modelo.data_agendamento, HorarioDisponivel.hora_inicio, modelo.id_agendamento)
+                          < db.tuple_(*decode_cursor(cursor)))
+    return stmt.limit(limit + 1)
+
+def fetch_history_page(filters, cursor, limit):
+    # Completa a página com o arquivo quando a tabela quente acaba; o mesmo cursor vale para as duas
+    rows = []
+    for modelo in HISTORY_MODELS:
+        rows += db.session.execute(history_page_select(filters, cursor, limit - len(rows), modelo)).all()
+        if len(rows) > limit:
+            break
+    return rows
+
+def my_bookings_select(morador_id):
+    # Agendamentos confirmados do morador; descrições vêm do registro de referência
+    return db.select(Agendamento.id_agendamento, Agendamento.data_agendamento, Agendamento.id_horario_fk, Agendamento.id_lavanderia_fk)\
+             .where(Agendamento.id_morador_fk == morador_id, Agendamento.status_agendamento == "confirmado")\
+             .order_by(Agendamento.data_agendamento, Agendamento.id_horario_fk)
+
+def serialize_my_booking(row, ref):
+    id_agendamento, data_agendamento, id_horario, id_lavanderia = row
+    lav = ref.lavanderias[id_lavanderia]
+    return {
+        "id_agendamento": id_agendamento,
+        "data": data_agendamento.isoformat(),
+        "horario_desc": ref.horarios[id_horario].descricao_horario,
+        "lavanderia_id": id_lavanderia,
+        "lavanderia_desc": lav.identificador_no_andar,
+        "andar_lavanderia": lav.numero_andar
+    }
+
+def serialize_history_row(row):
+    # zip para nas oito colunas nomeadas; as de paginação ficam de fora
+    campos = dict(zip(HISTORY_FIELDS, row))
+    campos["data"] = row.data_agendamento.isoformat()
+    return campos
+
+def history_page_payload(rows, limit, formato="rows"):
+    # rows: resultado de fetch_history_page (até limit + 1 linhas)
+    pagina = rows[:limit]
+    if formato == "columnar":
+        colunas = list(zip(*pagina)) or [()] * len(HISTORY_FIELDS)  # Transposição feita em C
+        bookings = {campo: list(valores) for campo, valores in zip(HISTORY_FIELDS, colunas)}
+        bookings["data"] = [data.isoformat() for data in bookings["data"]]
+    else:
+        bookings = [serialize_history_row(row) for row in pagina]
+    return {
+        "bookings": bookings,
+        "next_cursor": encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    }
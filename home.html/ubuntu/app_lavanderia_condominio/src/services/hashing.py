@@ -0,0 +1,105 @@
+# src/services/hashing.py
+from werkzeug.security import check_password_hash, generate_password_hash
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+import multiprocessing
+import os
+import threading
+
+# Hash de senha fora do processo do worker.
+# generate_password_hash/check_password_hash são propositalmente caros (scrypt/pbkdf2); rodam num
+# pool de processos limitado, com teto de tarefas pendentes. Acima do teto a requisição recebe 503
+# imediatamente em vez de ocupar o worker.
+DEFAULT_HASH_METHOD = "scrypt:32768:8:1"  # Mesmo padrão do Werkzeug, explícito para detectar mudança de custo
+# Processos do pool não saem de fork do worker: o worker do gunicorn já tem threads de requisição e
+# a leitura do log de eventos, e um lock preso no fork travaria o filho
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def method_prefix(method):
+    # Prefixo que o Werkzeug grava no hash ("scrypt" -> "scrypt:32768:8:1"); custa um hash
+    return generate_password_hash("", method).split("$", 1)[0]
+
+class HashingOverloaded(Exception):
+    pass
+
+class HashingService:
+    def __init__(self, method=DEFAULT_HASH_METHOD, workers=2, queue_limit=8, timeout=10.0):
+        self.method = method
+        self._prefix = None  # Método como o Werkzeug grava no hash, calculado no primeiro needs_rehash
+        self.workers = workers  # 0 = executa no próprio processo (desenvolvimento)
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._executor = None
+        self._executor_pid = None
+        self._slots = threading.BoundedSemaphore(queue_limit)
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.rehashed = 0
+
+    def configure(self, method=None, workers=None, queue_limit=None, timeout=None):
+        with self._lock:
+            if method is not None:
+                self.method = method
+                self._prefix = None  # Recalculado no primeiro needs_rehash: create_app não calcula hash
+            if workers is not None:
+                self.workers = workers
+            if queue_limit is not None:
+                self.queue_limit = queue_limit
+                self._slots = threading.BoundedSemaphore(queue_limit)
+            if timeout is not None:
+                self.timeout = timeout
+            self._shutdown_executor()
+
+    def _shutdown_executor(self):
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._executor_pid = None
+
+    def _get_executor(self):
+        # Criado sob demanda no processo que o usa (seguro com fork/--preload do gunicorn)
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(POOL_START_METHOD))
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingOverloaded()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            try:
+                return self._get_executor().submit(fn, *args).result(timeout=self.timeout)
+            except FutureTimeoutError:
+                raise HashingOverloaded()
+        finally:
+            self._slots.release()
+
+    def hash_password(self, senha):
+        return self._run(generate_password_hash, senha, self.method)
+
+    def verify_password(self, senha_hash, senha):
+        return self._run(check_password_hash, senha_hash, senha)
+
+    def needs_rehash(self, senha_hash):
+        # Formato do Werkzeug: "<método>$<salt>$<hash>", com o método já normalizado
+        if self._prefix is None:
+            self._prefix = method_prefix(self.method)
+        return senha_hash.split("$", 1)[0] != self._prefix
+
+    def stats(self):
+        return {"method": self.method, "workers": self.workers, "queue_limit": self.queue_limit,
+                "rejected": self.rejected, "rehashed": self.rehashed}
+
+hashing_service = HashingService()
+
+def init_hashing(app):
+    hashing_service.configure(
+        method=app.config.get("PASSWORD_HASH_METHOD", DEFAULT_HASH_METHOD),
+        workers=app.config.get("PASSWORD_HASH_WORKERS", 2),
+        queue_limit=app.config.get("PASSWORD_HASH_QUEUE_LIMIT", 8),
+        timeout=app.config.get("PASSWORD_HASH_TIMEOUT", 10.0)
+    )
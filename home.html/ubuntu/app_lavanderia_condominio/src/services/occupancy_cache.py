@@ -0,0 +1,148 @@
+# src/services/occupancy_cache.py
+from collections import OrderedDict
+from src.tenancy import TenantScoped
+import datetime
+import threading
+import time
+
+# Índice em memória da ocupação por (lavanderia, data).
+# Cada entrada guarda um bitmask em que o bit N indica que o HorarioDisponivel de id N está ocupado.
+# As rotas de escrita (create_booking, cancel_booking, update_laundry_status) atualizam o índice
+# diretamente (write-through); o TTL limita a defasagem entre workers do gunicorn, que não
+# compartilham memória.
+# Cada escrita recebe uma geração. Uma leitura que não achou a entrada anota a geração antes de ir ao
+# banco (generation) e a devolve no put: se a chave foi escrita depois disso, o bitmask lido pode ser
+# anterior ao commit e não entra no índice (a próxima leitura vai ao banco de novo).
+class OccupancyCache:
+    def __init__(self, max_entries=4096, ttl=30.0, past_ttl=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.past_ttl = past_ttl  # Datas passadas não são mais agendáveis: saem cedo do índice
+        self._entries = OrderedDict()  # (id_lavanderia, data) -> (bitmask, carregado_em)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._written = OrderedDict()  # (id_lavanderia, data) -> geração da última escrita
+        self._floor = 0  # Gerações até aqui valem para qualquer chave (invalidação ampla ou registro podado)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_fills = 0
+
+    def configure(self, max_entries=None, ttl=None, past_ttl=None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if ttl is not None:
+                self.ttl = ttl
+            if past_ttl is not None:
+                self.past_ttl = past_ttl
+            self._entries.clear()
+            self._bump_all()
+
+    def _expired(self, data, carregado_em, now):
+        ttl = self.past_ttl if data < datetime.date.today() else self.ttl
+        return now - carregado_em > ttl
+
+    # --- Ocupação por (lavanderia, data) ---
+    def get(self, id_lavanderia, data):
+        key = (id_lavanderia, data)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(data, entry[1], now):
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def _bump(self, key):
+        # Sob o lock; o registro tem o mesmo limite do índice, e o que sai dele sobe o piso
+        self._generation += 1
+        self._written[key] = self._generation
+        self._written.move_to_end(key)
+        while len(self._written) > self.max_entries:
+            _, geracao = self._written.popitem(last=False)
+            self._floor = max(self._floor, geracao)
+
+    def _bump_all(self):
+        self._generation += 1
+        self._floor = self._generation
+        self._written.clear()
+
+    def put(self, id_lavanderia, data, bitmask, generation=None):
+        # generation: a de antes da leitura no banco; None grava sem checar
+        key = (id_lavanderia, data)
+        with self._lock:
+            if generation is not None and max(self._floor, self._written.get(key, 0)) > generation:
+                self.stale_fills += 1
+                return
+            self._entries[key] = (bitmask, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _update_bit(self, id_lavanderia, data, id_horario, ocupado):
+        key = (id_lavanderia, data)
+        with self._lock:
+            self._bump(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return  # Sem entrada: a próxima leitura carrega do banco
+            bitmask = entry[0] | (1 << id_horario) if ocupado else entry[0] & ~(1 << id_horario)
+            self._entries[key] = (bitmask, entry[1])
+
+    def mark_occupied(self, id_lavanderia, data, id_horario):
+        self._update_bit(id_lavanderia, data, id_horario, True)
+
+    def mark_free(self, id_lavanderia, data, id_horario):
+        self._update_bit(id_lavanderia, data, id_horario, False)
+
+    def invalidate_laundry(self, id_lavanderia):
+        with self._lock:
+            self._bump_all()  # Raro (status da lavanderia): descarta todas as leituras em andamento
+            for key in [k for k in self._entries if k[0] == id_lavanderia]:
+                del self._entries[key]
+
+    def evict_past(self):
+        today = datetime.date.today()
+        with self._lock:
+            for key in [k for k in self._entries if k[1] < today]:
+                del self._entries[key]
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "stale_fills": self.stale_fills,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries
+            }
+
+occupancy_cache = TenantScoped(OccupancyCache)  # Um índice por tenant (src/tenancy.py)
+
+def init_occupancy_cache(app):
+    occupancy_cache.configure(
+        max_entries=app.config.get("OCCUPANCY_CACHE_MAX_ENTRIES", 4096),
+        ttl=app.config.get("OCCUPANCY_CACHE_TTL", 30.0),
+        past_ttl=app.config.get("OCCUPANCY_CACHE_PAST_TTL", 5.0)
+    )
+
+def bitmask_from_ids(ids_horario):
+    bitmask = 0
+    for id_horario in ids_horario:
+        bitmask |= 1 << id_horario
+    return bitmask
@@ -0,0 +1,112 @@
+# src/services/principal_cache.py
+from src.models.models import db, listen_session, Morador
+from src.tenancy import TenantScoped
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from collections import OrderedDict
+import threading
+import time
+
+# Cache dos dados de autorização do morador (papel, andar, ativo) usado por admin_required e user_info.
+# Alterações em Morador feitas pelo ORM invalidam a entrada após o commit; o TTL limita a janela
+# em que outro worker ainda enxerga um admin rebaixado ou desativado.
+class Principal:
+    __slots__ = ("id_morador", "is_admin", "ativo", "id_andar_fk", "nome_completo", "email", "numero_apartamento", "carregado_em")
+
+    def __init__(self, morador):
+        self.id_morador = morador.id_morador
+        self.is_admin = morador.is_admin
+        self.ativo = morador.ativo
+        self.id_andar_fk = morador.id_andar_fk
+        self.nome_completo = morador.nome_completo
+        self.email = morador.email
+        self.numero_apartamento = morador.numero_apartamento
+        self.carregado_em = time.monotonic()
+
+class PrincipalCache:
+    def __init__(self, max_entries=2048, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, id_morador):
+        # Entrada válida sem tocar no banco, ou None (usado pelo modo assíncrono)
+        with self._lock:
+            principal = self._entries.get(id_morador)
+            if principal is not None and time.monotonic() - principal.carregado_em <= self.ttl:
+                self._entries.move_to_end(id_morador)
+                self.hits += 1
+                return principal
+            return None
+
+    def get(self, id_morador):
+        with self._lock:
+            principal = self._entries.get(id_morador)
+            if principal is not None and time.monotonic() - principal.carregado_em <= self.ttl:
+                self._entries.move_to_end(id_morador)
+                self.hits += 1
+                return principal
+            self.misses += 1
+        morador = db.session.get(Morador, id_morador)
+        if morador is None:
+            self.invalidate(id_morador)
+            return None
+        return self.put(morador)
+
+    def put(self, morador):
+        principal = Principal(morador)
+        with self._lock:
+            self._entries[principal.id_morador] = principal
+            self._entries.move_to_end(principal.id_morador)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, id_morador):
+        with self._lock:
+            self._entries.pop(id_morador, None)
+
+    def configure(self, max_entries=None, ttl=None):
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if ttl is not None:
+            self.ttl = ttl
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+principal_cache = TenantScoped(PrincipalCache)  # Ids de morador só valem dentro do tenant
+
+# --- Invalidação: ids alterados no flush são descartados do cache no commit ---
+def _mark_dirty(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("principals_dirty", set()).add(target.id_morador)
+    principal_cache.invalidate(target.id_morador)
+
+def _after_commit(session):
+    for id_morador in session.info.pop("principals_dirty", ()):
+        principal_cache.invalidate(id_morador)
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop("principals_dirty", None)
+
+def init_principal_cache(app):
+    for identifier in ("after_update", "after_delete"):
+        if not event.contains(Morador, identifier, _mark_dirty):
+            event.listen(Morador, identifier, _mark_dirty)
+    listen_session("after_commit", _after_commit)
+    listen_session("after_soft_rollback", _after_rollback)
+    principal_cache.configure(
+        max_entries=app.config.get("PRINCIPAL_CACHE_MAX_ENTRIES", 2048),
+        ttl=app.config.get("PRINCIPAL_CACHE_TTL", 30.0)
+    )
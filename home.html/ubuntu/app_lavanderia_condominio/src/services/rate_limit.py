@@ -0,0 +1,174 @@
+# src/services/rate_limit.py
+from flask import jsonify, request, session
+from werkzeug.utils import import_string
+from src.tenancy import current_tenant
+from collections import OrderedDict
+from functools import wraps
+import math
+import threading
+import time
+
+# Limite de requisições por morador com token bucket, checado antes de qualquer consulta ou hash:
+# acima do limite a resposta é um 429 barato, sem disputa de lock no banco nem fila no pool de hashing.
+#   booking: escritas de agendamento e fila de espera, por morador_id da sessão
+#   login: por endereço do cliente + e-mail informado (o morador ainda não tem sessão), antes da
+#          verificação da senha. Atrás de proxy reverso o endereço vem do X-Forwarded-For (PROXY_FIX_X_FOR em src/main.py).
+#   login_failures: senhas erradas por morador_id, de qualquer endereço. Só a falha consome ficha e
+#          o login correto zera a contagem; com o balde vazio o login do morador recebe 429 antes
+#          da verificação da senha até a reposição.
+# Cada política é "capacidade/segundos" (RATE_LIMIT_BOOKING="10/60": rajada de 10, reposição de 10
+# fichas a cada 60 s); vazio desliga a política. O estado fica no backend (RATE_LIMIT_BACKEND):
+# "local" guarda os baldes na memória do worker, então com N workers o limite efetivo chega a N vezes
+# o configurado. Outro backend (ex.: compartilhado entre workers) é indicado por "modulo:Classe" e
+# precisa de take(chave, taxa, capacidade) -> segundos até a próxima ficha (0 = permitido),
+# peek(chave, taxa, capacidade), igual sem consumir, e reset(chave).
+DEFAULT_LIMITS = {"booking": "10/60", "login": "5/60", "login_failures": "30/300"}
+
+class LocalTokenBuckets:
+    def __init__(self, max_keys=65536):
+        self.max_keys = max_keys  # Baldes mais antigos saem primeiro; um balde descartado volta cheio
+        self._buckets = OrderedDict()  # chave -> (fichas, atualizado_em)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            fichas, atualizado = self._buckets.get(key, (burst, now))
+            fichas = min(burst, fichas + (now - atualizado) * rate)
+            if fichas >= 1:
+                self._buckets[key] = (fichas - 1, now)
+                espera = 0.0
+            else:
+                self._buckets[key] = (fichas, now)
+                espera = (1 - fichas) / rate
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return espera
+
+    def peek(self, key, rate, burst, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            fichas, atualizado = self._buckets.get(key, (burst, now))
+        fichas = min(burst, fichas + (now - atualizado) * rate)
+        return 0.0 if fichas >= 1 else (1 - fichas) / rate
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"buckets": len(self._buckets), "max_keys": self.max_keys}
+
+def parse_limit(valor):
+    # "capacidade/segundos" -> (taxa por segundo, capacidade); vazio -> None
+    if not valor:
+        return None
+    try:
+        capacidade, segundos = (float(parte) for parte in str(valor).split("/"))
+    except ValueError:
+        raise ValueError(f"Limite inválido: {valor}. Use capacidade/segundos, ex.: 10/60.")
+    if capacidade < 1 or segundos <= 0:
+        raise ValueError(f"Limite inválido: {valor}. Capacidade >= 1 e segundos > 0.")
+    return capacidade / segundos, capacidade
+
+class RateLimiter:
+    def __init__(self):
+        self.backend = LocalTokenBuckets()
+        self.policies = {nome: parse_limit(valor) for nome, valor in DEFAULT_LIMITS.items()}
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def configure(self, backend=None, policies=None):
+        if backend is not None:
+            self.backend = backend
+        if policies is not None:
+            self.policies = {nome: parse_limit(valor) for nome, valor in policies.items()}
+
+    def check(self, policy, identity):
+        # Segundos até a próxima tentativa; 0 = permitido
+        limite = self.policies.get(policy)
+        if limite is None or identity is None:
+            return 0.0
+        espera = self.backend.take(_key(policy, identity), *limite)
+        self._count(espera)
+        return espera
+
+    def blocked(self, policy, identity):
+        # Como check, sem consumir ficha: políticas em que só o resultado da tentativa conta (penalize)
+        limite = self.policies.get(policy)
+        if limite is None or identity is None:
+            return 0.0
+        espera = self.backend.peek(_key(policy, identity), *limite)
+        self._count(espera)
+        return espera
+
+    def penalize(self, policy, identity):
+        limite = self.policies.get(policy)
+        if limite is not None and identity is not None:
+            self.backend.take(_key(policy, identity), *limite)
+
+    def reset(self, policy, identity):
+        if self.policies.get(policy) is not None and identity is not None:
+            self.backend.reset(_key(policy, identity))
+
+    def _count(self, espera):
+        with self._lock:
+            if espera:
+                self.limited += 1
+            else:
+                self.allowed += 1
+
+    def stats(self):
+        with self._lock:
+            stats = {"allowed": self.allowed, "limited": self.limited}
+        backend_stats = getattr(self.backend, "stats", None)
+        return {**stats, **(backend_stats() if backend_stats else {})}
+
+def _key(policy, identity):
+    # Ids de morador e e-mails só valem dentro do tenant
+    return (current_tenant(), policy, identity)
+
+rate_limiter = RateLimiter()
+
+def too_many_requests(espera):
+    return jsonify({"error": "Muitas solicitações. Tente novamente em instantes."}), 429, \
+        {"Retry-After": str(max(1, math.ceil(espera)))}
+
+def rate_limited(policy, identity):
+    # identity() devolve a chave do balde na requisição corrente, ou None para não limitar
+    # (sem sessão ou sem e-mail: o próprio handler responde 401/400)
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            espera = rate_limiter.check(policy, identity())
+            if espera:
+                return too_many_requests(espera)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def session_morador():
+    return session.get("morador_id")
+
+def login_email():
+    data = request.get_json(silent=True)
+    email = data.get("email") if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+def login_client():
+    email = login_email()
+    return (request.remote_addr, email) if email is not None else None
+
+def init_rate_limit(app):
+    backend = app.config.get("RATE_LIMIT_BACKEND") or "local"
+    if backend == "local":
+        backend = LocalTokenBuckets(max_keys=app.config.get("RATE_LIMIT_MAX_KEYS", 65536))
+    else:
+        backend = import_string(backend)()
+    rate_limiter.configure(
+        backend=backend,
+        policies={nome: app.config.get(f"RATE_LIMIT_{nome.upper()}", padrao) for nome, padrao in DEFAULT_LIMITS.items()}
+    )
@@ -0,0 +1,122 @@
+# src/services/reference_data.py
+from src.models.models import Andar, Lavanderia, HorarioDisponivel
+from src.tenancy import TenantScoped
+import threading
+import time
+
+# Registros imutáveis e compactos para as tabelas de referência (Andares, Horarios_Disponiveis, Lavanderias).
+# Carregados uma vez e consultados pelos handlers no lugar dos lazy loads dos relacionamentos.
+class _Record:
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} é imutável")
+
+    def __repr__(self):
+        campos = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"<{type(self).__name__} {campos}>"
+
+class AndarRecord(_Record):
+    __slots__ = ("id_andar", "numero_andar")
+
+class HorarioRecord(_Record):
+    __slots__ = ("id_horario", "descricao_horario", "hora_inicio", "hora_fim")
+
+class LavanderiaRecord(_Record):
+    __slots__ = ("id_lavanderia", "id_andar_fk", "identificador_no_andar", "status", "numero_andar")
+
+class ReferenceSnapshot:
+    __slots__ = ("andares", "andares_por_numero", "horarios", "lavanderias", "lavanderias_por_andar", "carregado_em", "_serializados")
+
+    def __init__(self, andares, horarios, lavanderias):
+        self.andares = {a.id_andar: a for a in andares}
+        self.andares_por_numero = {a.numero_andar: a for a in andares}
+        self.horarios = {h.id_horario: h for h in horarios}  # Ordenados por id_horario
+        self.lavanderias = {l.id_lavanderia: l for l in lavanderias}  # Ordenadas por andar e identificador
+        self.lavanderias_por_andar = {}
+        for lav in lavanderias:
+            self.lavanderias_por_andar.setdefault(lav.id_andar_fk, []).append(lav)
+        self.carregado_em = time.monotonic()
+        self._serializados = {}
+
+    def serialized(self, chave, build):
+        # Estrutura de resposta que só depende do snapshot: montada no primeiro uso e compartilhada
+        # (somente leitura) pelas respostas até o próximo load
+        valor = self._serializados.get(chave)
+        if valor is None:
+            valor = self._serializados[chave] = build(self)
+        return valor
+
+    def lavanderias_ativas(self, id_andar):
+        return [lav for lav in self.lavanderias_por_andar.get(id_andar, ()) if lav.status == "ativa"]
+
+class ReferenceDataRegistry:
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl  # Limita a defasagem entre workers que não receberam a invalidação
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        # Requer app context; três consultas pequenas
+        andares = [AndarRecord(a.id_andar, a.numero_andar)
+                   for a in Andar.query.order_by(Andar.numero_andar).all()]
+        numeros = {a.id_andar: a.numero_andar for a in andares}
+        horarios = [HorarioRecord(h.id_horario, h.descricao_horario, h.hora_inicio, h.hora_fim)
+                    for h in HorarioDisponivel.query.order_by(HorarioDisponivel.id_horario).all()]
+        lavanderias = [LavanderiaRecord(l.id_lavanderia, l.id_andar_fk, l.identificador_no_andar, l.status, numeros.get(l.id_andar_fk))
+                       for l in Lavanderia.query.order_by(Lavanderia.id_andar_fk, Lavanderia.identificador_no_andar).all()]
+        snapshot = ReferenceSnapshot(andares, horarios, lavanderias)
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def peek(self):
+        # Snapshot válido sem tocar no banco, ou None (usado pelo modo assíncrono)
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot.carregado_em > self.ttl:
+            return None
+        return snapshot
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot.carregado_em > self.ttl:
+            return self.load()
+        return snapshot
+
+    def configure(self, ttl=None):
+        if ttl is not None:
+            self.ttl = ttl
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+reference_data = TenantScoped(ReferenceDataRegistry)  # Um registro por tenant (src/tenancy.py)
+
+def _build_laundries(snapshot):
+    lavanderias = sorted(snapshot.lavanderias.values(), key=lambda lav: (lav.numero_andar, lav.identificador_no_andar))
+    return [{
+        "id_lavanderia": lav.id_lavanderia,
+        "andar_num": lav.numero_andar,
+        "identificador": lav.identificador_no_andar,
+        "status": lav.status
+    } for lav in lavanderias]
+
+def _build_floors(snapshot):
+    # Andares já ordenados por numero_andar
+    return [{"id_andar": andar.id_andar, "numero_andar": andar.numero_andar} for andar in snapshot.andares.values()]
+
+def serialize_laundries(snapshot):
+    return snapshot.serialized("lavanderias", _build_laundries)
+
+def serialize_floors(snapshot):
+    return snapshot.serialized("andares", _build_floors)
+
+def init_reference_data(app):
+    # Sem consulta aqui: o primeiro get() de cada worker carrega o registro (create_app não toca o banco)
+    reference_data.configure(ttl=app.config.get("REFERENCE_DATA_TTL", 60.0))
@@ -0,0 +1,80 @@
+# src/services/resource_versions.py
+from src.models.models import db, EventoSlot
+from src.tenancy import TenantScoped
+import hashlib
+import threading
+
+# Versões dos recursos servidos com ETag, mantidas em memória em cada worker.
+# A versão de um recurso é o id do último EventoSlot que o afetou: o id é global (sai do banco), então
+# o mesmo ETag significa o mesmo conteúdo em qualquer worker. A leitura do log (slot_events, na
+# thread do feed ou em SlotEventHub.sync) aplica os eventos depois de atualizar os caches, e as rotas calculam o ETag antes de
+# montar a resposta: o conteúdo enviado nunca é mais antigo que a versão no ETag.
+#   - grade de horários: por (andar, data), mais o último evento de status de lavanderia do andar
+#   - lavanderias e andares: último evento de status de lavanderia (versão global dos dados de referência)
+# Versões nunca voltam atrás: eventos removidos pela retenção (SlotEventHub._prune) deixariam um
+# worker novo sem a versão de chaves que mudaram, e um ETag anterior a essas mudanças receberia 304.
+# Por isso toda chave começa no piso da carga, o id anterior ao evento mais antigo retido: qualquer
+# evento removido tem id até o piso. A retenção sempre mantém o evento mais recente, então o piso
+# existe sempre que o log já teve eventos (e o SQLite não reaproveita ids de eventos removidos).
+# Versão 0 = log vazio quando o worker carregou as versões.
+class ResourceVersions:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = {}  # (id_andar, data) -> id do último evento de ocupação
+        self._andares = {}  # id_andar -> id do último evento de status de lavanderia no andar
+        self._referencia = 0
+        self._piso = 0  # Id anterior ao evento mais antigo retido na carga
+        self.ready = False  # Sem versões carregadas, as respostas saem sem ETag
+        self.not_modified = 0
+
+    def load(self, session):
+        # Devolve o id mais recente do log, a partir do qual os eventos são aplicados
+        slots = session.execute(
+            db.select(EventoSlot.id_andar_fk, EventoSlot.data_agendamento, db.func.max(EventoSlot.id_evento))
+              .where(EventoSlot.tipo != "lavanderia")
+              .group_by(EventoSlot.id_andar_fk, EventoSlot.data_agendamento)
+        ).all()
+        andares = session.execute(
+            db.select(EventoSlot.id_andar_fk, db.func.max(EventoSlot.id_evento))
+              .where(EventoSlot.tipo == "lavanderia")
+              .group_by(EventoSlot.id_andar_fk)
+        ).all()
+        oldest, head = session.execute(db.select(db.func.min(EventoSlot.id_evento), db.func.max(EventoSlot.id_evento))).one()
+        with self._lock:
+            self._piso = oldest - 1 if oldest is not None else 0
+            self._slots = {(id_andar, data): id_evento for id_andar, data, id_evento in slots}
+            self._andares = dict(andares)
+            self._referencia = max(self._andares.values(), default=self._piso)
+            self.ready = True
+        return head or 0
+
+    def apply(self, eventos):
+        with self._lock:
+            for evento in eventos:
+                if evento.tipo == "lavanderia":
+                    self._andares[evento.id_andar] = max(self._andares.get(evento.id_andar, self._piso), evento.id)
+                    self._referencia = max(self._referencia, evento.id)
+                else:
+                    key = (evento.id_andar, evento.data)
+                    self._slots[key] = max(self._slots.get(key, self._piso), evento.id)
+
+    def slots_etag(self, id_andar, dias, formato):
+        if not self.ready:
+            return None
+        with self._lock:
+            base = self._andares.get(id_andar, self._piso)
+            versoes = ",".join(str(max(base, self._slots.get((id_andar, dia), self._piso))) for dia in dias)
+        chave = f"{id_andar}|{dias[0].isoformat()}|{dias[-1].isoformat()}|{formato}|{versoes}"
+        return "s-" + hashlib.sha1(chave.encode()).hexdigest()[:20]
+
+    def laundries_etag(self):
+        return f"lav-{self._referencia}" if self.ready else None
+
+    def floors_etag(self):
+        return f"and-{self._referencia}" if self.ready else None
+
+    def stats(self):
+        with self._lock:
+            return {"ready": int(self.ready), "slot_keys": len(self._slots), "not_modified": self.not_modified}
+
+resource_versions = TenantScoped(ResourceVersions)  # Ids de evento são do banco de cada tenant
@@ -0,0 +1,56 @@
+# src/services/single_flight.py
+import threading
+
+# Coalescência de leituras idênticas dentro do worker: a primeira requisição de uma chave calcula o
+# resultado e as que chegam enquanto ela está em andamento esperam e recebem o mesmo valor (ou a mesma
+# exceção). Nada fica guardado depois: a chave sai do mapa quando o cálculo termina.
+# A chave precisa identificar a versão do conteúdo (ex.: o ETag), senão quem chega depois de uma
+# escrita pode receber um resultado calculado antes dela.
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout  # Espera máxima por outro cálculo; depois disso a requisição calcula por conta própria
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            lider = flight is None
+            if lider:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+        if not lider:
+            if not flight.done.wait(self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                return fn()
+            with self._lock:
+                self.shared += 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._flights), "leaders": self.leaders, "shared": self.shared, "timeouts": self.timeouts}
@@ -0,0 +1,405 @@
+# src/services/slot_events.py
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from src.models.models import db, listen_session, EventoSlot
+from src.services.reference_data import reference_data
+from src.services.occupancy_cache import occupancy_cache
+from src.services.resource_versions import resource_versions
+from src.tenancy import TenantScoped, current_tenant, tenant_context
+from collections import deque
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+
+# Feed de mudanças de ocupação por andar e data, entregue por Server-Sent Events.
+# create_booking, cancel_booking e update_laundry_status gravam um EventoSlot na mesma transação da
+# mudança; a tabela Eventos_Slots faz o papel de broker local compartilhado pelos workers do gunicorn.
+# Enquanto há conexões SSE abertas, uma única thread por worker lê os eventos novos (id > último lido)
+# e os distribui em memória às conexões: N navegadores custam uma consulta por intervalo, não N polls
+# da grade. A thread nasce com a primeira conexão e termina quando a última fecha.
+# A mesma leitura mantém em dia os caches do worker e as versões usadas nos ETags (resource_versions);
+# sem thread, as rotas que dependem deles chamam sync(), que lê o log na própria requisição no máximo
+# uma vez por intervalo. Worker sem tráfego não consulta o banco.
+# O id do evento é o id SSE; na reconexão o navegador envia Last-Event-ID e recebe o que perdeu.
+# Com tenancy (src/tenancy.py) há um hub por tenant ativo no worker; a thread para quando a engine do
+# tenant sai do registro LRU.
+RECONNECT_MS = 3000
+
+class FeedOverloaded(Exception):
+    pass
+
+class _ReaderStopped(Exception):
+    pass
+
+class SlotEvent:
+    __slots__ = ("id", "id_andar", "data", "tipo", "id_lavanderia", "id_horario", "status")
+
+    def __init__(self, id, id_andar, data, tipo, id_lavanderia, id_horario=None, status=None):
+        self.id = id
+        self.id_andar = id_andar
+        self.data = data  # None: mudança de status da lavanderia, vale para todas as datas
+        self.tipo = tipo
+        self.id_lavanderia = id_lavanderia
+        self.id_horario = id_horario
+        self.status = status
+
+    def matches(self, id_andar, datas):
+        return self.id_andar == id_andar and (self.data is None or self.data in datas)
+
+    def encode(self):
+        if self.tipo == "lavanderia":
+            # A lista de lavanderias ativas mudou: o cliente recarrega a grade
+            payload = {"id_lavanderia": self.id_lavanderia, "status": self.status}
+            return f"id: {self.id}\nevent: lavanderia\ndata: {json.dumps(payload)}\n\n"
+        payload = {
+            "data": self.data.isoformat(),
+            "id_lavanderia": self.id_lavanderia,
+            "id_horario": self.id_horario,
+            "ocupado": self.tipo == "ocupado"
+        }
+        return f"id: {self.id}\nevent: slot\ndata: {json.dumps(payload)}\n\n"
+
+def event_from_row(row):
+    return SlotEvent(row.id_evento, row.id_andar_fk, row.data_agendamento, row.tipo,
+                     row.id_lavanderia_fk, row.id_horario_fk, row.status_lavanderia)
+
+def reset_frame(head_id):
+    # Last-Event-ID anterior à retenção: o cliente descarta a grade local e busca de novo
+    return f"id: {head_id}\nevent: reset\ndata: {{}}\n\n"
+
+HEARTBEAT_FRAME = ": ping\n\n"
+
+class Subscription:
+    def __init__(self, id_andar, datas, start_id, max_pending=256):
+        self.id_andar = id_andar
+        self.datas = frozenset(datas)
+        self.start_id = start_id  # Eventos até este id já estão refletidos no cliente
+        self.last_sent = start_id
+        self.queue = queue.Queue(max_pending)
+        self.overflowed = False
+
+    def deliver(self, evento):
+        # Chamado pela thread de leitura do log
+        try:
+            self.queue.put_nowait(evento)
+        except queue.Full:
+            self.overflowed = True  # Cliente lento: o stream termina e ele retoma por Last-Event-ID
+
+    def accept(self, evento):
+        # Descarta duplicatas entre o replay da retomada e a fila
+        if evento.id <= self.last_sent:
+            return False
+        self.last_sent = evento.id
+        return True
+
+class SlotEventHub:
+    def __init__(self, poll_interval=0.5, heartbeat=15.0, max_streams=24, stream_timeout=300.0,
+                 retention=3600.0, backlog=1024, max_pending=256):
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.max_streams = max_streams  # Por worker; cada stream síncrono ocupa uma thread
+        self.stream_timeout = stream_timeout  # Encerra e deixa o navegador reconectar, liberando a thread
+        self.retention = retention  # Segundos de log mantidos no banco para retomada
+        self.max_pending = max_pending
+        self._app = None
+        self._subscribers = {}  # id_andar -> set(Subscription)
+        self._recent = deque(maxlen=backlog)  # Últimos eventos lidos, para retomada sem ir ao banco
+        self._last_id = None  # Último id lido do log; None até a primeira leitura carregar as versões
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()  # Uma leitura do log por vez (thread ou sync)
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._stopped = False
+        self.tenant = None  # Tenant cujo log a thread lê
+        self._engine = None  # Engine do tenant no start: a thread nunca resolve (e recria) a engine
+        self._next_prune = 0.0
+        self._next_sync = 0.0
+        self.polls = 0
+        self.delivered = 0
+        self.resets = 0
+        self.rejected = 0
+
+    def configure(self, app, poll_interval=None, heartbeat=None, max_streams=None, stream_timeout=None, retention=None):
+        with self._lock:
+            self._app = app
+            if poll_interval is not None:
+                self.poll_interval = poll_interval
+            if heartbeat is not None:
+                self.heartbeat = heartbeat
+            if max_streams is not None:
+                self.max_streams = max_streams
+            if stream_timeout is not None:
+                self.stream_timeout = stream_timeout
+            if retention is not None:
+                self.retention = retention
+
+    # --- Conexões ---
+    def _active_streams(self):
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def subscribe(self, subscription):
+        with self._lock:
+            if self._active_streams() >= self.max_streams:
+                self.rejected += 1
+                raise FeedOverloaded()
+            self._subscribers.setdefault(subscription.id_andar, set()).add(subscription)
+        self.start()
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._subscribers.get(subscription.id_andar)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[subscription.id_andar]
+            ultimo = not self._subscribers
+        if ultimo:
+            self._wake.set()  # A thread termina sem esperar o intervalo
+
+    def wake(self):
+        # Commit local: lê o log já, sem esperar o intervalo (na thread ou no próximo sync)
+        self._next_sync = 0.0
+        self._wake.set()
+
+    def sync_due(self):
+        return not (self._stopped or self._thread_running() or time.monotonic() < self._next_sync)
+
+    def sync(self):
+        # Rotas com ETag ou caches de ocupação, sem thread de leitura neste worker: lê o log na
+        # requisição, no máximo uma vez por intervalo; requer app context
+        if not self.sync_due():
+            return
+        if not self._read_lock.acquire(blocking=False):
+            return  # Outra requisição já está lendo: serve com o que há
+        try:
+            self._read_log(db.session.get_bind())
+        except _ReaderStopped:
+            pass
+        except OperationalError as e:
+            self._app.logger.warning(f"Falha ao ler o log de eventos de horários: {e}")
+        finally:
+            self._read_lock.release()
+
+    def head_id(self):
+        with self._lock:
+            if self._last_id is not None:
+                return self._last_id
+        return db.session.execute(db.select(db.func.max(EventoSlot.id_evento))).scalar() or 0
+
+    def backlog(self, subscription, last_event_id):
+        # Eventos do andar/datas posteriores a last_event_id; None se já saíram da retenção
+        with self._lock:
+            recent = list(self._recent)
+        if recent and recent[0].id <= last_event_id + 1:
+            return [e for e in recent if e.id > last_event_id and e.matches(subscription.id_andar, subscription.datas)]
+        oldest = db.session.execute(db.select(db.func.min(EventoSlot.id_evento))).scalar()
+        if oldest is None or oldest > last_event_id + 1:
+            if last_event_id >= self.head_id():
+                return []
+            self.resets += 1
+            return None
+        rows = db.session.execute(
+            db.select(EventoSlot)
+              .where(EventoSlot.id_andar_fk == subscription.id_andar, EventoSlot.id_evento > last_event_id)
+              .order_by(EventoSlot.id_evento)
+              .limit(self.max_pending + 1)
+        ).scalars().all()
+        if len(rows) > self.max_pending:
+            self.resets += 1
+            return None  # Mais barato recarregar a grade do que reenviar tudo
+        eventos = [event_from_row(row) for row in rows]
+        return [e for e in eventos if e.matches(subscription.id_andar, subscription.datas)]
+
+    # --- Leitura do log (uma thread por worker enquanto há conexões) ---
+    def _thread_running(self):
+        thread = self._thread
+        return thread is not None and self._thread_pid == os.getpid() and thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            # Criada sob demanda no processo que a usa (seguro com fork/--preload do gunicorn)
+            if self._stopped or self._thread_running():
+                return
+            self.tenant = current_tenant()
+            self._engine = db.session.get_bind()  # Chamado na requisição que abriu a conexão
+            self._thread = threading.Thread(target=self._run, name=f"slot-events-{self.tenant or 'default'}", daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def stop(self):
+        # Hub descartado (tenant fora do registro ou nova configuração): a thread termina no próximo ciclo
+        with self._lock:
+            self._stopped = True
+        self._wake.set()
+
+    def _run(self):
+        with tenant_context(self.tenant):
+            self._poll_loop()
+
+    def _poll_loop(self):
+        while True:
+            with self._lock:
+                if self._stopped or not self._subscribers:
+                    self._thread = None  # Sem conexões: a leitura volta a ser sob demanda (sync)
+                    return
+            baseline = False
+            try:
+                with self._read_lock:
+                    baseline = self._read_log(self._engine)
+            except _ReaderStopped:
+                continue
+            except OperationalError as e:
+                self._app.logger.warning(f"Falha ao ler o log de eventos de horários: {e}")
+            if baseline:
+                continue
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _read_log(self, engine):
+        # Um ciclo de leitura, numa sessão própria (sync não toca a transação da requisição);
+        # True se carregou as versões, e os eventos seguintes ficam para o próximo ciclo
+        with self._lock:
+            last_id = self._last_id
+        with Session(engine) as session:
+            event.listen(session, "do_orm_execute", self._check_stopped)
+            if last_id is None:
+                self._load_baseline(session)
+                return True
+            self._next_sync = time.monotonic() + self.poll_interval
+            eventos = self._poll(session, last_id)
+            if eventos:
+                self._dispatch(eventos)
+            if time.monotonic() >= self._next_prune:
+                self._prune(session)
+        return False
+
+    def _check_stopped(self, orm_execute_state):
+        # Antes de cada consulta: hub descartado no meio do ciclo (engine do tenant despejada e já
+        # liberada) não abre conexão nova na engine antiga
+        if self._stopped:
+            raise _ReaderStopped()
+
+    def _load_baseline(self, session):
+        head = resource_versions.load(session)
+        with self._lock:
+            # Conexões abertas antes da carga recebem também o que veio depois do seu ponto de partida
+            self._last_id = min([head] + [s.start_id for subs in self._subscribers.values() for s in subs])
+
+    def _poll(self, session, last_id):
+        rows = session.execute(
+            db.select(EventoSlot).where(EventoSlot.id_evento > last_id).order_by(EventoSlot.id_evento).limit(500)
+        ).scalars().all()
+        self.polls += 1
+        return [event_from_row(row) for row in rows]
+
+    def _prune(self, session):
+        # O evento mais recente fica: é o piso das versões (resource_versions) e impede o SQLite de
+        # reaproveitar ids com a tabela vazia
+        limite = datetime.datetime.now() - datetime.timedelta(seconds=self.retention)
+        head = session.execute(db.select(db.func.max(EventoSlot.id_evento))).scalar() or 0
+        session.execute(db.delete(EventoSlot).where(EventoSlot.criado_em < limite, EventoSlot.id_evento < head))
+        session.commit()
+        self._next_prune = time.monotonic() + 60
+
+    def _dispatch(self, eventos):
+        for evento in eventos:
+            # Mantém o índice de ocupação deste worker em dia com escritas feitas em outros workers
+            if evento.tipo == "lavanderia":
+                reference_data.invalidate()
+                occupancy_cache.invalidate_laundry(evento.id_lavanderia)
+            elif evento.tipo == "ocupado":
+                occupancy_cache.mark_occupied(evento.id_lavanderia, evento.data, evento.id_horario)
+            else:
+                occupancy_cache.mark_free(evento.id_lavanderia, evento.data, evento.id_horario)
+        resource_versions.apply(eventos)  # Depois dos caches: o ETag nunca aponta para conteúdo mais novo que o servido
+        with self._lock:
+            self._recent.extend(eventos)
+            self._last_id = eventos[-1].id
+            for evento in eventos:
+                for subscription in self._subscribers.get(evento.id_andar, ()):
+                    if evento.matches(subscription.id_andar, subscription.datas):
+                        subscription.deliver(evento)
+                        self.delivered += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "streams": self._active_streams(),
+                "max_streams": self.max_streams,
+                "polls": self.polls,
+                "delivered": self.delivered,
+                "resets": self.resets,
+                "rejected": self.rejected
+            }
+
+slot_event_hub = TenantScoped(SlotEventHub)
+
+def open_subscription(id_andar, datas, last_event_id, subscription_class=Subscription, **kwargs):
+    # Chamado no contexto da requisição, antes de começar o stream
+    start_id = last_event_id if last_event_id is not None else slot_event_hub.head_id()
+    subscription = subscription_class(id_andar, datas, start_id, max_pending=slot_event_hub.max_pending, **kwargs)
+    slot_event_hub.subscribe(subscription)
+    return subscription
+
+def stream_prelude(subscription, last_event_id):
+    # Primeiros frames: intervalo de reconexão e, na retomada, os eventos perdidos
+    frames = [f"retry: {RECONNECT_MS}\n\n"]
+    if last_event_id is None:
+        return frames
+    perdidos = slot_event_hub.backlog(subscription, last_event_id)
+    if perdidos is None:
+        subscription.last_sent = slot_event_hub.head_id()
+        frames.append(reset_frame(subscription.last_sent))
+        return frames
+    frames.extend(evento.encode() for evento in perdidos if subscription.accept(evento))
+    return frames
+
+def parse_last_event_id(headers, args):
+    # Cabeçalho enviado pelo EventSource na reconexão; o parâmetro serve à primeira conexão
+    valor = headers.get("Last-Event-ID") or args.get("last_event_id")
+    try:
+        return int(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+# --- Escrita: o evento entra na mesma transação da mudança ---
+def _add_event(**values):
+    db.session.add(EventoSlot(criado_em=datetime.datetime.now(), **values))
+    db.session.info["slot_events_pending"] = True
+
+def record_slot_change(id_lavanderia, data, id_horario, ocupado):
+    lavanderia = reference_data.get().lavanderias.get(id_lavanderia)
+    if lavanderia is None:
+        return
+    _add_event(id_andar_fk=lavanderia.id_andar_fk, id_lavanderia_fk=id_lavanderia, id_horario_fk=id_horario,
+               data_agendamento=data, tipo="ocupado" if ocupado else "livre")
+
+def record_laundry_status(lavanderia):
+    _add_event(id_andar_fk=lavanderia.id_andar_fk, id_lavanderia_fk=lavanderia.id_lavanderia,
+               tipo="lavanderia", status_lavanderia=lavanderia.status)
+
+def _after_commit(session):
+    if session.info.pop("slot_events_pending", False):
+        slot_event_hub.wake()
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop("slot_events_pending", None)
+
+def init_slot_events(app):
+    listen_session("after_commit", _after_commit)
+    listen_session("after_soft_rollback", _after_rollback)
+    slot_event_hub.configure(
+        app,
+        poll_interval=app.config.get("SLOT_EVENTS_POLL_INTERVAL", 0.5),
+        heartbeat=app.config.get("SLOT_EVENTS_HEARTBEAT", 15.0),
+        max_streams=app.config.get("SLOT_EVENTS_MAX_STREAMS", 24),
+        stream_timeout=app.config.get("SLOT_EVENTS_STREAM_TIMEOUT", 300.0),
+        retention=app.config.get("SLOT_EVENTS_RETENTION", 3600.0)
+    )
+    # Sem hook por requisição: a thread começa com a primeira conexão SSE (subscribe) e as rotas com
+    # ETag chamam slot_event_hub.sync()
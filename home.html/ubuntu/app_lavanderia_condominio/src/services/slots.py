@@ -0,0 +1,129 @@
+# src/services/slots.py
+from src.models.models import db, Lavanderia, Agendamento, STATUS_OCUPA_HORARIO
+from src.services.reference_data import reference_data
+from src.services.occupancy_cache import occupancy_cache, bitmask_from_ids
+from src.services.single_flight import SingleFlight
+from sqlalchemy import and_
+import datetime
+
+# Limite de dias por consulta de intervalo (uma semana cabe com folga)
+MAX_RANGE_DAYS = 31
+
+# Um andar abrindo a grade ao mesmo tempo gera a mesma leitura várias vezes: requisições com o mesmo
+# ETag em andamento no worker compartilham a resposta já serializada (chave: tenant + ETag)
+slot_reads = SingleFlight()
+
+class SlotRangeError(ValueError):
+    pass
+
+def parse_slot_range(args):
+    # Aceita ?date=YYYY-MM-DD ou ?date_start=...&date_end=...; retorna (inicio, fim, data_unica)
+    date_str = args.get("date")
+    date_start_str = args.get("date_start")
+    date_end_str = args.get("date_end")
+    if not (date_str or (date_start_str and date_end_str)):
+        raise SlotRangeError("Data e informação do andar são obrigatórios.")
+    try:
+        if date_str:
+            date_start = date_end = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+        else:
+            date_start = datetime.datetime.strptime(date_start_str, "%Y-%m-%d").date()
+            date_end = datetime.datetime.strptime(date_end_str, "%Y-%m-%d").date()
+    except ValueError:
+        raise SlotRangeError("Formato de data inválido. Use YYYY-MM-DD.")
+    if date_end < date_start or (date_end - date_start).days >= MAX_RANGE_DAYS:
+        raise SlotRangeError(f"Intervalo de datas inválido (máximo de {MAX_RANGE_DAYS} dias).")
+    return date_start, date_end, bool(date_str)
+
+def iter_dates(date_start, date_end):
+    current = date_start
+    while current <= date_end:
+        yield current
+        current += datetime.timedelta(days=1)
+
+def floor_occupancy_select(andar_id, date_start, date_end):
+    # Uma única consulta: lavanderias ativas do andar LEFT JOIN agendamentos que ocupam o horário no intervalo.
+    # Lavanderias sem agendamento aparecem uma vez com data/horario nulos.
+    return db.select(
+        Lavanderia.id_lavanderia,
+        Lavanderia.identificador_no_andar,
+        Agendamento.data_agendamento,
+        Agendamento.id_horario_fk
+    ).outerjoin(Agendamento, and_(
+        Agendamento.id_lavanderia_fk == Lavanderia.id_lavanderia,
+        Agendamento.status_agendamento.in_(STATUS_OCUPA_HORARIO),
+        Agendamento.data_agendamento >= date_start,
+        Agendamento.data_agendamento <= date_end
+    )).where(
+        Lavanderia.id_andar_fk == andar_id,
+        Lavanderia.status == "ativa"
+    ).order_by(Lavanderia.id_lavanderia)
+
+def group_occupancy(rows):
+    lavanderias = {}  # id_lavanderia -> identificador (ordem preservada)
+    ocupados = {}  # (id_lavanderia, data) -> {id_horario, ...}
+    for id_lavanderia, identificador, data_agendamento, id_horario in rows:
+        lavanderias[id_lavanderia] = identificador
+        if data_agendamento is not None:
+            ocupados.setdefault((id_lavanderia, data_agendamento), set()).add(id_horario)
+    return lavanderias, ocupados
+
+def fetch_floor_occupancy(andar_id, date_start, date_end):
+    return group_occupancy(db.session.execute(floor_occupancy_select(andar_id, date_start, date_end)))
+
+# --- Etapas da montagem da grade (compartilhadas com o modo assíncrono em src/asgi.py) ---
+def cached_bitmasks(lavanderias, dias):
+    # Também devolve a geração do índice antes das consultas, para o store_bitmasks
+    geracao = occupancy_cache.generation
+    bitmasks = {}
+    faltantes = []
+    for lav in lavanderias:
+        for dia in dias:
+            bitmask = occupancy_cache.get(lav.id_lavanderia, dia)
+            if bitmask is None:
+                faltantes.append(dia)
+            else:
+                bitmasks[(lav.id_lavanderia, dia)] = bitmask
+    return bitmasks, faltantes, geracao
+
+def store_bitmasks(lavanderias, inicio, fim, ocupados, bitmasks, geracao):
+    # Realimenta o índice com o intervalo consultado, inclusive os dias sem ocupação; chaves escritas
+    # depois de `geracao` ficam de fora (a resposta desta leitura ainda usa o que ela viu)
+    for lav in lavanderias:
+        for dia in iter_dates(inicio, fim):
+            bitmask = bitmask_from_ids(ocupados.get((lav.id_lavanderia, dia), ()))
+            occupancy_cache.put(lav.id_lavanderia, dia, bitmask, geracao)
+            bitmasks[(lav.id_lavanderia, dia)] = bitmask
+
+def slot_list(ref, bitmask):
+    # A lista de horários de uma lavanderia num dia só depende do bitmask: no máximo 2^horarios listas
+    # distintas, montadas uma vez por snapshot de referência e reaproveitadas em todas as grades
+    return ref.serialized(("slots", bitmask), lambda ref: [{
+        "id_horario": horario.id_horario,
+        "descricao": horario.descricao_horario,
+        "ocupado": bool(bitmask >> horario.id_horario & 1)
+    } for horario in ref.horarios.values()])
+
+def render_slot_grid(ref, lavanderias, dias, bitmasks):
+    grid = {}
+    for dia in dias:
+        response_slots = {}
+        for lav in lavanderias:
+            response_slots[lav.id_lavanderia] = {
+                "identificador": lav.identificador_no_andar,
+                "slots": slot_list(ref, bitmasks.get((lav.id_lavanderia, dia), 0))
+            }
+        grid[dia.isoformat()] = response_slots
+    return grid
+
+def build_slot_grid(andar_id, date_start, date_end):
+    ref = reference_data.get()
+    lavanderias = ref.lavanderias_ativas(andar_id)
+    dias = list(iter_dates(date_start, date_end))
+    bitmasks, faltantes, geracao = cached_bitmasks(lavanderias, dias)
+    if faltantes:
+        # Cache incompleto: uma consulta cobre o intervalo faltante
+        inicio, fim = min(faltantes), max(faltantes)
+        _, ocupados = fetch_floor_occupancy(andar_id, inicio, fim)
+        store_bitmasks(lavanderias, inicio, fim, ocupados, bitmasks, geracao)
+    return render_slot_grid(ref, lavanderias, dias, bitmasks)
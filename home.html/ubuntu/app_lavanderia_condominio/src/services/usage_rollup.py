@@ -0,0 +1,247 @@
+# src/services/usage_rollup.py
+from flask.cli import with_appcontext
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from src.models.models import db, listen_session, Agendamento, AgendamentoArquivo, UsoDiario, STATUS_OCUPA_HORARIO
+from src.tenancy import tenant_options, selected_tenants, each_tenant
+import click
+import datetime
+
+# Agregado diário de uso (Uso_Diario): por lavanderia × horário × dia, reservas confirmadas e cancelamentos.
+# As escritas de agendamento registram deltas na sessão (record_usage, junto de record_slot_change) e
+# eles são gravados com um único upsert executemany logo antes do commit, na mesma transação: rollback
+# da reserva desfaz o agregado junto. A chave do agregado é a mesma da unicidade de Agendamentos, então
+# ele não cria disputa de lock que a reserva já não tivesse.
+# Sem upsert nativo no dialeto, cada delta vira UPDATE e, se a linha não existir, INSERT: a reserva
+# da mesma chave já serializa as transações concorrentes.
+# O analytics lê só o agregado: o custo depende do período pedido, não do tamanho do histórico.
+# Bancos com agendamentos anteriores ao agregado: rodar uma vez `flask --app src.main backfill-usage`.
+DEFAULT_ANALYTICS_DAYS = 30
+MAX_ANALYTICS_DAYS = 366
+BACKFILL_WINDOW_DAYS = 31  # Uma transação curta por janela
+
+uso = UsoDiario.__table__
+USO_KEY = (uso.c.id_lavanderia_fk, uso.c.data, uso.c.id_horario_fk)
+
+class AnalyticsRangeError(ValueError):
+    pass
+
+# --- Escrita incremental ---
+def record_usage(id_lavanderia, id_horario, data, ocupado):
+    # ocupado: reserva confirmada ou reativada; caso contrário, cancelamento de uma reserva confirmada
+    session = db.session()
+    if not session.in_transaction():
+        session.begin()  # Os deltas valem para esta transação: um rollback os descarta
+    deltas = session.info.setdefault("usage_deltas", {})
+    confirmados, cancelados = deltas.get((id_lavanderia, id_horario, data), (0, 0))
+    deltas[(id_lavanderia, id_horario, data)] = (confirmados + 1, cancelados) if ocupado else (confirmados - 1, cancelados + 1)
+
+def upsert_statement(dialect_name):
+    # None: dialeto sem upsert implementado aqui (apply_usage usa UPDATE + INSERT)
+    if dialect_name in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect_name == "sqlite" else postgresql).insert(uso)
+        return stmt.on_conflict_do_update(index_elements=list(USO_KEY), set_={
+            "confirmados": uso.c.confirmados + stmt.excluded.confirmados,
+            "cancelados": uso.c.cancelados + stmt.excluded.cancelados
+        })
+    if dialect_name in ("mysql", "mariadb"):
+        stmt = mysql.insert(uso)
+        return stmt.on_duplicate_key_update(
+            confirmados=uso.c.confirmados + stmt.inserted.confirmados,
+            cancelados=uso.c.cancelados + stmt.inserted.cancelados
+        )
+    return None
+
+def apply_usage(session, deltas):
+    # Ordem da chave: transações concorrentes travam as linhas do agregado na mesma ordem
+    linhas = [{
+        "id_lavanderia_fk": id_lavanderia,
+        "id_horario_fk": id_horario,
+        "data": data,
+        "dia_semana": data.weekday(),
+        "confirmados": confirmados,
+        "cancelados": cancelados
+    } for (id_lavanderia, id_horario, data), (confirmados, cancelados) in sorted(deltas.items())]
+    stmt = upsert_statement(session.get_bind().dialect.name)
+    if stmt is not None:
+        session.execute(stmt, linhas)
+        return
+    for linha in linhas:
+        atualizadas = session.execute(
+            db.update(uso)
+              .where(*(coluna == linha[coluna.name] for coluna in USO_KEY))
+              .values(confirmados=uso.c.confirmados + linha["confirmados"], cancelados=uso.c.cancelados + linha["cancelados"])
+        ).rowcount
+        if not atualizadas:
+            session.execute(db.insert(uso).values(**linha))
+
+def _before_commit(session):
+    deltas = session.info.pop("usage_deltas", None)
+    if deltas:
+        apply_usage(session, deltas)
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop("usage_deltas", None)
+
+# --- Reconstrução a partir de Agendamentos ---
+def _lock_window(session):
+    # Sem o lock, uma reserva gravada entre a leitura da janela e o commit somaria seu delta a um
+    # agregado que a recontagem sobrescreve. No SQLite a transação já começa com o lock de escrita;
+    # nos demais bancos, FOR UPDATE nas linhas lidas (e, no MySQL, no intervalo do índice de data)
+    if session.get_bind().dialect.name == "sqlite":
+        session.execute(db.text("BEGIN IMMEDIATE"))
+
+def backfill_usage(date_start=None, date_end=None):
+    # Reconstrói o agregado no intervalo (padrão: todo o histórico, quente e arquivado), uma janela de
+    # datas por transação. Só o status atual é conhecido: um cancelamento seguido de nova reserva no
+    # mesmo horário conta apenas a reserva, enquanto a manutenção incremental conta os dois.
+    # Pode rodar com o app no ar: cada janela trava as reservas que lê até regravar o agregado.
+    limites = [db.session.execute(db.select(db.func.min(modelo.data_agendamento), db.func.max(modelo.data_agendamento))).one()
+               for modelo in (Agendamento, AgendamentoArquivo)]
+    db.session.commit()
+    inicio = date_start or min((l[0] for l in limites if l[0]), default=None)
+    fim = date_end or max((l[1] for l in limites if l[1]), default=None)
+    if inicio is None or fim is None:
+        return 0
+    total = 0
+    while inicio <= fim:
+        janela_fim = min(fim, inicio + datetime.timedelta(days=BACKFILL_WINDOW_DAYS - 1))
+        _lock_window(db.session)
+        rows = []
+        for modelo in (Agendamento, AgendamentoArquivo):
+            rows += db.session.execute(
+                db.select(modelo.id_lavanderia_fk, modelo.id_horario_fk, modelo.data_agendamento, modelo.status_agendamento)
+                  .where(modelo.data_agendamento >= inicio, modelo.data_agendamento <= janela_fim)
+                  .with_for_update()
+            ).all()
+        db.session.execute(db.delete(uso).where(uso.c.data >= inicio, uso.c.data <= janela_fim))
+        if rows:
+            db.session.execute(db.insert(uso), [{
+                "id_lavanderia_fk": row.id_lavanderia_fk,
+                "id_horario_fk": row.id_horario_fk,
+                "data": row.data_agendamento,
+                "dia_semana": row.data_agendamento.weekday(),
+                "confirmados": int(row.status_agendamento in STATUS_OCUPA_HORARIO),
+                "cancelados": int(row.status_agendamento == "cancelado")
+            } for row in rows])
+        db.session.commit()
+        total += len(rows)
+        inicio = janela_fim + datetime.timedelta(days=1)
+    return total
+
+@click.command("backfill-usage")
+@click.option("--inicio", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="Primeira data (YYYY-MM-DD).")
+@click.option("--fim", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="Última data (YYYY-MM-DD).")
+@tenant_options
+@with_appcontext
+def backfill_usage_command(inicio, fim, tenants, todos_tenants):
+    """Reconstrói o agregado diário de uso a partir dos agendamentos."""
+    for tenant in each_tenant(selected_tenants(tenants, todos_tenants), db.session):
+        total = backfill_usage(inicio.date() if inicio else None, fim.date() if fim else None)
+        click.echo(f"Agregado de uso{f' [{tenant}]' if tenant else ''} reconstruído a partir de {total} agendamentos.")
+
+# --- Analytics ---
+def parse_analytics_range(args, ref):
+    # ?date_start=&date_end= (padrão: últimos 30 dias) e ?andar=; retorna (inicio, fim, andar, lavanderias)
+    try:
+        fim = datetime.datetime.strptime(args["date_end"], "%Y-%m-%d").date() if args.get("date_end") else datetime.date.today()
+        inicio = datetime.datetime.strptime(args["date_start"], "%Y-%m-%d").date() if args.get("date_start") \
+            else fim - datetime.timedelta(days=DEFAULT_ANALYTICS_DAYS - 1)
+    except ValueError:
+        raise AnalyticsRangeError("Formato de data inválido. Use YYYY-MM-DD.")
+    if fim < inicio or (fim - inicio).days >= MAX_ANALYTICS_DAYS:
+        raise AnalyticsRangeError(f"Intervalo de datas inválido (máximo de {MAX_ANALYTICS_DAYS} dias).")
+    andar = None
+    lavanderias = list(ref.lavanderias.values())
+    if args.get("andar"):
+        andar = ref.andares_por_numero.get(int(args["andar"])) if args["andar"].isdigit() else None
+        if andar is None:
+            raise AnalyticsRangeError("Número do andar inválido.")
+        lavanderias = ref.lavanderias_por_andar.get(andar.id_andar, [])
+    return inicio, fim, andar, lavanderias
+
+def usage_select(inicio, fim, ids_lavanderia=None):
+    # No máximo lavanderias × horários × 7 linhas. Sem filtro de lavanderia: índice de cobertura
+    # ix_uso_diario_data; com filtro: intervalo de datas da chave primária por lavanderia
+    stmt = db.select(uso.c.id_lavanderia_fk, uso.c.id_horario_fk, uso.c.dia_semana,
+                     db.func.sum(uso.c.confirmados), db.func.sum(uso.c.cancelados))\
+             .where(uso.c.data >= inicio, uso.c.data <= fim)\
+             .group_by(uso.c.id_lavanderia_fk, uso.c.id_horario_fk, uso.c.dia_semana)
+    if ids_lavanderia is not None:
+        stmt = stmt.where(uso.c.id_lavanderia_fk.in_(ids_lavanderia))
+    return stmt
+
+def _taxa(parte, total):
+    return round(parte / total, 4) if total else 0.0
+
+def weekday_counts(inicio, fim):
+    dias = (fim - inicio).days + 1
+    semanas, resto = divmod(dias, 7)
+    contagem = [semanas] * 7
+    for n in range(resto):
+        contagem[(inicio.weekday() + n) % 7] += 1
+    return contagem
+
+def build_utilization(rows, ref, inicio, fim, lavanderias):
+    # Ocupação = reservas / (lavanderias × dias); taxa de cancelamento = cancelados / (confirmados + cancelados)
+    horarios = list(ref.horarios.values())
+    dias_semana = weekday_counts(inicio, fim)
+    dias = sum(dias_semana)
+    por_lavanderia = {lav.id_lavanderia: [0, 0] for lav in lavanderias}
+    por_andar = {}  # id_andar -> {id_horario: [confirmados, cancelados]}
+    por_dia = [{h.id_horario: 0 for h in horarios} for _ in range(7)]
+    for id_lavanderia, id_horario, dia_semana, confirmados, cancelados in rows:
+        lav = ref.lavanderias.get(id_lavanderia)
+        if lav is None or id_horario not in ref.horarios:
+            continue
+        confirmados, cancelados = int(confirmados), int(cancelados)  # SUM do MySQL vem como Decimal
+        por_lavanderia[id_lavanderia][0] += confirmados
+        por_lavanderia[id_lavanderia][1] += cancelados
+        celula = por_andar.setdefault(lav.id_andar_fk, {}).setdefault(id_horario, [0, 0])
+        celula[0] += confirmados
+        celula[1] += cancelados
+        por_dia[dia_semana][id_horario] += confirmados
+
+    andares = []
+    for andar in ref.andares.values():
+        lavs_andar = [lav for lav in lavanderias if lav.id_andar_fk == andar.id_andar]
+        if not lavs_andar:
+            continue
+        celulas = por_andar.get(andar.id_andar, {})
+        confirmados = sum(c[0] for c in celulas.values())
+        cancelados = sum(c[1] for c in celulas.values())
+        andares.append({
+            "andar_num": andar.numero_andar,
+            "ocupacao": [_taxa(celulas.get(h.id_horario, (0, 0))[0], len(lavs_andar) * dias) for h in horarios],
+            "taxa_cancelamento": _taxa(cancelados, confirmados + cancelados)
+        })
+    total_confirmados = sum(c for c, _ in por_lavanderia.values())
+    total_cancelados = sum(c for _, c in por_lavanderia.values())
+    return {
+        "periodo": {"inicio": inicio.isoformat(), "fim": fim.isoformat(), "dias": dias},
+        "horarios": [{"id_horario": h.id_horario, "descricao": h.descricao_horario} for h in horarios],
+        "andares": andares,  # Mapa de calor andar × horário
+        "dias_semana": [{  # Mapa de calor dia da semana × horário (0 = segunda)
+            "dia_semana": dia,
+            "ocupacao": [_taxa(por_dia[dia][h.id_horario], len(lavanderias) * dias_semana[dia]) for h in horarios]
+        } for dia in range(7)],
+        "lavanderias": [{
+            "id_lavanderia": lav.id_lavanderia,
+            "andar_num": lav.numero_andar,
+            "identificador": lav.identificador_no_andar,
+            "confirmados": por_lavanderia[lav.id_lavanderia][0],
+            "cancelados": por_lavanderia[lav.id_lavanderia][1],
+            "ocupacao": _taxa(por_lavanderia[lav.id_lavanderia][0], len(horarios) * dias),
+            "taxa_cancelamento": _taxa(por_lavanderia[lav.id_lavanderia][1], sum(por_lavanderia[lav.id_lavanderia]))
+        } for lav in lavanderias],
+        "totais": {
+            "confirmados": total_confirmados,
+            "cancelados": total_cancelados,
+            "ocupacao": _taxa(total_confirmados, len(lavanderias) * len(horarios) * dias),
+            "taxa_cancelamento": _taxa(total_cancelados, total_confirmados + total_cancelados)
+        }
+    }
+
+def init_usage_rollup(app):
+    listen_session("before_commit", _before_commit)
+    listen_session("after_soft_rollback", _after_rollback)
+    app.cli.add_command(backfill_usage_command)
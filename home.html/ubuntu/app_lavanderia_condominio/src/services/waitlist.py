@@ -0,0 +1,186 @@
+# src/services/waitlist.py
+from src.models.models import db, Agendamento, EsperaHorario, Morador, STATUS_OCUPA_HORARIO
+from src.services.reference_data import reference_data
+from src.services.slot_events import record_slot_change
+from src.services.usage_rollup import record_usage
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func
+import datetime
+
+# Fila de espera FIFO por horário (lavanderia, horário, data).
+# O morador entra na fila de um horário ocupado, ou de qualquer horário de uma lavanderia em manutenção.
+# Quando o horário fica livre (cancelamento individual ou em lote, ou volta da lavanderia para "ativa"),
+# o primeiro da fila recebe a reserva na mesma transação que liberou o horário: a linha de Agendamentos
+# é reativada em nome dele, como em claim_slot, e a entrada sai da fila. O horário nunca aparece livre
+# na grade, então quem espera não precisa consultá-la: a reserva aparece em /api/bookings/mine.
+# A posição na fila é uma contagem no índice ix_espera_horario (entradas do horário com id_espera menor).
+MAX_WAITLIST_ENTRIES = 10  # Filas abertas por morador
+
+espera = EsperaHorario.__table__
+agendamentos = Agendamento.__table__
+
+class WaitlistConflict(Exception):
+    pass
+
+def _slot(tabela, id_lavanderia, id_horario, data):
+    return (tabela.c.id_lavanderia_fk == id_lavanderia, tabela.c.id_horario_fk == id_horario,
+            tabela.c.data_agendamento == data)
+
+def position_select(id_espera):
+    # Posição 1 = próxima a ser atendida
+    frente = espera.alias("frente")
+    atual = db.select(espera.c.id_lavanderia_fk, espera.c.id_horario_fk, espera.c.data_agendamento)\
+              .where(espera.c.id_espera == id_espera).subquery()
+    return db.select(db.func.count()).select_from(frente).join(atual, db.and_(
+        frente.c.id_lavanderia_fk == atual.c.id_lavanderia_fk,
+        frente.c.id_horario_fk == atual.c.id_horario_fk,
+        frente.c.data_agendamento == atual.c.data_agendamento
+    )).where(frente.c.id_espera <= id_espera)
+
+def my_waitlist_select(id_morador):
+    # Filas do morador com a posição de cada uma: uma contagem correlacionada por entrada
+    frente = espera.alias("frente")
+    posicao = db.select(db.func.count()).select_from(frente).where(
+        frente.c.id_lavanderia_fk == espera.c.id_lavanderia_fk,
+        frente.c.id_horario_fk == espera.c.id_horario_fk,
+        frente.c.data_agendamento == espera.c.data_agendamento,
+        frente.c.id_espera <= espera.c.id_espera
+    ).scalar_subquery()
+    return db.select(espera.c.id_espera, espera.c.id_lavanderia_fk, espera.c.id_horario_fk, espera.c.data_agendamento,
+                     posicao.label("posicao"))\
+             .where(espera.c.id_morador_fk == id_morador, espera.c.data_agendamento >= datetime.date.today())\
+             .order_by(espera.c.data_agendamento, espera.c.id_horario_fk)
+
+def join_waitlist(id_morador, id_lavanderia, id_horario, data, lavanderia_ativa):
+    # Retorna (id_espera, posicao, criada); entrar de novo na mesma fila devolve a entrada existente
+    slot = _slot(espera, id_lavanderia, id_horario, data)
+    existente = db.session.execute(db.select(espera.c.id_espera).where(*slot, espera.c.id_morador_fk == id_morador)).scalar()
+    if existente is None:
+        abertas = db.session.execute(
+            db.select(db.func.count()).select_from(espera)
+              .where(espera.c.id_morador_fk == id_morador, espera.c.data_agendamento >= datetime.date.today())
+        ).scalar()
+        if abertas >= MAX_WAITLIST_ENTRIES:
+            db.session.rollback()
+            raise WaitlistConflict(f"Limite de {MAX_WAITLIST_ENTRIES} filas de espera atingido.")
+        try:
+            existente = _insert_entry(id_morador, id_lavanderia, id_horario, data, lavanderia_ativa)
+            criada = True
+        except IntegrityError:
+            # Mesmo morador entrando duas vezes ao mesmo tempo
+            db.session.rollback()
+            existente = db.session.execute(db.select(espera.c.id_espera).where(*slot, espera.c.id_morador_fk == id_morador)).scalar_one()
+            criada = False
+    else:
+        criada = False
+    posicao = db.session.execute(position_select(existente)).scalar()
+    db.session.commit()
+    return existente, posicao, criada
+
+def _insert_entry(id_morador, id_lavanderia, id_horario, data, lavanderia_ativa):
+    id_espera = db.session.execute(db.insert(espera).values(
+        id_morador_fk=id_morador, id_lavanderia_fk=id_lavanderia, id_horario_fk=id_horario, data_agendamento=data
+    )).inserted_primary_key[0]
+    # Ocupação lida depois do INSERT e com lock (MySQL): um cancelamento concorrente ou já viu esta
+    # entrada na fila, ou terminou antes e o horário aparece livre aqui
+    ocupante = db.session.execute(
+        db.select(agendamentos.c.id_morador_fk)
+          .where(*_slot(agendamentos, id_lavanderia, id_horario, data), agendamentos.c.status_agendamento.in_(STATUS_OCUPA_HORARIO))
+          .with_for_update()
+    ).scalar()
+    if ocupante == id_morador:
+        db.session.rollback()
+        raise WaitlistConflict("Você já tem este horário reservado.")
+    if ocupante is None and lavanderia_ativa:
+        db.session.rollback()
+        raise WaitlistConflict("Este horário está livre: faça a reserva diretamente.")
+    return id_espera
+
+def leave_waitlist(id_espera, id_morador):
+    removidos = db.session.execute(
+        db.delete(espera).where(espera.c.id_espera == id_espera, espera.c.id_morador_fk == id_morador)
+    ).rowcount
+    db.session.commit()
+    return removidos == 1
+
+# --- Atendimento da fila (na transação de quem liberou o horário, sem commit) ---
+def assign_next(id_lavanderia, id_horario, data):
+    # Entrega o horário livre ao primeiro da fila com conta ativa; retorna o id do morador ou None
+    db.session.flush()  # Cancelamento feito pelo ORM precisa estar no banco antes do UPDATE abaixo
+    proximo = db.session.execute(
+        db.select(espera.c.id_espera, espera.c.id_morador_fk)
+          .join(Morador.__table__, Morador.id_morador == espera.c.id_morador_fk)
+          .where(*_slot(espera, id_lavanderia, id_horario, data), Morador.ativo.is_(True))
+          .order_by(espera.c.id_espera)
+          .limit(1)
+          .with_for_update(of=espera)
+    ).first()
+    if proximo is None:
+        return None
+    slot = _slot(agendamentos, id_lavanderia, id_horario, data)
+    result = db.session.execute(
+        db.update(agendamentos)
+          .where(*slot, agendamentos.c.status_agendamento == "cancelado")
+          .values(status_agendamento="confirmado", id_morador_fk=proximo.id_morador_fk, data_criacao=func.now())
+    )
+    if result.rowcount == 0:
+        # Horário sem nenhuma linha: só acontece na volta de manutenção, já checado como livre
+        db.session.execute(db.insert(agendamentos).values(
+            id_morador_fk=proximo.id_morador_fk, id_lavanderia_fk=id_lavanderia, id_horario_fk=id_horario,
+            data_agendamento=data, status_agendamento="confirmado"
+        ))
+    db.session.execute(db.delete(espera).where(espera.c.id_espera == proximo.id_espera))
+    record_slot_change(id_lavanderia, data, id_horario, ocupado=True)
+    record_usage(id_lavanderia, id_horario, data, ocupado=True)
+    return proximo.id_morador_fk
+
+def release_slot(id_lavanderia, id_horario, data):
+    # Horário recém-cancelado: atende a fila se a lavanderia está ativa e a data não passou
+    lavanderia = reference_data.get().lavanderias.get(id_lavanderia)
+    if lavanderia is None or lavanderia.status != "ativa" or data < datetime.date.today():
+        return None
+    return assign_next(id_lavanderia, id_horario, data)
+
+def assign_waiting(id_lavanderia):
+    # Lavanderia voltou de manutenção: atende cada horário futuro com fila que esteja livre.
+    # Retorna [(id_horario, data, id_morador)]
+    hoje = datetime.date.today()
+    com_fila = db.session.execute(
+        db.select(espera.c.id_horario_fk, espera.c.data_agendamento).distinct()
+          .where(espera.c.id_lavanderia_fk == id_lavanderia, espera.c.data_agendamento >= hoje)
+          .order_by(espera.c.data_agendamento, espera.c.id_horario_fk)
+    ).all()
+    if not com_fila:
+        return []
+    ocupados = set(db.session.execute(
+        db.select(agendamentos.c.id_horario_fk, agendamentos.c.data_agendamento)
+          .where(agendamentos.c.id_lavanderia_fk == id_lavanderia, agendamentos.c.data_agendamento >= hoje,
+                 agendamentos.c.status_agendamento.in_(STATUS_OCUPA_HORARIO))
+    ).all())
+    atendidos = []
+    for id_horario, data in com_fila:
+        if (id_horario, data) in ocupados:
+            continue
+        id_morador = assign_next(id_lavanderia, id_horario, data)
+        if id_morador is not None:
+            atendidos.append((id_horario, data, id_morador))
+    return atendidos
+
+def expire_waitlist(hoje):
+    # Filas de datas passadas não serão mais atendidas (chamado pelo archive-bookings)
+    removidos = db.session.execute(db.delete(espera).where(espera.c.data_agendamento < hoje)).rowcount
+    db.session.commit()
+    return removidos
+
+def serialize_waitlist_entry(row, ref):
+    lavanderia = ref.lavanderias[row.id_lavanderia_fk]
+    return {
+        "id_espera": row.id_espera,
+        "data": row.data_agendamento.isoformat(),
+        "horario": ref.horarios[row.id_horario_fk].descricao_horario,
+        "id_horario": row.id_horario_fk,
+        "lavanderia": lavanderia.identificador_no_andar,
+        "id_lavanderia": row.id_lavanderia_fk,
+        "lavanderia_status": lavanderia.status,
+        "posicao": row.posicao
+    }
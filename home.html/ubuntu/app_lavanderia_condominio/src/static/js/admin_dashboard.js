@@ -6,6 +6,14 @@ document.addEventListener("DOMContentLoaded", () => {
     const filterDateEnd = document.getElementById("filter-date-end");
     const filterFloorSelect = document.getElementById("filter-floor");
     const applyFiltersBtn = document.getElementById("apply-filters-btn");
+    const exportCsvBtn = document.getElementById("export-csv-btn");
+    const exportParquetBtn = document.getElementById("export-parquet-btn");
+    const loadMoreBookingsBtn = document.getElementById("load-more-bookings-btn");
+    const utilizationSummary = document.getElementById("utilization-summary");
+    const utilizationTableHead = document.getElementById("utilization-table-head");
+    const utilizationTableBody = document.getElementById("utilization-table-body");
+    const BOOKINGS_PAGE_LIMIT = 100;
+    let bookingsNextCursor = null; // Cursor da próxima página de agendamentos
 
     // Checar se o usuário é admin e tem acesso (o backend já faz isso, mas pode ser um check extra)
     // Para simplificar, vamos assumir que se a página carregou, o backend permitiu.
@@ -16,7 +24,7 @@ document.addEventListener("DOMContentLoaded", () => {
         const response = await fetch(url, options);
         if (response.status === 401 || response.status === 403) {
             alert("Acesso não autorizado ou sessão expirada. Faça login como administrador.");
-            window.location.href = "/"; // Redireciona para a página principal/login
+            window.location.href = "../"; // Redireciona para a página principal/login
             return null;
         }
         if (!response.ok) {
@@ -29,7 +37,7 @@ document.addEventListener("DOMContentLoaded", () => {
     }
 
     async function loadFloors() {
-        const floors = await fetchWithAuth("/api/admin/floors");
+        const floors = await fetchWithAuth("../api/admin/floors");
         if (floors) {
             filterFloorSelect.innerHTML = 
                 floors.map(floor => `<option value="${floor.numero_andar}">${floor.numero_andar}</option>`).join("");
@@ -39,18 +47,20 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     }
 
-    async function loadBookings() {
-        bookingsTableBody.innerHTML = `<tr><td colspan="7" style="text-align:center;">Carregando agendamentos...</td></tr>`;
-        let url = "/api/admin/all_bookings?";
-        const params = new URLSearchParams();
-        if (filterDateStart.value) params.append("date_start", filterDateStart.value);
-        if (filterDateEnd.value) params.append("date_end", filterDateEnd.value);
-        if (filterFloorSelect.value) params.append("andar", filterFloorSelect.value);
-        
-        const bookings = await fetchWithAuth(url + params.toString());
+    function columnsToRows(columns) {
+        // Formato colunar de all_bookings: { campo: [valores] } -> [{ campo: valor }]
+        if (!columns) return null;
+        const fields = Object.keys(columns);
+        const total = fields.length ? columns[fields[0]].length : 0;
+        return Array.from({ length: total }, (_, i) => {
+            const booking = {};
+            for (const field of fields) booking[field] = columns[field][i];
+            return booking;
+        });
+    }
 
-        if (bookings && bookings.length > 0) {
-            bookingsTableBody.innerHTML = bookings.map(booking => `
+    function renderBookingRow(booking) {
+        return `
                 <tr>
                     <td>${new Date(booking.data + 'T00:00:00').toLocaleDateString('pt-BR')}</td>
                     <td>${booking.horario_desc}</td>
@@ -60,7 +70,49 @@ document.addEventListener("DOMContentLoaded", () => {
                     <td>${booking.morador_apto}</td>
                     <td>${booking.status_agendamento}</td>
                 </tr>
-            `).join("");
+            `;
+    }
+
+    function bookingFilterParams() {
+        const params = new URLSearchParams();
+        if (filterDateStart.value) params.append("date_start", filterDateStart.value);
+        if (filterDateEnd.value) params.append("date_end", filterDateEnd.value);
+        if (filterFloorSelect.value) params.append("andar", filterFloorSelect.value);
+        return params;
+    }
+
+    function exportBookings(format) {
+        // Download direto pelo navegador: o arquivo é gerado em streaming no servidor
+        const params = bookingFilterParams();
+        params.append("format", format);
+        window.location.href = `../api/admin/all_bookings/export?${params.toString()}`;
+    }
+
+    async function loadBookings(append = false) {
+        if (!append) {
+            bookingsNextCursor = null;
+            bookingsTableBody.innerHTML = `<tr><td colspan="7" style="text-align:center;">Carregando agendamentos...</td></tr>`;
+        }
+        let url = "../api/admin/all_bookings?";
+        const params = bookingFilterParams();
+        params.append("limit", BOOKINGS_PAGE_LIMIT);
+        params.append("format", "columnar"); // Uma lista por campo: payload menor que uma lista de objetos
+        if (append && bookingsNextCursor) params.append("cursor", bookingsNextCursor);
+        
+        const page = await fetchWithAuth(url + params.toString());
+        const bookings = page ? columnsToRows(page.bookings) : null;
+        bookingsNextCursor = page ? page.next_cursor : null;
+        loadMoreBookingsBtn.style.display = bookingsNextCursor ? "" : "none";
+
+        if (bookings && bookings.length > 0) {
+            const rows = bookings.map(renderBookingRow).join("");
+            if (append) {
+                bookingsTableBody.insertAdjacentHTML("beforeend", rows);
+            } else {
+                bookingsTableBody.innerHTML = rows;
+            }
+        } else if (append) {
+            return; // Mantém as páginas já carregadas
         } else if (bookings) {
             bookingsTableBody.innerHTML = `<tr><td colspan="7" style="text-align:center;">Nenhum agendamento encontrado para os filtros aplicados.</td></tr>`;
         } else {
@@ -68,9 +120,33 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     }
 
+    function formatRate(rate) {
+        return `${(rate * 100).toFixed(1)}%`;
+    }
+
+    async function loadUtilization() {
+        // Mapa de calor andar × horário com os mesmos filtros da listagem (padrão: últimos 30 dias)
+        const data = await fetchWithAuth(`../api/admin/analytics/utilization?${bookingFilterParams().toString()}`);
+        if (!data) {
+            utilizationSummary.textContent = "Erro ao carregar utilização.";
+            return;
+        }
+        const periodo = `${new Date(data.periodo.inicio + 'T00:00:00').toLocaleDateString('pt-BR')} a ${new Date(data.periodo.fim + 'T00:00:00').toLocaleDateString('pt-BR')}`;
+        utilizationSummary.textContent = `${periodo}: ocupação ${formatRate(data.totais.ocupacao)}, ` +
+            `${data.totais.confirmados} reservas, cancelamento ${formatRate(data.totais.taxa_cancelamento)}.`;
+        utilizationTableHead.innerHTML = `<tr><th>Andar</th>${data.horarios.map(h => `<th>${h.descricao}</th>`).join("")}<th>Cancelamento</th></tr>`;
+        utilizationTableBody.innerHTML = data.andares.map(andar => `
+                <tr>
+                    <td>${andar.andar_num}</td>
+                    ${andar.ocupacao.map(rate => `<td class="heat" style="background-color: rgba(255, 140, 0, ${rate.toFixed(2)});">${formatRate(rate)}</td>`).join("")}
+                    <td>${formatRate(andar.taxa_cancelamento)}</td>
+                </tr>
+            `).join("");
+    }
+
     async function loadLaundries() {
         laundriesTableBody.innerHTML = `<tr><td colspan="4" style="text-align:center;">Carregando lavanderias...</td></tr>`;
-        const laundries = await fetchWithAuth("/api/admin/all_laundries");
+        const laundries = await fetchWithAuth("../api/admin/all_laundries");
 
         if (laundries && laundries.length > 0) {
             laundriesTableBody.innerHTML = laundries.map(laundry => `
@@ -104,9 +180,10 @@ document.addEventListener("DOMContentLoaded", () => {
         const currentStatus = button.dataset.currentStatus;
         const newStatus = currentStatus === "ativa" ? "manutencao" : "ativa";
         const actionText = newStatus === "ativa" ? "ativar" : "colocar em manutenção";
+        const aviso = newStatus === "manutencao" ? " Todos os agendamentos futuros desta lavanderia serão cancelados." : "";
 
-        if (confirm(`Tem certeza que deseja ${actionText} a lavanderia ${laundryId}?`)) {
-            const result = await fetchWithAuth(`/api/admin/laundry/${laundryId}/status`, {
+        if (confirm(`Tem certeza que deseja ${actionText} a lavanderia ${laundryId}?${aviso}`)) {
+            const result = await fetchWithAuth(`../api/admin/laundry/${laundryId}/status`, {
                 method: "PUT",
                 headers: {
                     "Content-Type": "application/json",
@@ -115,7 +192,9 @@ document.addEventListener("DOMContentLoaded", () => {
             });
 
             if (result) {
-                alert(`Lavanderia ${result.lavanderia.id_lavanderia} foi ${newStatus === 'ativa' ? 'ativada' : 'colocada em manutenção'} com sucesso.`);
+                const cancelados = result.agendamentos_cancelados?.length || 0;
+                alert(`Lavanderia ${result.lavanderia.id_lavanderia} foi ${newStatus === 'ativa' ? 'ativada' : 'colocada em manutenção'} com sucesso.` +
+                      (cancelados ? ` ${cancelados} agendamento(s) futuro(s) cancelado(s).` : ''));
                 loadLaundries(); // Recarrega a lista de lavanderias
                 // Se o dashboard de agendamentos do usuário estivesse na mesma página, recarregaria também.
             } else {
@@ -126,12 +205,25 @@ document.addEventListener("DOMContentLoaded", () => {
 
     // Event Listeners
     if(applyFiltersBtn) {
-        applyFiltersBtn.addEventListener("click", loadBookings);
+        applyFiltersBtn.addEventListener("click", () => {
+            loadBookings();
+            loadUtilization();
+        });
+    }
+    if(exportCsvBtn) {
+        exportCsvBtn.addEventListener("click", () => exportBookings("csv"));
+    }
+    if(exportParquetBtn) {
+        exportParquetBtn.addEventListener("click", () => exportBookings("parquet"));
+    }
+    if(loadMoreBookingsBtn) {
+        loadMoreBookingsBtn.addEventListener("click", () => loadBookings(true));
     }
 
     // Initial Load
     loadFloors();
     loadBookings();
+    loadUtilization();
     loadLaundries();
 });
 
@@ -26,6 +26,12 @@ document.addEventListener('DOMContentLoaded', () => {
         // Exemplo: '2025-05-20': { '1': ['07-11'], '2': ['11-15'] }
     };
 
+    // Grade de horários vinda da API, carregada uma semana por vez
+    // Formato: { 'YYYY-MM-DD': { id_lavanderia: { identificador, slots: [{ id_horario, descricao, ocupado }] } } }
+    const slotsCache = {};
+    const SLOTS_WINDOW_DAYS = 7;
+    let slotEvents = null; // EventSource de api/laundries/events para a janela em cache
+
     let myMockUserBookings = [
         // { date: '2025-05-18', time: '15:00-19:00', laundry: 'Lavanderia 1', id: 'booking1' },
     ];
@@ -64,11 +70,21 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    function renderTimeSlots(laundryId, containerElement, date) {
+    function addDays(date, days) {
+        const d = new Date(date + 'T12:00:00'); // Meio-dia evita saltos de fuso horário
+        d.setDate(d.getDate() + days);
+        return d.toISOString().split('T')[0];
+    }
+
+    function renderTimeSlots(laundryId, containerElement, date, apiSlots) {
         containerElement.innerHTML = ''; // Limpa horários anteriores
         const bookingsForDateAndLaundry = mockBookings[date]?.[laundryId] || [];
+        // Usa os horários da API quando disponíveis; senão, a definição fixa
+        const slots = apiSlots
+            ? apiSlots.map(s => ({ id: String(s.id_horario), label: s.descricao, ocupado: s.ocupado }))
+            : timeSlotsDefinition;
 
-        timeSlotsDefinition.forEach(slot => {
+        slots.forEach(slot => {
             const slotDiv = document.createElement('div');
             slotDiv.classList.add('time-slot');
             slotDiv.textContent = slot.label;
@@ -76,9 +92,10 @@ document.addEventListener('DOMContentLoaded', () => {
             slotDiv.dataset.laundryId = laundryId;
             slotDiv.dataset.date = date;
 
-            if (bookingsForDateAndLaundry.includes(slot.id)) {
+            if (slot.ocupado || bookingsForDateAndLaundry.includes(slot.id)) {
                 slotDiv.classList.add('booked');
-                slotDiv.title = 'Horário Ocupado';
+                slotDiv.title = 'Horário Ocupado - clique para entrar na fila de espera';
+                slotDiv.addEventListener('click', handleSlotClick);
             } else {
                 slotDiv.classList.add('available');
                 slotDiv.title = 'Clique para agendar';
@@ -88,24 +105,73 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    function loadAvailableSlots(date) {
-        // TODO: Obter horários ocupados da API para a data selecionada e andar do usuário
-        // Por enquanto, usa mockBookings
-        renderTimeSlots('1', timeSlotsLaundry1, date); // Lavanderia 1 do andar do usuário
-        renderTimeSlots('2', timeSlotsLaundry2, date); // Lavanderia 2 do andar do usuário
+    function subscribeSlotEvents(dateStart, dateEnd) {
+        // Feed SSE da janela carregada: mudanças chegam do servidor, sem recarregar a grade
+        if (slotEvents) slotEvents.close();
+        if (!window.EventSource) return Promise.resolve();
+        const params = new URLSearchParams({ date_start: dateStart, date_end: dateEnd });
+        slotEvents = new EventSource(`api/laundries/events?${params.toString()}`);
+        slotEvents.addEventListener('slot', handleSlotEvent);
+        slotEvents.addEventListener('lavanderia', reloadSlotsWindow); // Lavanderia entrou/saiu de manutenção
+        slotEvents.addEventListener('reset', reloadSlotsWindow); // Reconexão tardia: eventos perdidos
+        // A grade é buscada depois da inscrição, para nenhuma mudança cair entre as duas
+        return new Promise(resolve => {
+            slotEvents.addEventListener('open', resolve, { once: true });
+            slotEvents.addEventListener('error', resolve, { once: true });
+        });
+    }
+
+    function handleSlotEvent(event) {
+        const { data, id_lavanderia, id_horario, ocupado } = JSON.parse(event.data);
+        const slot = slotsCache[data]?.[id_lavanderia]?.slots.find(s => s.id_horario === id_horario);
+        if (!slot) return;
+        slot.ocupado = ocupado;
+        if (scheduleDateInput.value === data) loadAvailableSlots(data);
+    }
+
+    function reloadSlotsWindow() {
+        Object.keys(slotsCache).forEach(date => delete slotsCache[date]);
+        loadAvailableSlots(scheduleDateInput.value);
+    }
+
+    async function fetchSlotsWindow(date) {
+        // Uma única requisição para a semana inteira a partir da data selecionada
+        const dateEnd = addDays(date, SLOTS_WINDOW_DAYS - 1);
+        const params = new URLSearchParams({ date_start: date, date_end: dateEnd });
+        Object.keys(slotsCache).forEach(d => delete slotsCache[d]); // Só a janela atual recebe eventos
+        await subscribeSlotEvents(date, dateEnd);
+        try {
+            const response = await fetch(`api/laundries/slots?${params.toString()}`);
+            if (!response.ok) return;
+            Object.assign(slotsCache, await response.json());
+        } catch (error) {
+            console.error('Erro ao buscar horários:', error);
+        }
+    }
+
+    async function loadAvailableSlots(date) {
+        if (!slotsCache[date]) {
+            await fetchSlotsWindow(date);
+        }
+        const laundries = Object.entries(slotsCache[date] || {});
+        const containers = [timeSlotsLaundry1, timeSlotsLaundry2];
+        containers.forEach((container, index) => {
+            const [laundryId, laundry] = laundries[index] || [String(index + 1), null];
+            renderTimeSlots(laundryId, container, date, laundry?.slots); // Lavanderias do andar do usuário
+        });
     }
 
     function handleSlotClick(event) {
         const slotDiv = event.currentTarget;
         if (slotDiv.classList.contains('booked')) {
-            alert('Este horário já está ocupado.');
+            joinWaitlist(slotDiv);
             return;
         }
 
         const laundryId = slotDiv.dataset.laundryId;
         const timeSlotId = slotDiv.dataset.timeSlotId;
         const date = slotDiv.dataset.date;
-        const laundryName = laundryId === '1' ? 'Lavanderia 1' : 'Lavanderia 2';
+        const laundryName = slotsCache[date]?.[laundryId]?.identificador || (laundryId === '1' ? 'Lavanderia 1' : 'Lavanderia 2');
 
         if (confirm(`Confirmar agendamento para ${laundryName} no dia ${selectedDateDisplay.textContent} (${slotDiv.textContent})?`)) {
             // TODO: Enviar solicitação de agendamento para a API
@@ -122,6 +188,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 date: date,
                 time: slotDiv.textContent,
                 laundry: laundryName,
+                laundryId: laundryId,
+                timeSlotId: timeSlotId,
                 id: `booking-${Date.now()}` // ID único para simulação
             });
 
@@ -134,6 +202,26 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    async function joinWaitlist(slotDiv) {
+        // Horário ocupado: a reserva é feita automaticamente se ele for liberado e você for o primeiro da fila
+        if (!confirm(`Este horário já está ocupado (${slotDiv.textContent}). Entrar na fila de espera?`)) return;
+        try {
+            const response = await fetch('api/waitlist', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    id_lavanderia: Number(slotDiv.dataset.laundryId),
+                    id_horario: Number(slotDiv.dataset.timeSlotId),
+                    data_agendamento: slotDiv.dataset.date
+                })
+            });
+            const result = await response.json();
+            alert(response.ok ? `${result.message} Sua posição: ${result.espera.posicao}.` : result.error);
+        } catch (error) {
+            console.error('Erro ao entrar na fila de espera:', error);
+        }
+    }
+
     function loadMyBookings() {
         // TODO: Obter meus agendamentos da API
         myBookingsList.innerHTML = ''; // Limpa lista anterior
@@ -176,9 +264,9 @@ document.addEventListener('DOMContentLoaded', () => {
 
             // Remove do mockBookings (simulação)
             const date = bookingToCancel.date;
-            const laundryId = bookingToCancel.laundry.includes('1') ? '1' : '2';
+            const laundryId = bookingToCancel.laundryId;
             const timeSlotLabel = bookingToCancel.time;
-            const timeSlotIdToCancel = timeSlotsDefinition.find(ts => ts.label === timeSlotLabel)?.id;
+            const timeSlotIdToCancel = bookingToCancel.timeSlotId || timeSlotsDefinition.find(ts => ts.label === timeSlotLabel)?.id;
 
             if (mockBookings[date] && mockBookings[date][laundryId] && timeSlotIdToCancel) {
                 mockBookings[date][laundryId] = mockBookings[date][laundryId].filter(id => id !== timeSlotIdToCancel);
@@ -0,0 +1,337 @@
+# src/tenancy.py
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import request
+from flask.sessions import SecureCookieSessionInterface
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from werkzeug.wsgi import ClosingIterator
+from src.db_profile import engine_options, install_sqlite_pragmas
+from src.instrumentation import instrument_engine
+import click
+import glob
+import json
+import os
+import re
+import threading
+
+# Vários condomínios (tenants) num mesmo deploy, cada um com o próprio banco.
+# TENANCY_MODE escolhe de onde sai o tenant da requisição:
+#   ""     : desligado; um único banco (SQLALCHEMY_DATABASE_URI), como antes
+#   "host" : primeiro rótulo do Host (predio-a.lavanderia.example -> predio-a), ou o que vem antes
+#            de TENANT_BASE_DOMAIN
+#   "path" : primeiro segmento do caminho (/predio-a/api/...), movido para o SCRIPT_NAME
+# TENANT_DATABASE_URI é o modelo da URI de cada tenant ({tenant}): um arquivo SQLite por condomínio,
+# sem disputa de lock entre prédios, ou um schema por condomínio no MySQL. O banco de um tenant é
+# criado pelo setup-db --tenant; tenant sem banco recebe 404.
+# As engines ficam num registro LRU limitado por worker (TENANT_MAX_ENGINES): ao passar do limite,
+# as menos usadas sem conexão em uso são descartadas, junto com os caches em memória do tenant.
+# O tenant corrente é uma ContextVar definida pelo middleware WSGI durante toda a resposta (inclusive
+# streaming e call_on_close); TenantSession.get_bind escolhe a engine por ela, e os caches por worker
+# (TenantScoped) mantêm uma instância por tenant.
+TENANT_NAME = re.compile(r"^[a-z0-9][a-z0-9-]{0,62}$")
+DEFAULT_MAX_ENGINES = 64
+
+_current_tenant = ContextVar("tenant", default=None)
+_scoped = []  # Registros TenantScoped, esvaziados por tenant quando a engine sai do registro
+
+def current_tenant():
+    return _current_tenant.get()
+
+@contextmanager
+def tenant_context(tenant):
+    token = _current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+# --- Estado em memória por tenant ---
+def _stop(instance):
+    stop = getattr(instance, "stop", None)
+    if stop is not None:
+        stop()
+
+class TenantScoped:
+    # Uma instância de `factory` por tenant, criada no primeiro uso; atributos e métodos são repassados
+    # à instância do tenant corrente. Sem tenancy há uma única instância (tenant None).
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instances", {})
+        object.__setattr__(self, "_config", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+        _scoped.append(self)
+
+    def current(self):
+        tenant = _current_tenant.get()
+        instance = self._instances.get(tenant)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(tenant)
+                if instance is None:
+                    instance = self._factory()
+                    if self._config is not None:
+                        args, kwargs = self._config
+                        instance.configure(*args, **kwargs)
+                    self._instances[tenant] = instance
+        return instance
+
+    def configure(self, *args, **kwargs):
+        # Vale para todos os tenants: as instâncias existentes são descartadas e recriadas no próximo uso
+        with self._lock:
+            object.__setattr__(self, "_config", (args, kwargs))
+            instances = list(self._instances.values())
+            self._instances.clear()
+        for instance in instances:
+            _stop(instance)
+
+    def discard(self, tenant):
+        with self._lock:
+            instance = self._instances.pop(tenant, None)
+        if instance is not None:
+            _stop(instance)
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.current(), name, value)
+
+# --- Registro de engines ---
+class TenantEngines:
+    def __init__(self, max_engines=DEFAULT_MAX_ENGINES):
+        self.mode = ""
+        self.uri_template = None
+        self.profile = None
+        self.threads = None
+        self.base_domain = None
+        self.max_engines = max_engines
+        self._engines = OrderedDict()  # tenant -> Engine, do menos para o mais recentemente usado
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+
+    @property
+    def enabled(self):
+        return bool(self.mode)
+
+    def configure(self, mode, uri_template, profile, max_engines=None, base_domain=None, threads=None):
+        if mode not in ("", "host", "path"):
+            raise ValueError(f"TENANCY_MODE inválido: {mode}. Use '', 'host' ou 'path'.")
+        if mode and "{tenant}" not in uri_template:
+            raise ValueError("TENANT_DATABASE_URI precisa conter {tenant}.")
+        with self._lock:
+            self.mode = mode
+            self.uri_template = uri_template
+            self.profile = profile
+            self.threads = threads
+            self.base_domain = base_domain.lower().strip(".") if base_domain else None
+            if max_engines is not None:
+                self.max_engines = max_engines
+            antigas = list(self._engines.items())
+            self._engines.clear()
+        for tenant, engine in antigas:
+            self._release(tenant, engine)
+
+    def uri(self, tenant):
+        return self.uri_template.format(tenant=tenant)
+
+    def sqlite_path(self, tenant):
+        url = make_url(self.uri(tenant))
+        return url.database if url.get_backend_name() == "sqlite" else None
+
+    def exists(self, tenant):
+        # SQLite: o arquivo existe; outros backends: o schema é responsabilidade do setup-db
+        if tenant in self._engines:
+            return True
+        path = self.sqlite_path(tenant)
+        return path is None or os.path.isfile(path)
+
+    def prepare(self, tenant):
+        # Diretório do arquivo SQLite de um tenant novo (setup-db)
+        path = self.sqlite_path(tenant)
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def known(self):
+        # Tenants com arquivo SQLite criado; None se o modelo não for SQLite
+        modelo = make_url(self.uri_template)
+        if modelo.get_backend_name() != "sqlite" or not modelo.database:
+            return None
+        prefixo, _, sufixo = modelo.database.partition("{tenant}")
+        nomes = (path[len(prefixo):len(path) - len(sufixo)] for path in glob.glob(glob.escape(prefixo) + "*" + glob.escape(sufixo)))
+        return sorted(nome for nome in nomes if TENANT_NAME.match(nome))
+
+    def engine(self, tenant):
+        # Não conta como uso para o LRU: ver touch
+        engine = self._engines.get(tenant)
+        if engine is not None:
+            return engine
+        with self._lock:
+            engine = self._engines.get(tenant)
+            if engine is not None:
+                return engine
+            uri = self.uri(tenant)
+            engine = create_engine(uri, **engine_options(uri, self.profile, self.threads))
+            install_sqlite_pragmas(engine, self.profile)
+            instrument_engine(engine)
+            self._engines[tenant] = engine
+            self.created += 1
+            descartadas = self._evict_idle()
+        for antigo, engine_antiga in descartadas:
+            self._release(antigo, engine_antiga)
+        return engine
+
+    def touch(self, tenant):
+        # Uma requisição do tenant: passa a ser o mais recentemente usado
+        with self._lock:
+            if tenant in self._engines:
+                self._engines.move_to_end(tenant)
+
+    def _evict_idle(self):
+        # Sob o lock; engines com conexões em uso ficam até uma próxima criação
+        descartadas = []
+        for tenant in list(self._engines)[:-1]:
+            if len(self._engines) <= self.max_engines:
+                break
+            engine = self._engines[tenant]
+            if getattr(engine.pool, "checkedout", lambda: 0)():
+                continue
+            del self._engines[tenant]
+            descartadas.append((tenant, engine))
+            self.evicted += 1
+        return descartadas
+
+    def _release(self, tenant, engine):
+        # Caches primeiro (para a thread de leitura do log do tenant), depois as conexões
+        for scoped in _scoped:
+            scoped.discard(tenant)
+        engine.dispose()
+
+    def resolve(self, environ):
+        # (tenant, resto do caminho no modo path) ou (None, None)
+        if self.mode == "host":
+            host = (environ.get("HTTP_HOST") or environ.get("SERVER_NAME", "")).split(":")[0].lower().rstrip(".")
+            if self.base_domain:
+                tenant = host[:-len(self.base_domain) - 1] if host.endswith("." + self.base_domain) else ""
+            else:
+                tenant = host.split(".")[0]
+            resto = None
+        else:
+            _, tenant, *resto = (environ.get("PATH_INFO") or "/").split("/", 2)
+            resto = resto[0] if resto else None
+        if not TENANT_NAME.match(tenant):
+            return None, None
+        return tenant, resto
+
+    def stats(self):
+        with self._lock:
+            return {"engines": len(self._engines), "max_engines": self.max_engines,
+                    "created": self.created, "evicted": self.evicted}
+
+tenant_engines = TenantEngines()
+
+class TenantSession(FlaskSQLAlchemySession):
+    # Sessão do Flask-SQLAlchemy (db.session) ligada à engine do tenant corrente
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        tenant = _current_tenant.get()
+        if bind is None and tenant is not None:
+            return tenant_engines.engine(tenant)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+class TenantSessionInterface(SecureCookieSessionInterface):
+    # Todos os tenants assinam com o mesmo SECRET_KEY: a sessão só vale no tenant em que foi criada
+    def open_session(self, app, request):
+        session = super().open_session(app, request)
+        if session is not None and session.get("tenant") != current_tenant():
+            return self.session_class()
+        return session
+
+    def save_session(self, app, session, response):
+        if session and session.get("tenant") != current_tenant():
+            session["tenant"] = current_tenant()
+        super().save_session(app, session, response)
+
+    def get_cookie_path(self, app):
+        # Modo path: um cookie por prefixo de tenant
+        return request.script_root or super().get_cookie_path(app)
+
+def _json_response(start_response, status, payload, headers=()):
+    body = json.dumps(payload).encode()
+    start_response(status, [("Content-Type", "application/json"), ("Content-Length", str(len(body))), *headers])
+    return [body]
+
+class TenantMiddleware:
+    def __init__(self, wsgi_app, engines):
+        self.wsgi_app = wsgi_app
+        self.engines = engines
+
+    def __call__(self, environ, start_response):
+        tenant, resto = self.engines.resolve(environ)
+        if tenant is None or not self.engines.exists(tenant):
+            return _json_response(start_response, "404 NOT FOUND", {"error": "Condomínio não encontrado."})
+        if self.engines.mode == "path":
+            if resto is None:
+                # /predio-a -> /predio-a/: as páginas usam URLs relativas ao prefixo
+                query = environ.get("QUERY_STRING")
+                location = f"{environ.get('SCRIPT_NAME', '')}/{tenant}/" + (f"?{query}" if query else "")
+                return _json_response(start_response, "308 PERMANENT REDIRECT", {}, [("Location", location)])
+            environ["SCRIPT_NAME"] = f"{environ.get('SCRIPT_NAME', '')}/{tenant}"
+            environ["PATH_INFO"] = f"/{resto}"
+        self.engines.touch(tenant)
+        token = _current_tenant.set(tenant)
+        try:
+            app_iter = self.wsgi_app(environ, start_response)
+        except BaseException:
+            _current_tenant.reset(token)
+            raise
+        # O tenant continua definido enquanto o servidor consome a resposta
+        return ClosingIterator(app_iter, lambda: _current_tenant.reset(token))
+
+# --- Comandos de manutenção por tenant ---
+def tenant_options(command):
+    command = click.option("--todos-tenants", "todos_tenants", is_flag=True,
+                           help="Executa para cada tenant com banco SQLite criado.")(command)
+    return click.option("--tenant", "tenants", multiple=True, help="Tenant (condomínio) alvo; pode ser repetido.")(command)
+
+def selected_tenants(tenants, todos_tenants, criar=False):
+    if not tenant_engines.enabled:
+        if tenants or todos_tenants:
+            raise click.UsageError("TENANCY_MODE desligado: o comando usa o banco padrão, sem --tenant.")
+        return [None]
+    if todos_tenants:
+        conhecidos = tenant_engines.known()
+        if conhecidos is None:
+            raise click.UsageError("--todos-tenants requer um TENANT_DATABASE_URI SQLite; use --tenant.")
+        return conhecidos
+    if not tenants:
+        raise click.UsageError("TENANCY_MODE ligado: informe --tenant ou --todos-tenants.")
+    for tenant in tenants:
+        if not TENANT_NAME.match(tenant):
+            raise click.UsageError(f"Nome de tenant inválido: {tenant} (letras minúsculas, números e '-').")
+        if not criar and not tenant_engines.exists(tenant):
+            raise click.UsageError(f"Tenant sem banco: {tenant}. Rode setup-db --tenant {tenant}.")
+    return list(tenants)
+
+def each_tenant(tenants, session):
+    # Uma sessão limpa por tenant: a sessão do app context não atravessa bancos
+    for tenant in tenants:
+        with tenant_context(tenant):
+            try:
+                yield tenant
+            finally:
+                session.remove()
+
+def init_tenancy(app):
+    mode = app.config.get("TENANCY_MODE") or ""
+    uri_template = app.config.get("TENANT_DATABASE_URI") or \
+        f"sqlite:///{os.path.join(app.instance_path, 'tenants', '{tenant}.db')}"
+    tenant_engines.configure(mode, uri_template, app.config["DB_PROFILE"],
+                             app.config.get("TENANT_MAX_ENGINES", DEFAULT_MAX_ENGINES), app.config.get("TENANT_BASE_DOMAIN"),
+                             app.config.get("WEB_THREADS"))
+    if not mode:
+        return
+    app.session_interface = TenantSessionInterface()
+    app.wsgi_app = TenantMiddleware(app.wsgi_app, tenant_engines)
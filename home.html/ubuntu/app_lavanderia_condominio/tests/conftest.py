@@ -0,0 +1,74 @@
+# tests/conftest.py
+# App de teste: create_app com um SQLite temporário por teste, esquema e dados iniciais do setup-db
+# (15 andares, 2 lavanderias por andar, 4 horários e o morador administrador de teste).
+import os
+import sys
+
+import pytest
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_ROOT)
+
+from src.main import create_app, setup_database
+from src.models.models import db
+
+ADMIN_EMAIL = "morador_teste@email.com"
+ADMIN_PASSWORD = "senha123"
+
+def create_test_app(directory, **config):
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{directory / 'test.db'}",
+        "SECRET_KEY": "test",
+        "PASSWORD_HASH_WORKERS": 0,  # Hash na própria thread: sem pool de processos nos testes
+        "RATE_LIMIT_BOOKING": "",
+        "RATE_LIMIT_LOGIN": "",
+        "RATE_LIMIT_LOGIN_FAILURES": "",
+        **config,
+    })
+    app.instance_path = str(directory / "instance")
+    with app.app_context():
+        setup_database(app)
+    return app
+
+@pytest.fixture(scope="session")
+def app_factory():
+    return create_test_app
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_test_app(tmp_path)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def admin_client(client):
+    response = client.post("/api/login", json={"email": ADMIN_EMAIL, "senha": ADMIN_PASSWORD})
+    assert response.status_code == 200
+    return client
+
+@pytest.fixture
+def statement_counter(app):
+    # Conta os comandos SQL enviados ao banco pela thread do teste (o test client roda nela); a thread
+    # de leitura do log de eventos, aberta pelos testes de SSE, fica de fora
+    import threading
+    from sqlalchemy import event
+
+    class Counter:
+        count = 0
+
+        def __call__(self, *args):
+            if threading.get_ident() == thread:
+                self.count += 1
+
+    thread = threading.get_ident()
+    counter = Counter()
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine, "before_cursor_execute", counter)
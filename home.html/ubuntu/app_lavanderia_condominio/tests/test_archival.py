@@ -0,0 +1,50 @@
+# tests/test_archival.py
+import datetime
+
+from src.main import setup_database
+from src.models.models import db, Agendamento, AgendamentoArquivo, Lavanderia, Morador
+from src.services.archival import archive_before
+
+def _insert_bookings(dias, id_horario=1):
+    id_morador = db.session.execute(db.select(Morador.id_morador)).scalar()
+    id_lavanderia = db.session.execute(db.select(Lavanderia.id_lavanderia)).scalar()
+    db.session.execute(db.insert(Agendamento), [
+        {"id_morador_fk": id_morador, "id_lavanderia_fk": id_lavanderia, "id_horario_fk": id_horario,
+         "data_agendamento": dia, "status_agendamento": "concluido"} for dia in dias
+    ])
+    db.session.commit()
+
+def _archived_ids():
+    return db.session.execute(db.select(AgendamentoArquivo.id_agendamento)).scalars().all()
+
+def test_archiving_newest_rows_twice_does_not_reuse_ids(app):
+    hoje = datetime.date.today()
+    _insert_bookings([hoje - datetime.timedelta(days=d) for d in (30, 20, 10)])
+    assert archive_before(hoje) == 3  # A tabela quente fica vazia, inclusive o maior id
+
+    _insert_bookings([hoje - datetime.timedelta(days=5)], id_horario=2)
+    assert archive_before(hoje) == 1
+
+    ids = _archived_ids()
+    assert len(ids) == len(set(ids)) == 4
+
+def test_setup_db_rebuilds_table_without_autoincrement(app):
+    ddl = db.session.execute(db.text("SELECT sql FROM sqlite_master WHERE name = 'Agendamentos'")).scalar()
+    assert "AUTOINCREMENT" in ddl
+    db.session.execute(db.text('DROP TABLE "Agendamentos"'))
+    db.session.execute(db.text(ddl.replace(" AUTOINCREMENT", "")))  # Como as tabelas criadas antes da opção
+    db.session.commit()
+
+    hoje = datetime.date.today()
+    _insert_bookings([hoje - datetime.timedelta(days=d) for d in (30, 20)])
+    assert archive_before(hoje) == 2
+
+    setup_database(app)
+    db.session.remove()
+    indices = db.session.execute(db.text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'Agendamentos'")).scalars().all()
+    assert {index.name for index in Agendamento.__table__.indexes} <= set(indices)
+
+    _insert_bookings([hoje - datetime.timedelta(days=5)], id_horario=2)
+    assert archive_before(hoje) == 1
+    ids = _archived_ids()
+    assert len(ids) == len(set(ids)) == 3
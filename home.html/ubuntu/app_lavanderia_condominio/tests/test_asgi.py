@@ -0,0 +1,58 @@
+# tests/test_asgi.py
+import asyncio
+import datetime
+import gzip
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("asgiref")
+
+from conftest import ADMIN_EMAIL, ADMIN_PASSWORD
+from src.asgi import AsyncReadApp
+from src.instrumentation import instrumentation
+
+def _get(asgi_app, path, query="", headers=()):
+    mensagens = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        mensagens.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query.encode(),
+             "headers": [(k.encode(), v.encode()) for k, v in headers]}
+    asyncio.run(asgi_app(scope, receive, send))
+    inicio = mensagens[0]
+    body = b"".join(m.get("body", b"") for m in mensagens[1:])
+    return inicio["status"], {k.decode(): v.decode() for k, v in inicio["headers"]}, body
+
+@pytest.fixture
+def asgi(app_factory, tmp_path):
+    app = app_factory(tmp_path, COMPRESS_MIN_SIZE=1)
+    client = app.test_client()
+    assert client.post("/api/login", json={"email": ADMIN_EMAIL, "senha": ADMIN_PASSWORD}).status_code == 200
+    cookie = client.get_cookie(app.config["SESSION_COOKIE_NAME"])
+    return AsyncReadApp(app), (("cookie", f"{cookie.key}={cookie.value}"),)
+
+def test_read_route_reports_server_timing_and_metrics(asgi):
+    asgi_app, cookie = asgi
+    h = instrumentation.endpoints.get("api_bp.get_my_bookings")
+    antes = h.count if h else 0
+    status, headers, _ = _get(asgi_app, "/api/bookings/mine", headers=cookie)
+    assert status == 200
+    assert "queries" in headers["server-timing"]
+    assert instrumentation.endpoints["api_bp.get_my_bookings"].count == antes + 1
+    assert instrumentation.endpoints["api_bp.get_my_bookings"].sql_queries >= 1
+
+def test_read_route_compresses_like_the_blueprint(asgi):
+    asgi_app, cookie = asgi
+    dia = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+    status, headers, body = _get(asgi_app, "/api/laundries/slots", f"date={dia}",
+                                 headers=(*cookie, ("accept-encoding", "gzip")))
+    assert status == 200
+    assert headers["content-encoding"] == "gzip"
+    assert headers["etag"].startswith('W/"')
+    assert "Accept-Encoding" in headers["vary"]
+    assert gzip.decompress(body).startswith(b"{")
@@ -0,0 +1,79 @@
+# tests/test_booking_batch.py
+import datetime
+
+from src.services.booking_batch import MAX_RECURRING_WEEKS
+
+INICIO = datetime.date.today() + datetime.timedelta(days=1)
+
+def _recurring(client, semanas, id_horario=1):
+    return client.post("/api/bookings/recurring", json={"id_lavanderia": 1, "id_horario": id_horario,
+                                                        "data_inicio": INICIO.isoformat(), "semanas": semanas})
+
+def _semana(n):
+    return (INICIO + datetime.timedelta(weeks=n)).isoformat()
+
+def test_recurring_booking_claims_each_week(admin_client):
+    response = _recurring(admin_client, 3)
+    assert response.status_code == 201
+    resultados = response.get_json()["resultados"]
+    assert [(r["data"], r["status"]) for r in resultados] == [(_semana(n), "confirmado") for n in range(3)]
+    assert sorted(b["data"] for b in admin_client.get("/api/bookings/mine").get_json()) == [_semana(n) for n in range(3)]
+
+def test_recurring_booking_reports_conflicts_and_reuses_cancelled_rows(admin_client):
+    ids = [r["id_agendamento"] for r in _recurring(admin_client, 3).get_json()["resultados"]]
+    assert admin_client.delete(f"/api/bookings/{ids[1]}").status_code == 200
+
+    response = _recurring(admin_client, 4)
+    assert response.status_code == 201
+    resultados = response.get_json()["resultados"]
+    assert [r["status"] for r in resultados] == ["conflito", "confirmado", "conflito", "confirmado"]
+    assert resultados[1]["id_agendamento"] == ids[1]  # Linha cancelada reativada, não duplicada
+
+    todas_ocupadas = _recurring(admin_client, 4)
+    assert todas_ocupadas.status_code == 409
+    assert {r["status"] for r in todas_ocupadas.get_json()["resultados"]} == {"conflito"}
+
+def test_recurring_booking_validates_weeks(admin_client):
+    assert _recurring(admin_client, 0).status_code == 400
+    assert _recurring(admin_client, MAX_RECURRING_WEEKS + 1).status_code == 400
+    assert _recurring(admin_client, "2").status_code == 400
+
+def test_cancel_future_bookings_frees_every_slot(admin_client):
+    _recurring(admin_client, 3)
+    _recurring(admin_client, 2, id_horario=2)
+    response = admin_client.delete("/api/bookings/future")
+    assert response.status_code == 200
+    assert len(response.get_json()["resultados"]) == 5
+    assert admin_client.get("/api/bookings/mine").get_json() == []
+    assert _recurring(admin_client, 3).status_code == 201  # Horários livres de novo
+
+def test_cancel_future_bookings_of_another_resident_requires_admin(app, admin_client):
+    morador = app.test_client()
+    id_vizinho = morador.post("/api/register", json={"nome_completo": "Vizinho", "email": "vizinho@batch", "senha": "senha123",
+                                                     "andar": 1, "apartamento": "102"}).get_json()["morador_id"]
+    morador.post("/api/login", json={"email": "vizinho@batch", "senha": "senha123"})
+    _recurring(admin_client, 2)
+    _recurring(morador, 2, id_horario=2)
+
+    assert morador.delete("/api/bookings/future?morador_id=1").status_code == 403
+    assert len(admin_client.get("/api/bookings/mine").get_json()) == 2
+
+    response = admin_client.delete(f"/api/bookings/future?morador_id={id_vizinho}")
+    assert len(response.get_json()["resultados"]) == 2
+    assert morador.get("/api/bookings/mine").get_json() == []
+    assert len(admin_client.get("/api/bookings/mine").get_json()) == 2
+
+def test_cancel_future_bookings_hands_slots_to_the_waitlist(app, admin_client):
+    morador = app.test_client()
+    morador.post("/api/register", json={"nome_completo": "Fila", "email": "fila@batch", "senha": "senha123",
+                                        "andar": 1, "apartamento": "103"})
+    morador.post("/api/login", json={"email": "fila@batch", "senha": "senha123"})
+    _recurring(admin_client, 2)
+    assert morador.post("/api/waitlist", json={"id_lavanderia": 1, "id_horario": 1,
+                                               "data_agendamento": _semana(1)}).status_code == 201
+
+    response = admin_client.delete("/api/bookings/future")
+    assert len(response.get_json()["resultados"]) == 2
+    # O horário da fila vai para o vizinho no mesmo commit; o outro fica livre
+    assert [b["data"] for b in morador.get("/api/bookings/mine").get_json()] == [_semana(1)]
+    assert [r["status"] for r in _recurring(admin_client, 2).get_json()["resultados"]] == ["confirmado", "conflito"]
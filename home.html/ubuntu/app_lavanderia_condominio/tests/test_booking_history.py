@@ -0,0 +1,143 @@
+# tests/test_booking_history.py
+import csv
+import datetime
+import gzip
+import io
+
+import pytest
+
+from conftest import ADMIN_EMAIL, ADMIN_PASSWORD
+from src.models.models import db, Agendamento, AgendamentoArquivo, Lavanderia, Morador
+from src.services.booking_export import EXPORT_HEADER, ExportUnavailable
+
+def _insert_bookings(inicio, total):
+    # Reservas confirmadas inicio..inicio+total, espalhadas por lavanderias, horários e dias futuros
+    moradores = db.session.execute(db.select(Morador.id_morador)).scalars().all()
+    lavanderias = db.session.execute(db.select(Lavanderia.id_lavanderia)).scalars().all()
+    hoje = datetime.date.today()
+    db.session.execute(db.insert(Agendamento), [
+        {"id_morador_fk": moradores[i % len(moradores)],
+         "id_lavanderia_fk": lavanderias[i % len(lavanderias)],
+         "id_horario_fk": 1 + (i // len(lavanderias)) % 4,
+         "data_agendamento": hoje + datetime.timedelta(days=1 + i // (len(lavanderias) * 4)),
+         "status_agendamento": "confirmado"} for i in range(inicio, inicio + total)
+    ])
+    db.session.commit()
+
+def _listing(client, statement_counter, formato):
+    antes = statement_counter.count
+    response = client.get(f"/api/admin/all_bookings?limit=500&format={formato}")
+    assert response.status_code == 200
+    bookings = response.get_json()["bookings"]
+    return statement_counter.count - antes, len(bookings if formato == "rows" else bookings["id_agendamento"])
+
+@pytest.mark.parametrize("formato", ["rows", "columnar"])
+def test_listing_statement_count_does_not_grow_with_rows(admin_client, statement_counter, formato):
+    n = 20
+    admin_client.get("/api/admin/all_bookings")  # Aquece principal e dados de referência
+    _insert_bookings(0, n)
+    comandos_n, linhas = _listing(admin_client, statement_counter, formato)
+    assert linhas == n
+    _insert_bookings(n, 9 * n)
+    comandos_10n, linhas = _listing(admin_client, statement_counter, formato)
+    assert linhas == 10 * n
+    assert 0 < comandos_n == comandos_10n
+
+@pytest.mark.parametrize("provider", ["orjson", "default", "flask.json.provider:DefaultJSONProvider"])
+def test_dates_are_iso_whatever_the_json_provider(app_factory, tmp_path, provider):
+    app = app_factory(tmp_path, JSON_PROVIDER=provider)
+    with app.app_context():
+        _insert_bookings(0, 3)
+    client = app.test_client()
+    assert client.post("/api/login", json={"email": ADMIN_EMAIL, "senha": ADMIN_PASSWORD}).status_code == 200
+    amanha = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+
+    linhas = client.get("/api/admin/all_bookings?limit=100").get_json()["bookings"]
+    colunas = client.get("/api/admin/all_bookings?format=columnar").get_json()["bookings"]
+    minhas = client.get("/api/bookings/mine").get_json()
+    assert {linha["data"] for linha in linhas} == set(colunas["data"]) == {amanha}
+    assert {reserva["data"] for reserva in minhas} == {amanha}
+
+def _archive_bookings(total):
+    # Dias passados já no arquivo, com ids abaixo dos da tabela quente (como o archive-bookings deixa)
+    hoje = datetime.date.today()
+    db.session.execute(db.insert(AgendamentoArquivo), [
+        {"id_agendamento": 1000 + i, "id_morador_fk": 1, "id_lavanderia_fk": 1, "id_horario_fk": 1 + i % 4,
+         "data_agendamento": hoje - datetime.timedelta(days=1 + i // 4), "status_agendamento": "concluido"}
+        for i in range(total)
+    ])
+    db.session.commit()
+
+def test_listing_without_paging_params_keeps_the_list_shape(admin_client):
+    _insert_bookings(0, 5)
+    _archive_bookings(3)
+    response = admin_client.get("/api/admin/all_bookings")
+    assert response.status_code == 200
+    bookings = response.get_json()
+    assert isinstance(bookings, list) and len(bookings) == 8
+    assert [b["data"] for b in bookings] == sorted((b["data"] for b in bookings), reverse=True)
+
+def test_keyset_pages_cross_the_archive_boundary(admin_client):
+    _insert_bookings(0, 5)
+    _archive_bookings(6)
+    esperado = [b["id_agendamento"] for b in admin_client.get("/api/admin/all_bookings").get_json()]
+
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        page = admin_client.get("/api/admin/all_bookings?limit=4" + (f"&cursor={cursor}" if cursor else "")).get_json()
+        vistos += [b["id_agendamento"] for b in page["bookings"]]
+        paginas += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert vistos == esperado
+    assert paginas == 3  # 5 quentes + 6 arquivadas em páginas de 4: a segunda mistura as duas tabelas
+
+def _export_rows(response):
+    return list(csv.reader(io.StringIO(response.get_data().decode())))
+
+def test_csv_export_streams_archive_then_hot_rows_in_batches(admin_client, monkeypatch):
+    monkeypatch.setattr("src.services.booking_export.EXPORT_BATCH_SIZE", 4)
+    _insert_bookings(0, 10)
+    _archive_bookings(6)
+    response = admin_client.get("/api/admin/all_bookings/export?format=csv")
+    assert response.status_code == 200 and response.is_streamed
+    assert response.headers["Content-Disposition"] == 'attachment; filename="agendamentos.csv"'
+    linhas = _export_rows(response)
+    assert tuple(linhas[0]) == EXPORT_HEADER
+    assert len(linhas) == 1 + 16
+    datas = [linha[1] for linha in linhas[1:]]
+    assert datas == sorted(datas)  # Arquivo (dias passados) antes da tabela quente
+    assert {linha[7] for linha in linhas[1:7]} == {"concluido"}
+
+def test_csv_export_applies_filters_and_gzip(admin_client):
+    _insert_bookings(0, 40)
+    amanha = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+    filtrada = _export_rows(admin_client.get(f"/api/admin/all_bookings/export?date_start={amanha}&date_end={amanha}"))
+    assert len(filtrada) > 1 and {linha[1] for linha in filtrada[1:]} == {amanha}
+
+    response = admin_client.get("/api/admin/all_bookings/export", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    linhas = list(csv.reader(io.StringIO(gzip.decompress(response.get_data()).decode())))
+    assert len(linhas) == 1 + 40
+
+def test_export_rejects_unknown_format(admin_client):
+    assert admin_client.get("/api/admin/all_bookings/export?format=xlsx").status_code == 400
+
+def test_parquet_export_without_pyarrow_is_not_implemented(admin_client, monkeypatch):
+    def sem_pyarrow():
+        raise ExportUnavailable("pyarrow ausente")
+    monkeypatch.setattr("src.routes.api.load_pyarrow", sem_pyarrow)
+    assert admin_client.get("/api/admin/all_bookings/export?format=parquet").status_code == 501
+
+def test_parquet_export_writes_one_row_group_per_batch(admin_client, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr("src.services.booking_export.EXPORT_BATCH_SIZE", 4)
+    _insert_bookings(0, 10)
+    _archive_bookings(2)
+    response = admin_client.get("/api/admin/all_bookings/export?format=parquet")
+    assert response.status_code == 200
+    arquivo = pq.ParquetFile(io.BytesIO(response.get_data()))
+    assert arquivo.schema_arrow.names == list(EXPORT_HEADER)
+    assert arquivo.metadata.num_rows == 12
+    assert arquivo.metadata.num_row_groups > 1
@@ -0,0 +1,16 @@
+# tests/test_db_profile.py
+import os
+import re
+
+from conftest import APP_ROOT
+from src.db_profile import engine_options, DEFAULT_WEB_THREADS
+
+def test_production_pool_has_a_connection_per_request_thread():
+    for uri in ("sqlite:////tmp/lavanderia.db", "mysql+pymysql://u:p@db/lavanderia"):
+        assert engine_options(uri, "production", threads=16)["pool_size"] == 16
+        assert engine_options(uri, "production")["pool_size"] == DEFAULT_WEB_THREADS
+
+def test_procfile_threads_default_matches_pool_default():
+    with open(os.path.join(APP_ROOT, "Procfile")) as f:
+        web = next(linha for linha in f if linha.startswith("web:"))
+    assert re.search(r"--threads \$\{WEB_THREADS:-(\d+)\}", web).group(1) == str(DEFAULT_WEB_THREADS)
@@ -0,0 +1,33 @@
+# tests/test_hashing.py
+import pytest
+
+from src.services.hashing import HashingService
+
+@pytest.mark.parametrize("method", ["scrypt", "scrypt:32768:8:1", "pbkdf2:sha256", "pbkdf2:sha256:1000"])
+def test_hash_with_configured_method_does_not_need_rehash(method):
+    service = HashingService(method=method, workers=0)
+    assert not service.needs_rehash(service.hash_password("senha123"))
+
+def test_hash_with_other_method_needs_rehash():
+    antigo = HashingService(method="pbkdf2:sha256:1000", workers=0)
+    service = HashingService(method="scrypt", workers=0)
+    assert service.needs_rehash(antigo.hash_password("senha123"))
+
+def test_pool_processes_are_not_forked_from_the_worker():
+    service = HashingService(method="pbkdf2:sha256:1000", workers=1)
+    try:
+        senha_hash = service.hash_password("senha123")
+        assert service.verify_password(senha_hash, "senha123")
+        assert service._get_executor()._mp_context.get_start_method() in ("forkserver", "spawn")
+    finally:
+        service.configure()  # Encerra o pool
+
+def test_configure_does_not_hash(monkeypatch):
+    import src.services.hashing as hashing
+    chamadas = []
+    monkeypatch.setattr(hashing, "generate_password_hash", lambda *args: chamadas.append(args) or "scrypt:32768:8:1$s$h")
+    service = HashingService(method="pbkdf2:sha256", workers=0)
+    service.configure(method="scrypt")
+    assert chamadas == []
+    assert not service.needs_rehash("scrypt:32768:8:1$outro$hash")
+    assert len(chamadas) == 1
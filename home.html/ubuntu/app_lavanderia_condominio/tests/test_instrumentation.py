@@ -0,0 +1,53 @@
+# tests/test_instrumentation.py
+import datetime
+
+import pytest
+from flask import g
+from sqlalchemy.exc import OperationalError
+
+from src.instrumentation import RequestStats, instrumentation
+from src.models.models import db
+
+def test_failed_statement_is_counted_and_leaves_no_state(app):
+    with app.test_request_context():
+        g.request_stats = stats = RequestStats()
+        with db.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.exec_driver_sql("SELECT * FROM tabela_inexistente")
+            conn.rollback()
+            conn.exec_driver_sql("SELECT 1")
+    assert stats.query_count == 2
+    assert 0 <= stats.sql_time < 1  # O comando seguinte não herda o início do que falhou
+
+def test_server_timing_reports_the_request_queries(admin_client, statement_counter):
+    response = admin_client.get("/api/bookings/mine")
+    assert response.status_code == 200
+    assert f'desc="{statement_counter.count} queries"' in response.headers["Server-Timing"]
+
+def test_streamed_response_reports_queries_run_while_streaming(admin_client):
+    def observado():
+        h = instrumentation.endpoints.get("api_bp.get_all_bookings")
+        return (h.count, h.sql_queries) if h else (0, 0)
+
+    antes = observado()
+    response = admin_client.get("/api/admin/all_bookings?stream=ndjson")
+    assert response.is_streamed
+    response.get_data()
+    response.close()
+    depois = observado()
+    assert depois[0] == antes[0] + 1
+    assert depois[1] - antes[1] >= 2  # Tabela quente e arquivo, lidos durante o stream
+
+def test_event_stream_is_observed_on_close(admin_client):
+    def observados():
+        h = instrumentation.endpoints.get("api_bp.slot_events_feed")
+        return h.count if h else 0
+
+    antes = observados()
+    dia = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+    response = admin_client.get(f"/api/laundries/events?date={dia}")
+    assert response.is_streamed and "Server-Timing" in response.headers
+    assert next(response.iter_encoded()).startswith(b"retry:")
+    assert observados() == antes  # Ainda aberto
+    response.close()
+    assert observados() == antes + 1
@@ -0,0 +1,39 @@
+# tests/test_occupancy_cache.py
+import datetime
+
+from src.services.occupancy_cache import OccupancyCache
+
+DIA = datetime.date.today() + datetime.timedelta(days=1)
+
+def test_fill_read_before_a_write_is_not_stored():
+    cache = OccupancyCache()
+    geracao = cache.generation  # Leitor: antes da consulta ao banco
+    cache.mark_occupied(1, DIA, 2)  # Escritor: commit e write-through sem entrada no índice
+    cache.put(1, DIA, 0, geracao)  # Bitmask lido antes do commit
+    assert cache.get(1, DIA) is None
+    assert cache.stats()["stale_fills"] == 1
+
+    cache.put(1, DIA, 1 << 2, cache.generation)
+    assert cache.get(1, DIA) == 1 << 2
+
+def test_fills_of_other_keys_are_kept():
+    cache = OccupancyCache()
+    geracao = cache.generation
+    cache.mark_free(2, DIA, 1)
+    cache.put(1, DIA, 1 << 3, geracao)
+    assert cache.get(1, DIA) == 1 << 3
+
+def test_pruned_write_records_still_reject_older_fills():
+    cache = OccupancyCache(max_entries=2)
+    geracao = cache.generation
+    for id_lavanderia in (1, 2, 3):
+        cache.mark_occupied(id_lavanderia, DIA, 1)
+    cache.put(1, DIA, 0, geracao)  # O registro da chave 1 já saiu: vale o piso
+    assert cache.get(1, DIA) is None
+
+def test_laundry_invalidation_rejects_fills_in_flight():
+    cache = OccupancyCache()
+    geracao = cache.generation
+    cache.invalidate_laundry(1)
+    cache.put(1, DIA, 0, geracao)
+    assert cache.get(1, DIA) is None
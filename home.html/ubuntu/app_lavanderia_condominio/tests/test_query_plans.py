@@ -0,0 +1,107 @@
+# tests/test_query_plans.py
+# Regressão dos planos de consulta: exercita os endpoints da API contra o app de teste, captura os
+# SELECTs de cada um e roda EXPLAIN QUERY PLAN. Falha se alguma consulta varrer uma tabela grande
+# sem índice.
+import datetime
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from conftest import ADMIN_EMAIL, ADMIN_PASSWORD
+from src.models.models import db, Agendamento, Morador
+
+# Tabelas que crescem com o uso; as de referência são pequenas e podem ser varridas
+HOT_TABLES = ("Agendamentos", "Agendamentos_Arquivo", "Lista_Espera", "Moradores", "Uso_Diario")
+
+HOJE = datetime.date.today()
+FIM = (HOJE + datetime.timedelta(days=40)).isoformat()
+OCUPADO = {"id_lavanderia": 1, "id_horario": 2, "data_agendamento": (HOJE + datetime.timedelta(days=2)).isoformat()}
+MANUTENCAO = {"id_lavanderia": 1, "id_horario": 2, "data_agendamento": (HOJE + datetime.timedelta(days=3)).isoformat()}
+
+# Em ordem: cada chamada parte do estado deixado pelas anteriores
+ENDPOINTS = [
+    ("login", lambda c: c.post("/api/login", json={"email": ADMIN_EMAIL, "senha": ADMIN_PASSWORD})),
+    ("user_info", lambda c: c.get("/api/user_info")),
+    ("laundries_slots", lambda c: c.get(f"/api/laundries/slots?date={HOJE.isoformat()}")),
+    ("laundries_slots_range", lambda c: c.get(f"/api/laundries/slots?date_start={HOJE.isoformat()}&date_end={(HOJE + datetime.timedelta(days=6)).isoformat()}")),
+    ("create_booking", lambda c: c.post("/api/bookings", json={"id_lavanderia": 2, "id_horario": 2, "data_agendamento": FIM})),
+    ("my_bookings", lambda c: c.get("/api/bookings/mine")),
+    ("cancel_booking", lambda c: c.delete("/api/bookings/1")),
+    ("waitlist_join", lambda c: c.post("/api/waitlist", json=OCUPADO)),
+    ("my_waitlist", lambda c: c.get("/api/waitlist")),
+    ("waitlist_leave", lambda c: c.delete("/api/waitlist/99")),
+    ("cancel_booking_waitlist", lambda c: c.delete("/api/bookings/31")),
+    ("all_bookings", lambda c: c.get("/api/admin/all_bookings?limit=5")),
+    ("all_bookings_filtered", lambda c: c.get(f"/api/admin/all_bookings?date_start={HOJE.isoformat()}&date_end={FIM}&andar=1&limit=100")),
+    ("all_laundries", lambda c: c.get("/api/admin/all_laundries")),
+    ("laundry_status", lambda c: c.put("/api/admin/laundry/1/status", json={"status": "manutencao"})),
+    ("waitlist_join_maintenance", lambda c: c.post("/api/waitlist", json=MANUTENCAO)),
+    ("laundry_reactivate", lambda c: c.put("/api/admin/laundry/1/status", json={"status": "ativa"})),
+    ("floors", lambda c: c.get("/api/admin/floors")),
+    ("utilization", lambda c: c.get("/api/admin/analytics/utilization")),
+    ("utilization_floor", lambda c: c.get(f"/api/admin/analytics/utilization?date_start={HOJE.isoformat()}&date_end={FIM}&andar=1")),
+]
+
+def seed():
+    # Além dos dados do setup-db: 30 dias de reservas do administrador (ids 1-30) e um horário do
+    # vizinho (id 31) para a fila de espera
+    vizinho = Morador(nome_completo="Vizinho", email="vizinho@plans", senha_hash="-", id_andar_fk=1, numero_apartamento="102")
+    db.session.add(vizinho)
+    db.session.flush()
+    for dias in range(30):
+        db.session.add(Agendamento(id_morador_fk=1, id_lavanderia_fk=1 + dias % 2, id_horario_fk=1,
+                                   data_agendamento=HOJE + datetime.timedelta(days=dias)))
+    db.session.add(Agendamento(id_morador_fk=vizinho.id_morador, id_lavanderia_fk=1, id_horario_fk=2,
+                               data_agendamento=HOJE + datetime.timedelta(days=2)))
+    db.session.commit()
+
+@pytest.fixture(scope="module")
+def plans(app_factory, tmp_path_factory):
+    # endpoint -> (status HTTP, [(SELECT, plano)])
+    app = app_factory(tmp_path_factory.mktemp("query_plans"))
+    with app.app_context():
+        seed()
+        engine = db.engine
+
+    thread = threading.get_ident()
+    captured = {}
+    atual = [None]
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # Só a thread do teste: a leitura do log de eventos roda em outra
+        if threading.get_ident() == thread and statement.lstrip().upper().startswith("SELECT"):
+            captured[atual[0]][1].append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    client = app.test_client()
+    try:
+        for name, call in ENDPOINTS:
+            atual[0] = name
+            captured[name] = [None, []]
+            captured[name][0] = call(client).status_code
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    resultado = {}
+    with app.app_context():
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            for name, (status, statements) in captured.items():
+                resultado[name] = (status, [(statement, cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall())
+                                            for statement, parameters in statements])
+        finally:
+            connection.close()
+    return resultado
+
+def full_scans(plan_rows):
+    return [row[-1] for row in plan_rows for table in HOT_TABLES
+            if row[-1].startswith(f"SCAN {table}") and "INDEX" not in row[-1]]
+
+@pytest.mark.parametrize("endpoint", [name for name, _ in ENDPOINTS])
+def test_endpoint_queries_use_indexes(plans, endpoint):
+    status, statements = plans[endpoint]
+    assert status < 500
+    for statement, plan in statements:
+        assert not full_scans(plan), f"{endpoint}: {' | '.join(row[-1] for row in plan)}\n{statement}"
@@ -0,0 +1,25 @@
+# tests/test_rate_limit.py
+from conftest import ADMIN_EMAIL, ADMIN_PASSWORD
+from src.services.rate_limit import rate_limiter, DEFAULT_LIMITS
+
+def _login(client, senha, endereco):
+    return client.post("/api/login", json={"email": ADMIN_EMAIL, "senha": senha},
+                       environ_base={"REMOTE_ADDR": endereco}).status_code
+
+def test_bad_passwords_from_one_address_do_not_lock_out_the_resident(app, client):
+    rate_limiter.configure(policies=DEFAULT_LIMITS)
+    atacante = [_login(client, "errada", "203.0.113.9") for _ in range(40)]
+    assert atacante.count(401) == 5 and atacante.count(429) == 35
+    assert _login(client, ADMIN_PASSWORD, "198.51.100.7") == 200
+
+def test_failures_per_resident_apply_across_addresses(app, client):
+    rate_limiter.configure(policies={"login": "5/60", "login_failures": "3/300"})
+    status = [_login(client, "errada", f"203.0.113.{n}") for n in range(5)]
+    assert status == [401, 401, 401, 429, 429]
+
+def test_successful_logins_do_not_consume_and_reset_failures(app, client):
+    rate_limiter.configure(policies={"login": "", "login_failures": "3/300"})
+    assert [_login(client, ADMIN_PASSWORD, "198.51.100.7") for _ in range(5)] == [200] * 5
+    assert [_login(client, "errada", "203.0.113.9") for _ in range(2)] == [401, 401]
+    assert _login(client, ADMIN_PASSWORD, "198.51.100.7") == 200
+    assert [_login(client, "errada", "203.0.113.9") for _ in range(4)] == [401, 401, 401, 429]
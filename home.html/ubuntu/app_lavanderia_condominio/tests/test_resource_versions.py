@@ -0,0 +1,44 @@
+# tests/test_resource_versions.py
+import datetime
+
+from src.models.models import db, Lavanderia
+from src.services.resource_versions import ResourceVersions
+from src.services.slot_events import SlotEventHub, record_slot_change
+
+def _book_event(lavanderia, dia, id_horario=1):
+    record_slot_change(lavanderia.id_lavanderia, dia, id_horario, True)
+    db.session.commit()
+
+def test_pruned_events_do_not_roll_back_slot_versions(app):
+    dia = datetime.date.today() + datetime.timedelta(days=3)
+    lavanderias = db.session.execute(db.select(Lavanderia).order_by(Lavanderia.id_lavanderia)).scalars().all()
+    alvo = lavanderias[0]
+    outra = next(l for l in lavanderias if l.id_andar_fk != alvo.id_andar_fk)
+
+    antes = ResourceVersions()
+    antes.load(db.session)
+    etag_antes = antes.slots_etag(alvo.id_andar_fk, [dia], "dias")
+
+    _book_event(alvo, dia)  # A reserva que muda a grade
+    _book_event(outra, dia)  # Evento mais recente, em outro andar: fica na retenção
+
+    hub = SlotEventHub(retention=-60)  # Tudo anterior ao evento mais recente sai do log
+    hub._prune(db.session)
+
+    worker_novo = ResourceVersions()
+    worker_novo.load(db.session)
+    assert worker_novo.slots_etag(alvo.id_andar_fk, [dia], "dias") != etag_antes
+
+def test_prune_keeps_newest_event_so_ids_keep_growing(app):
+    from src.models.models import EventoSlot
+    dia = datetime.date.today() + datetime.timedelta(days=3)
+    lavanderia = db.session.execute(db.select(Lavanderia)).scalars().first()
+    _book_event(lavanderia, dia)
+    _book_event(lavanderia, dia, id_horario=2)
+    ultimo = db.session.execute(db.select(db.func.max(EventoSlot.id_evento))).scalar()
+
+    SlotEventHub(retention=-60)._prune(db.session)
+    assert db.session.execute(db.select(EventoSlot.id_evento)).scalars().all() == [ultimo]
+
+    _book_event(lavanderia, dia, id_horario=3)
+    assert db.session.execute(db.select(db.func.max(EventoSlot.id_evento))).scalar() > ultimo
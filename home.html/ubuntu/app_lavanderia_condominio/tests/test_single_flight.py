@@ -0,0 +1,98 @@
+# tests/test_single_flight.py
+import datetime
+import threading
+import time
+
+from src.services.single_flight import SingleFlight
+from src.services.slots import slot_reads
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    liberar = threading.Event()
+    iniciado = threading.Event()
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        iniciado.set()
+        liberar.wait(5)
+        return b"grade"
+
+    resultados = []
+    lider = threading.Thread(target=lambda: resultados.append(flight.do("k", calcular)))
+    lider.start()
+    assert iniciado.wait(5)
+    seguidores = [threading.Thread(target=lambda: resultados.append(flight.do("k", calcular))) for _ in range(4)]
+    for t in seguidores:
+        t.start()
+    time.sleep(0.1)  # Seguidores já esperando pelo líder
+    liberar.set()
+    for t in [lider, *seguidores]:
+        t.join(5)
+
+    assert resultados == [b"grade"] * 5
+    assert len(chamadas) == 1
+    assert flight.stats()["leaders"] == 1 and flight.stats()["shared"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+def test_followers_receive_the_leader_error():
+    flight = SingleFlight()
+    liberar = threading.Event()
+    iniciado = threading.Event()
+
+    def falhar():
+        iniciado.set()
+        liberar.wait(5)
+        raise RuntimeError("banco indisponível")
+
+    erros = []
+
+    def chamar():
+        try:
+            flight.do("k", falhar)
+        except RuntimeError as e:
+            erros.append(e)
+
+    lider = threading.Thread(target=chamar)
+    lider.start()
+    assert iniciado.wait(5)
+    seguidor = threading.Thread(target=chamar)
+    seguidor.start()
+    liberar.set()
+    lider.join(5)
+    seguidor.join(5)
+    assert len(erros) == 2
+    assert flight.stats()["in_flight"] == 0
+    # A chave não guarda o erro: a próxima chamada calcula de novo
+    assert flight.do("k", lambda: 1) == 1
+
+def test_distinct_keys_do_not_wait_for_each_other():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: flight.do("b", lambda: 2)) == 2
+    assert flight.stats()["shared"] == 0
+
+def test_follower_computes_alone_after_timeout():
+    flight = SingleFlight(timeout=0.05)
+    liberar = threading.Event()
+    iniciado = threading.Event()
+
+    def lento():
+        iniciado.set()
+        liberar.wait(5)
+        return "lider"
+
+    lider = threading.Thread(target=flight.do, args=("k", lento))
+    lider.start()
+    assert iniciado.wait(5)
+    assert flight.do("k", lambda: "proprio") == "proprio"
+    liberar.set()
+    lider.join(5)
+    assert flight.stats()["timeouts"] == 1
+
+def test_slot_grid_reads_go_through_single_flight(admin_client):
+    dia = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+    antes = slot_reads.stats()["leaders"]
+    response = admin_client.get(f"/api/laundries/slots?date={dia}")
+    assert response.status_code == 200
+    assert slot_reads.stats()["leaders"] == antes + 1
+    assert slot_reads.stats()["in_flight"] == 0
@@ -0,0 +1,109 @@
+# tests/test_slot_events.py
+import datetime
+import threading
+
+import pytest
+
+from conftest import ADMIN_EMAIL, ADMIN_PASSWORD
+from src.models.models import db, EventoSlot
+from src.services.slot_events import SlotEventHub, _ReaderStopped, slot_event_hub, open_subscription
+
+DIA = datetime.date.today() + datetime.timedelta(days=2)
+
+def _reader_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("slot-events")]
+
+def test_requests_do_not_start_reader_thread(admin_client):
+    assert admin_client.get(f"/api/laundries/slots?date={DIA.isoformat()}").status_code == 200
+    assert admin_client.get("/api/admin/all_laundries").status_code == 200
+    assert _reader_threads() == []
+
+def test_reader_thread_runs_only_while_subscribed(app):
+    with app.test_request_context():
+        subscription = open_subscription(1, [DIA], None)
+        thread = slot_event_hub._thread
+        assert thread.is_alive()
+        slot_event_hub.unsubscribe(subscription)
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert slot_event_hub._thread is None
+
+def test_etag_follows_events_written_by_other_workers(app_factory, tmp_path):
+    app = app_factory(tmp_path, SLOT_EVENTS_POLL_INTERVAL=0)
+    with app.app_context():
+        client = app.test_client()
+        client.post("/api/login", json={"email": ADMIN_EMAIL, "senha": ADMIN_PASSWORD})
+        url = f"/api/laundries/slots?date={DIA.isoformat()}"
+        etag = client.get(url).headers["ETag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        # Sem o aviso de commit local (wake): só a leitura do log na requisição vê o evento
+        db.session.add(EventoSlot(criado_em=datetime.datetime.now(), id_andar_fk=1, id_lavanderia_fk=1,
+                                  id_horario_fk=1, data_agendamento=DIA, tipo="ocupado"))
+        db.session.commit()
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        db.session.remove()
+
+def test_stopped_reader_sends_no_queries(app, statement_counter):
+    hub = SlotEventHub()
+    hub._read_log(db.engine)  # Carga das versões
+    hub.stop()  # Tenant despejado no meio do ciclo seguinte
+    antes = statement_counter.count
+    with pytest.raises(_ReaderStopped):
+        hub._read_log(db.engine)
+    assert statement_counter.count == antes
+
+def _resume(client, last_event_id, dia=DIA):
+    # Stream curto (SLOT_EVENTS_STREAM_TIMEOUT): replay da retomada e o que a thread de leitura entregar em seguida
+    response = client.get(f"/api/laundries/events?date={dia.isoformat()}", headers={"Last-Event-ID": str(last_event_id)})
+    assert response.status_code == 200
+    frames = response.get_data(as_text=True).split("\n\n")[:-1]
+    response.close()
+    eventos = [frame for frame in frames[1:] if not frame.startswith(":")]  # Sem os heartbeats
+    return frames[0], [dict(linha.split(": ", 1) for linha in frame.split("\n")) for frame in eventos]
+
+def _book(client, dia, id_horario=1):
+    response = client.post("/api/bookings", json={"id_lavanderia": 1, "id_horario": id_horario, "data_agendamento": dia.isoformat()})
+    assert response.status_code == 201
+    return response.get_json()["agendamento"]["id_agendamento"]
+
+@pytest.fixture
+def resumable(app_factory, tmp_path):
+    app = app_factory(tmp_path, SLOT_EVENTS_STREAM_TIMEOUT=1)
+    with app.app_context():
+        client = app.test_client()
+        client.post("/api/login", json={"email": ADMIN_EMAIL, "senha": ADMIN_PASSWORD})
+        yield client
+        db.session.remove()
+
+def test_resume_replays_missed_events_of_the_subscribed_dates(resumable):
+    inicio = slot_event_hub.head_id()
+    id_agendamento = _book(resumable, DIA)
+    _book(resumable, DIA + datetime.timedelta(days=1))  # Outra data: fora da assinatura
+    assert resumable.delete(f"/api/bookings/{id_agendamento}").status_code == 200
+
+    retry, eventos = _resume(resumable, inicio)
+    assert retry.startswith("retry:")
+    assert [e["event"] for e in eventos] == ["slot", "slot"]
+    assert '"ocupado": true' in eventos[0]["data"] and '"ocupado": false' in eventos[1]["data"]
+    ids = [int(e["id"]) for e in eventos]
+    assert inicio < ids[0] < ids[1]  # Sem duplicatas entre o replay e a fila
+
+    # Retomada a partir do último evento recebido: nada a reenviar
+    assert _resume(resumable, ids[-1])[1] == []
+
+def test_resume_from_before_retention_sends_reset(resumable):
+    inicio = slot_event_hub.head_id()
+    _book(resumable, DIA)
+    _book(resumable, DIA, id_horario=2)
+    # Eventos já podados por outro worker, e este worker recém-iniciado (sem eventos em memória)
+    db.session.execute(db.delete(EventoSlot).where(EventoSlot.id_evento <= inicio + 1))
+    db.session.commit()
+    slot_event_hub._recent.clear()
+
+    _, eventos = _resume(resumable, inicio)
+    assert eventos[0]["event"] == "reset"
+    # O cliente recarrega a grade; o que vier depois é posterior ao id do reset
+    assert all(int(e["id"]) > int(eventos[0]["id"]) for e in eventos[1:])
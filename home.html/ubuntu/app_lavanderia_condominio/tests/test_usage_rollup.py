@@ -0,0 +1,62 @@
+# tests/test_usage_rollup.py
+import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.models.models import db, UsoDiario
+from src.services import usage_rollup
+
+def _book_cancel_book(client):
+    data = (datetime.date.today() + datetime.timedelta(days=5)).isoformat()
+    alvo = {"id_lavanderia": 1, "id_horario": 1, "data_agendamento": data}
+    id_agendamento = client.post("/api/bookings", json=alvo).get_json()["agendamento"]["id_agendamento"]
+    assert client.delete(f"/api/bookings/{id_agendamento}").status_code == 200
+    assert client.post("/api/bookings", json=alvo).status_code == 201
+
+def _usage():
+    return db.session.execute(db.select(UsoDiario.confirmados, UsoDiario.cancelados)).all()
+
+def test_native_upsert_keeps_counts(admin_client):
+    _book_cancel_book(admin_client)
+    assert _usage() == [(1, 1)]
+
+def test_dialect_without_upsert_falls_back_to_update_insert(admin_client, monkeypatch):
+    monkeypatch.setattr(usage_rollup, "upsert_statement", lambda dialect_name: None)
+    _book_cancel_book(admin_client)
+    assert _usage() == [(1, 1)]
+
+@pytest.mark.parametrize("dialect_name", ["sqlite", "mysql", "postgresql"])
+def test_upsert_statement_for_supported_dialects(dialect_name):
+    assert usage_rollup.upsert_statement(dialect_name) is not None
+
+def test_postgresql_upsert_compiles():
+    sql = str(usage_rollup.upsert_statement("postgresql").compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (id_lavanderia_fk, data, id_horario_fk) DO UPDATE" in sql
+
+def test_rollup_listener_only_on_app_sessions(app):
+    # Sessões fora do app (scripts, a leitura do log de eventos) não gravam o agregado
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    assert event.contains(db.session.session_factory.class_, "before_commit", usage_rollup._before_commit)
+    assert not event.contains(Session, "before_commit", usage_rollup._before_commit)
+
+def test_backfill_matches_incremental_rollup(admin_client):
+    # Sem cancelamento seguido de nova reserva no mesmo horário (única diferença documentada)
+    dia = datetime.date.today() + datetime.timedelta(days=4)
+    for id_lavanderia, id_horario, data in ((1, 1, dia), (1, 2, dia), (2, 3, dia + datetime.timedelta(days=1))):
+        response = admin_client.post("/api/bookings", json={"id_lavanderia": id_lavanderia, "id_horario": id_horario,
+                                                            "data_agendamento": data.isoformat()})
+        assert response.status_code == 201
+    assert admin_client.delete(f"/api/bookings/{response.get_json()['agendamento']['id_agendamento']}").status_code == 200
+
+    def rollup():
+        return sorted(db.session.execute(db.select(UsoDiario)).scalars().all(),
+                      key=lambda u: (u.id_lavanderia_fk, u.id_horario_fk, u.data))
+
+    incremental = [(u.id_lavanderia_fk, u.id_horario_fk, u.data, u.dia_semana, u.confirmados, u.cancelados) for u in rollup()]
+    db.session.expire_all()
+    assert usage_rollup.backfill_usage() == 3
+    reconstruido = [(u.id_lavanderia_fk, u.id_horario_fk, u.data, u.dia_semana, u.confirmados, u.cancelados) for u in rollup()]
+    assert reconstruido == incremental
+    assert len(incremental) == 3
@@ -0,0 +1,87 @@
+# tests/test_waitlist.py
+import datetime
+
+DIA = (datetime.date.today() + datetime.timedelta(days=3)).isoformat()
+
+def _resident(app, email, apartamento):
+    # Morador comum do andar 1 (o do administrador), com o próprio test client
+    client = app.test_client()
+    response = client.post("/api/register", json={"nome_completo": email, "email": email, "senha": "senha123",
+                                                  "andar": 1, "apartamento": apartamento})
+    assert response.status_code == 201
+    assert client.post("/api/login", json={"email": email, "senha": "senha123"}).status_code == 200
+    return client
+
+def _book(client, id_lavanderia=1, id_horario=1):
+    response = client.post("/api/bookings", json={"id_lavanderia": id_lavanderia, "id_horario": id_horario,
+                                                  "data_agendamento": DIA})
+    assert response.status_code == 201
+    return response.get_json()["agendamento"]["id_agendamento"]
+
+def _join(client, id_lavanderia=1, id_horario=1):
+    return client.post("/api/waitlist", json={"id_lavanderia": id_lavanderia, "id_horario": id_horario,
+                                              "data_agendamento": DIA})
+
+def _my_slots(client):
+    return [(b["lavanderia_id"], b["horario_desc"], b["data"]) for b in client.get("/api/bookings/mine").get_json()]
+
+def test_cancelled_slot_goes_to_the_waitlist_in_fifo_order(app, admin_client):
+    primeiro = _resident(app, "primeiro@fila", "101")
+    segundo = _resident(app, "segundo@fila", "102")
+    id_agendamento = _book(admin_client)
+
+    assert _join(primeiro).get_json()["espera"]["posicao"] == 1
+    assert _join(segundo).get_json()["espera"]["posicao"] == 2
+    repetida = _join(primeiro)
+    assert repetida.status_code == 200 and repetida.get_json()["espera"]["posicao"] == 1
+
+    assert admin_client.delete(f"/api/bookings/{id_agendamento}").status_code == 200
+    reservas = primeiro.get("/api/bookings/mine").get_json()
+    assert [b["id_agendamento"] for b in reservas] == [id_agendamento]  # Linha reativada em nome dele
+    assert primeiro.get("/api/waitlist").get_json() == []
+    assert [e["posicao"] for e in segundo.get("/api/waitlist").get_json()] == [1]
+
+    assert primeiro.delete(f"/api/bookings/{id_agendamento}").status_code == 200
+    assert len(_my_slots(segundo)) == 1
+    assert segundo.get("/api/waitlist").get_json() == []
+    ocupado = admin_client.post("/api/bookings", json={"id_lavanderia": 1, "id_horario": 1, "data_agendamento": DIA})
+    assert ocupado.status_code == 409  # Nunca ficou livre na grade
+
+def test_waitlist_rejects_free_and_own_slots(app, admin_client):
+    morador = _resident(app, "livre@fila", "103")
+    assert _join(morador).status_code == 409  # Livre: reserva direta
+    _book(admin_client)
+    assert _join(admin_client).status_code == 409  # O próprio horário
+
+def test_leaving_the_waitlist_skips_the_entry(app, admin_client):
+    desistente = _resident(app, "desistente@fila", "104")
+    seguinte = _resident(app, "seguinte@fila", "105")
+    id_agendamento = _book(admin_client)
+    id_espera = _join(desistente).get_json()["espera"]["id_espera"]
+    _join(seguinte)
+
+    assert seguinte.delete(f"/api/waitlist/{id_espera}").status_code == 404  # Entrada de outro morador
+    assert desistente.delete(f"/api/waitlist/{id_espera}").status_code == 200
+    assert admin_client.delete(f"/api/bookings/{id_agendamento}").status_code == 200
+    assert _my_slots(desistente) == []
+    assert len(_my_slots(seguinte)) == 1
+
+def test_maintenance_cancels_future_bookings_and_reactivation_serves_the_queue(app, admin_client):
+    morador = _resident(app, "manutencao@fila", "106")
+    id_agendamento = _book(admin_client, id_horario=2)
+
+    response = admin_client.put("/api/admin/laundry/1/status", json={"status": "manutencao"})
+    assert response.status_code == 200
+    assert [c["id_agendamento"] for c in response.get_json()["agendamentos_cancelados"]] == [id_agendamento]
+    assert _my_slots(admin_client) == []
+    assert morador.post("/api/bookings", json={"id_lavanderia": 1, "id_horario": 2, "data_agendamento": DIA}).status_code == 403
+
+    # Em manutenção qualquer horário aceita fila, inclusive os livres
+    assert _join(morador, id_horario=2).status_code == 201
+    assert _join(morador, id_horario=3).status_code == 201
+
+    response = admin_client.put("/api/admin/laundry/1/status", json={"status": "ativa"})
+    assert response.status_code == 200
+    assert response.get_json()["agendamentos_da_fila"] == 2
+    assert len(_my_slots(morador)) == 2
+    assert morador.get("/api/waitlist").get_json() == []